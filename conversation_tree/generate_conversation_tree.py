@@ -1,7 +1,7 @@
 from enum import Enum
 import os
 import logging
-from openai import OpenAI
+from openai import BadRequestError, OpenAI
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
@@ -75,7 +75,70 @@ def generate_sys_prompt(identity, topic):
         sys_prompt = ""
     return {"role": "system", "content": sys_prompt}
 
-def call_ai(messages, sys_prompt, model_url="http://14.103.16.79:11000/v1", model_name="llama-3.3-70B-instruct", uid=None):
+def generate_batch_sys_prompt(topics):
+    """一次生成多个话题下用户发言的system_prompt, 在generate_sys_prompt('user', ...)的基础上要求按话题输出JSON"""
+    sys_prompt = generate_sys_prompt('user', "、".join(topics))
+    topic_text = "、".join(f"'{topic}'" for topic in topics)
+    sys_prompt['content'] += (
+        f"请你针对以下每个话题分别说出你接下来要说的话：{topic_text}。"
+        f"只输出一个JSON对象，键为话题，值为你针对该话题说的话，不要输出其他内容。"
+    )
+    return sys_prompt
+
+
+class GenerationStats:
+    """统计生成对话树发送的请求数与prompt(prefill) token数, 以及逐话题生成时预计的请求数与prompt token数
+
+    第一层的每个话题在各自的线程中生成, 各自使用一个GenerationStats, 完成后由merge汇总, 因此不需要加锁
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.baseline_requests = 0
+        self.baseline_prompt_tokens = 0
+        self.batched_calls = 0
+        self.fallbacks = 0
+
+    def add(self, prompt_tokens, baseline_requests=1, baseline_prompt_tokens=None, batched=False):
+        """记录一次请求, baseline_*为逐话题生成时对应的请求数与prompt token数, 默认与本次请求相同"""
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.baseline_requests += baseline_requests
+        self.baseline_prompt_tokens += prompt_tokens if baseline_prompt_tokens is None else baseline_prompt_tokens
+        if batched:
+            self.batched_calls += 1
+
+    def add_fallback(self, prompt_tokens):
+        """记录一次未能使用的合并请求, 逐话题生成时不会发送该请求"""
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.fallbacks += 1
+
+    def merge(self, other):
+        """汇总另一棵子树的统计"""
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.baseline_requests += other.baseline_requests
+        self.baseline_prompt_tokens += other.baseline_prompt_tokens
+        self.batched_calls += other.batched_calls
+        self.fallbacks += other.fallbacks
+
+    def log_summary(self):
+        logger.info(
+            f"Tree generation sent {self.requests} requests with {self.prompt_tokens} prompt tokens, "
+            f"per-topic generation would send {self.baseline_requests} requests with about {self.baseline_prompt_tokens} prompt tokens"
+        )
+        if self.batched_calls > 0 or self.fallbacks > 0:
+            saved_requests = self.baseline_requests - self.requests
+            saved_tokens = self.baseline_prompt_tokens - self.prompt_tokens
+            logger.info(
+                f"Batched sibling calls: {self.batched_calls}, fallbacks to per-topic calls: {self.fallbacks}, "
+                f"requests saved: {saved_requests} ({saved_requests / max(self.baseline_requests, 1):.1%}), "
+                f"prompt tokens saved: {saved_tokens} ({saved_tokens / max(self.baseline_prompt_tokens, 1):.1%})"
+            )
+
+def call_ai(messages, sys_prompt, model_url="http://14.103.16.79:11000/v1", model_name="llama-3.3-70B-instruct", uid=None, stats=None):
     """调用AI, 需传入历史对话和system_prompt, 当model_name为"cleans2s"时, 调用cleans2s的接口
 
     Args:
@@ -84,11 +147,15 @@ def call_ai(messages, sys_prompt, model_url="http://14.103.16.79:11000/v1", mode
         model_url (str, optional): _description_. Defaults to "http://14.103.16.79:11000/v1".
         model_name (str, optional): _description_. Defaults to "llama-3.3-70B-instruct".
         uid (_type_, optional): _description_. Defaults to None.
+        stats (GenerationStats, optional): 记录请求数与prompt token数, 为None时不记录. Defaults to None.
 
     Returns:
         _type_: _description_
     """
     if model_name.lower() == 'cleans2s':
+        # cleans2s的接口不返回token用量
+        if stats is not None:
+            stats.add(0)
         return cleans2s_generate(messages[-1]['content'], uid)
     else:  
         try:
@@ -109,26 +176,113 @@ def call_ai(messages, sys_prompt, model_url="http://14.103.16.79:11000/v1", mode
             )
 
             answer = response.choices[0].message.content
+            if stats is not None:
+                stats.add(response.usage.prompt_tokens if response.usage is not None else 0)
             return answer
         except Exception as e:
             raise SystemExit(f"请求失败: {e}")
 
 
-def process_topic(background_name, messages, topic, topic_chosen_list, save_path, expand_num, extend_num, user_prompt_generator, preset_user_prompt_dict, AI_response_model=None, uid=None):
+def message_chars(messages):
+    return sum(len(str(message.get("content", ""))) for message in messages)
+
+
+def parse_batch_user_prompts(content, topics):
+    """从模型输出中解析每个话题的用户发言, 允许JSON前后有多余的文本(如代码块标记), 缺少任一话题时返回None"""
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        turns = json.loads(content[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(turns, dict):
+        return None
+    if any(not isinstance(turns.get(topic), str) or turns[topic].strip() == "" for topic in topics):
+        return None
+    return {topic: turns[topic].strip() for topic in topics}
+
+
+def batch_generate_user_prompts(messages, topics, model_url="http://14.103.16.79:11000/v1", model_name="llama-3.3-70B-instruct", stats=None):
+    """一次请求生成所有兄弟分支的用户发言
+
+    同一深度的兄弟分支共享相同的历史对话, 逐话题生成时只有system_prompt中的话题不同, 历史对话却要prefill len(topics)次.
+    这里用一个结构化的prompt让模型按话题输出JSON, 历史对话只prefill一次. 服务端不支持response_format时去掉该参数重试,
+    请求失败或输出无法解析出所有话题时返回None, 由调用方逐话题生成
+
+    Args:
+        messages (list): 兄弟分支共享的历史对话
+        topics (list): 兄弟分支的话题
+        stats (GenerationStats): 记录请求数与prompt token数, 为None时不记录
+
+    Returns:
+        dict: 话题 -> 用户发言, 失败时返回None
+    """
+    msg = messages[:]
+    msg.insert(0, generate_batch_sys_prompt(topics))
+    request_kwargs = dict(
+        model=model_name,
+        messages=msg,
+        temperature=0.7,
+        top_p=0.8,
+        max_tokens=512 * len(topics),
+        extra_body={
+            "repetition_penalty": 1.05,
+        },
+    )
+    try:
+        client = OpenAI(api_key="token-123", base_url=model_url)
+        try:
+            response = client.chat.completions.create(response_format={"type": "json_object"}, **request_kwargs)
+        except BadRequestError:
+            response = client.chat.completions.create(**request_kwargs)
+    except Exception as e:
+        logger.warning(f"Batched user prompt generation failed, falling back to per-topic calls: {e}")
+        return None
+
+    prompt_tokens = response.usage.prompt_tokens if response.usage is not None else 0
+    turns = parse_batch_user_prompts(response.choices[0].message.content or "", topics)
+    if turns is None:
+        if stats is not None:
+            stats.add_fallback(prompt_tokens)
+        logger.warning(f"Batched user prompts do not cover all topics {topics}, falling back to per-topic calls")
+        return None
+    # 逐话题生成时每次请求的prompt为该话题的system_prompt加上历史对话, 按字符数比例由本次请求的prompt token数估算
+    batch_chars = max(message_chars(msg), 1)
+    baseline_prompt_tokens = sum(
+        round(prompt_tokens * message_chars([generate_sys_prompt('user', topic)] + messages) / batch_chars) for topic in topics
+    )
+    if stats is not None:
+        stats.add(prompt_tokens, len(topics), baseline_prompt_tokens, batched=True)
+    return turns
+
+
+def sibling_user_prompts(messages, topics, user_prompt_generator, batch_user_prompts, stats=None):
+    """开启batch_user_prompts且用户发言由AI生成时, 一次请求生成所有兄弟分支的用户发言, 否则或失败时返回None"""
+    if not batch_user_prompts or user_prompt_generator != UserPromptGenerator.AI or SYSTEM_TEST == True or len(topics) < 2:
+        return None
+    return batch_generate_user_prompts(messages, topics, stats=stats)
+
+
+def process_topic(background_name, messages, topic, topic_chosen_list, save_path, expand_num, extend_num, user_prompt_generator, preset_user_prompt_dict, AI_response_model=None, uid=None, batch_user_prompts=False, batched_user_prompt=None):
+    """生成第一层的一个话题及其子树, 在线程中运行, 使用独立的GenerationStats, 返回该子树的统计"""
+    stats = GenerationStats()
     local_messages = messages[:]
     topic_hist_list = [topic]
 
     # Generate user prompt
-    if user_prompt_generator == UserPromptGenerator.preset:
+    if batched_user_prompt is not None:
+        user_prompt_text = batched_user_prompt
+    elif user_prompt_generator == UserPromptGenerator.preset:
         assert preset_user_prompt_dict is not None, "Error: preset_user_prompt_dict is None"
         user_prompt_text = preset_user_prompt_dict[topic]
     elif user_prompt_generator == UserPromptGenerator.AI:
         if SYSTEM_TEST == True:
             system_prompt = generate_sys_prompt('user', topic)
             system_prompt['content'] += test_message_in_system_prompt(local_messages)
-            user_prompt_text = call_ai([local_messages[-1]], system_prompt)
+            user_prompt_text = call_ai([local_messages[-1]], system_prompt, stats=stats)
         else:
-            user_prompt_text = call_ai(local_messages, generate_sys_prompt('user', topic))
+            user_prompt_text = call_ai(local_messages, generate_sys_prompt('user', topic), stats=stats)
     else:
         user_prompt_text = input(f"请输入针对话题'{topic}'的内容：")
 
@@ -139,14 +293,14 @@ def process_topic(background_name, messages, topic, topic_chosen_list, save_path
     if SYSTEM_TEST == True:
         system_prompt = generate_sys_prompt('AI', topic)
         system_prompt['content'] += test_message_in_system_prompt(local_messages)
-        response_text = call_ai([local_messages[-1]], system_prompt, model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct")
+        response_text = call_ai([local_messages[-1]], system_prompt, model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct", stats=stats)
     else:
         if AI_response_model.lower() == 'llama':
-            response_text = call_ai(local_messages, generate_sys_prompt("AI", topic))
+            response_text = call_ai(local_messages, generate_sys_prompt("AI", topic), stats=stats)
         elif AI_response_model.lower() == 'qwen':
-            response_text = call_ai(local_messages, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct")
+            response_text = call_ai(local_messages, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct", stats=stats)
         elif AI_response_model.lower() == 'cleans2s':
-            response_text, uid = call_ai(local_messages, '', model_name='cleans2s', uid=uid)
+            response_text, uid = call_ai(local_messages, '', model_name='cleans2s', uid=uid, stats=stats)
     response = {"role": "assistant", "content": response_text}
     local_messages.append(response)
 
@@ -162,12 +316,16 @@ def process_topic(background_name, messages, topic, topic_chosen_list, save_path
         extend_num=extend_num,
         user_prompt_generator=user_prompt_generator,
         AI_response_model=AI_response_model,
-        uid=uid
+        uid=uid,
+        batch_user_prompts=batch_user_prompts,
+        stats=stats
     )
 
     # 树的开始不需要回溯
+    return stats
+
 
-def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_chosen_list, save_path, expand_num=2, extend_num=6, user_prompt_generator=UserPromptGenerator.AI, preset_user_prompt_dict=None, AI_response_model=None, uid=None):
+def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_chosen_list, save_path, expand_num=2, extend_num=6, user_prompt_generator=UserPromptGenerator.AI, preset_user_prompt_dict=None, AI_response_model=None, uid=None, batch_user_prompts=False, stats=None):
     """Recursive DFS tree generation with parallel processing at the first layer.
     user的回答由user_prompt_generator来决定如何生成,AI的回答必定由AI生成
 
@@ -181,11 +339,15 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
         expand_num (int, optional): 树拓展的轮数. Defaults to 2.
         extend_num (int, optional): 树延伸的轮数. Defaults to 6.
         user_prompt_generator (UserPromptGenerator, optional): user_prompt由谁来产生. Defaults to UserPromptGenerator.preset.
+        batch_user_prompts (bool, optional): 由AI生成user_prompt时, 是否一次请求生成同一深度所有话题的user_prompt. Defaults to False.
+        stats (GenerationStats, optional): 本棵树的请求统计, 第一层的每个话题使用各自的统计, 完成后汇总到其中. Defaults to None.
     """
     if depth == expand_num:
-        extend_tree(background_name, messages, topic_hist_list, extend_num, save_path, AI_response_model, uid)
+        extend_tree(background_name, messages, topic_hist_list, extend_num, save_path, AI_response_model, uid, stats)
         return
 
+    batched_user_prompts = sibling_user_prompts(messages, topic_chosen_list, user_prompt_generator, batch_user_prompts, stats)
+
     if depth == 0:
         # Parallelize the first layer
         with ThreadPoolExecutor(max_workers=min(10, len(topic_chosen_list))) as executor:
@@ -202,13 +364,17 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
                     user_prompt_generator,
                     preset_user_prompt_dict,
                     AI_response_model,
-                    uid
+                    uid,
+                    batch_user_prompts,
+                    batched_user_prompts[topic] if batched_user_prompts is not None else None
                 )
                 for topic in topic_chosen_list
             ]
             for future in as_completed(futures):
                 try:
-                    future.result()
+                    topic_stats = future.result()
+                    if stats is not None:
+                        stats.merge(topic_stats)
                 except Exception as e:
                     logger.error(f"Error processing topic: {e}")
     else:
@@ -217,16 +383,18 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
             topic_hist_list.append(topic)
 
             # Generate user prompt
-            if user_prompt_generator == UserPromptGenerator.preset:
+            if batched_user_prompts is not None:
+                user_prompt_text = batched_user_prompts[topic]
+            elif user_prompt_generator == UserPromptGenerator.preset:
                 assert preset_user_prompt_dict is not None, "Error: preset_user_prompt_dict is None"
                 user_prompt_text = preset_user_prompt_dict[topic]
             elif user_prompt_generator == UserPromptGenerator.AI:
                 if SYSTEM_TEST == True:
                     system_prompt = generate_sys_prompt('user', topic)
                     system_prompt['content'] += test_message_in_system_prompt(local_msg)
-                    user_prompt_text = call_ai([local_msg[-1]], system_prompt)
+                    user_prompt_text = call_ai([local_msg[-1]], system_prompt, stats=stats)
                 else:
-                    user_prompt_text = call_ai(local_msg, generate_sys_prompt('user', topic))
+                    user_prompt_text = call_ai(local_msg, generate_sys_prompt('user', topic), stats=stats)
             else:
                 user_prompt_text = input(f"请输入针对话题'{topic}'的内容：")
 
@@ -237,14 +405,14 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
             if SYSTEM_TEST == True:
                 system_prompt = generate_sys_prompt('AI', topic)
                 system_prompt['content'] += test_message_in_system_prompt(local_msg)
-                response_text = call_ai([local_msg[-1]], system_prompt, model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct")
+                response_text = call_ai([local_msg[-1]], system_prompt, model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct", stats=stats)
             else:
                 if AI_response_model.lower() == 'llama':
-                    response_text = call_ai(local_msg, generate_sys_prompt("AI", topic))
+                    response_text = call_ai(local_msg, generate_sys_prompt("AI", topic), stats=stats)
                 elif AI_response_model.lower() == 'qwen':
-                    response_text = call_ai(local_msg, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct")
+                    response_text = call_ai(local_msg, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct", stats=stats)
                 elif AI_response_model.lower() == 'cleans2s':
-                    response_text, uid = call_ai(local_msg, '', model_name='cleans2s', uid=uid)
+                    response_text, uid = call_ai(local_msg, '', model_name='cleans2s', uid=uid, stats=stats)
                     
             response = {"role": "assistant", "content": response_text}
             local_msg.append(response)
@@ -262,7 +430,9 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
                 user_prompt_generator,
                 preset_user_prompt_dict,
                 AI_response_model, 
-                uid
+                uid,
+                batch_user_prompts,
+                stats
             )
 
             local_msg.pop()  # 移除 AI 的响应
@@ -270,7 +440,7 @@ def dfs_generate_tree(background_name, messages, topic_hist_list, depth, topic_c
             topic_hist_list.pop()
 
 
-def extend_tree(background_name, messages, topic_hist_list, extend_num, save_path, AI_response_model, uid):
+def extend_tree(background_name, messages, topic_hist_list, extend_num, save_path, AI_response_model, uid, stats=None):
     """AI自问自答,生成extend_num轮对话
 
     Args:
@@ -279,19 +449,20 @@ def extend_tree(background_name, messages, topic_hist_list, extend_num, save_pat
         topic_hist_list (str): 历史话题, 用于文件保存
         extend_num (int): 对话轮数
         save_path (str): 保存路径
+        stats (GenerationStats): 请求统计, 为None时不记录
     """
     msg = messages[:]
     for _ in range(extend_num):
-        user_prompt_text = call_ai(msg, generate_sys_prompt('user', topic_hist_list[-1]))
+        user_prompt_text = call_ai(msg, generate_sys_prompt('user', topic_hist_list[-1]), stats=stats)
         user_prompt = {"role": "user", "content": user_prompt_text}
         msg.append(user_prompt)
 
         if AI_response_model.lower() == 'llama':
-            response_text = call_ai(msg, generate_sys_prompt("AI", topic))
+            response_text = call_ai(msg, generate_sys_prompt("AI", topic), stats=stats)
         elif AI_response_model.lower() == 'qwen':
-            response_text = call_ai(msg, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct")
+            response_text = call_ai(msg, generate_sys_prompt("AI", topic), model_url="http://14.103.16.79:11001/v1", model_name="Qwen25_72B_instruct", stats=stats)
         elif AI_response_model.lower() == 'cleans2s':
-            response_text, uid = call_ai(msg, '', model_name='cleans2s', uid=uid)
+            response_text, uid = call_ai(msg, '', model_name='cleans2s', uid=uid, stats=stats)
         response = {"role": "assistant", "content": response_text}
         msg.append(response)
 
@@ -339,7 +510,9 @@ if __name__ == "__main__":
         user_prompt_generator_type = UserPromptGenerator.AI
 
     AI_response_model = config.get("AI_response_model", '')
+    batch_user_prompts = config.get("batch_sibling_user_prompts", False)
 
+    stats = GenerationStats()
     dfs_generate_tree(
         background_name=background_name, 
         messages=background_prompt, 
@@ -351,5 +524,8 @@ if __name__ == "__main__":
         extend_num=6, 
         user_prompt_generator=user_prompt_generator_type,
         preset_user_prompt_dict=preset_user_prompt_dict,
-        AI_response_model = AI_response_model
+        AI_response_model = AI_response_model,
+        batch_user_prompts=batch_user_prompts,
+        stats=stats
     )
+    stats.log_summary()
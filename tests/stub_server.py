@@ -0,0 +1,39 @@
+"""OpenAI兼容接口的最小实现, 通过httpx.MockTransport在进程内响应请求, 不占用端口"""
+import json
+
+import httpx
+
+RESPONSE_TOKENS = ["a", " b", " c", " d"]
+PROMPT_TOKENS = 12
+
+
+def chat_completion(request):
+    """非流式时返回完整回答与usage; 流式时逐token返回SSE分块, 最后一个分块携带usage"""
+    body = json.loads(request.content)
+    usage = {
+        "prompt_tokens": PROMPT_TOKENS,
+        "completion_tokens": len(RESPONSE_TOKENS),
+        "total_tokens": PROMPT_TOKENS + len(RESPONSE_TOKENS)
+    }
+    if body.get("stream") is True:
+        chunks = [
+            {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]} for token in RESPONSE_TOKENS
+        ]
+        chunks.append({"choices": [], "usage": usage})
+        text = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=text.encode("utf-8"), headers={"Content-Type": "text/event-stream"})
+    return httpx.Response(
+        200,
+        json={
+            "model": body["model"],
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "".join(RESPONSE_TOKENS)}, "finish_reason": "stop"}
+            ],
+            "usage": usage
+        }
+    )
+
+
+def stub_client(timeout=None, handler=chat_completion):
+    """与utils.runner.make_client签名一致, 请求由handler在进程内处理"""
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
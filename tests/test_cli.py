@@ -0,0 +1,94 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from utils.cli import plan_workload, validate_config
+from utils.file_helper import ConfigError
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    return path
+
+
+def dry_run_modules(config_path):
+    """在独立进程中执行--dry-run, 返回其间导入的HEAVY_MODULES"""
+    code = textwrap.dedent(
+        f"""
+        import json, sys
+        from utils.cli import HEAVY_MODULES, main
+        main(["--config", {str(config_path)!r}, "--dry-run"])
+        print(json.dumps([name for name in HEAVY_MODULES if name in sys.modules]))
+        """
+    )
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "synthetic",
+    [
+        {"num_prompts": 4, "calibrate_with": "m1"},
+        {"num_prompts": 4, "tokenizer": "meta-llama/Llama-3.3-70B-Instruct"}
+    ]
+)
+def test_dry_run_does_not_import_heavy_modules(tmp_path, synthetic):
+    # 端口上没有服务, dry-run若发送校准请求会失败
+    config = {"save_path": str(tmp_path), "models": [{"name": "m1", "url": "http://127.0.0.1:9"}], "synthetic": synthetic}
+    assert dry_run_modules(write_config(tmp_path, config)) == []
+
+
+def test_plan_workload_counts_variant_requests(tmp_path):
+    for idx in range(3):
+        (tmp_path / f"prompt_{idx}.txt").write_text("hello", encoding="utf-8")
+    config = {
+        "load_path": str(tmp_path),
+        "models": [{"name": "m1", "urls": ["http://a", "http://b"]}, {"name": "m2", "url": "http://c"}],
+        "workload_matrix": [
+            {"name": "short", "model_config": {"max_tokens": 16}},
+            {"name": "long", "model_config": {"max_tokens": 1024}, "models": ["m1"], "prompts": ["prompt_0*"]}
+        ]
+    }
+    plan = plan_workload(config)
+    assert plan["prompts"] == 3
+    m1, m2 = plan["models"]
+    assert m1["endpoints"] == ["http://a", "http://b"]
+    assert m1["balance"] == "round_robin"
+    assert m1["variants"] == ["short", "long"]
+    assert m1["requests"] == 3 + 1
+    assert m2["variants"] == ["short"]
+    assert m2["requests"] == 3
+
+
+def test_plan_workload_lists_synthetic_prompts_without_tokenizer(tmp_path):
+    config = {
+        "models": [{"name": "m1", "url": "http://127.0.0.1:9"}],
+        "synthetic": {"num_prompts": 5, "calibrate_with": "m1"}
+    }
+    plan = plan_workload(config)
+    assert plan["prompts"] == 5
+    assert plan["models"][0]["requests"] == 5
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        {"load_path": "missing"},
+        {"load_config": {"mode": 0, "load_path": "missing"}},
+        {"load_config": {"mode": 1, "load_prompt_path": "missing.json", "load_images_path": "missing"}},
+        {"scenario": "replay", "replay": {"trace": "missing.jsonl"}}
+    ]
+)
+def test_validate_config_rejects_missing_input_paths(tmp_path, monkeypatch, source):
+    monkeypatch.chdir(tmp_path)
+    config = {"models": [{"name": "m1", "url": "http://127.0.0.1:9"}], **source}
+    with pytest.raises(ConfigError):
+        validate_config(config)
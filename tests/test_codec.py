@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from utils.codec import JSONCodec, RequestEncoder, load_codec
+from utils.file_helper import ConfigError
+from utils.prompt_source import PromptItem
+
+MESSAGES = [{"role": "system", "content": "你是一个助手"}, {"role": "user", "content": "hello \"world\"\n"}]
+
+
+def codecs():
+    names = ["json"]
+    for name in ["orjson", "msgspec"]:
+        try:
+            __import__(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+@pytest.mark.parametrize("codec_name", codecs())
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {},
+        {"model": "m1"},
+        {"model": "m1", "max_tokens": 16, "stream": True, "stream_options": {"include_usage": True}}
+    ]
+)
+def test_encoded_body_matches_plain_json(codec_name, fields):
+    encoder = RequestEncoder(load_codec(codec_name))
+    body = encoder.encode(PromptItem("p0", MESSAGES), fields)
+    assert json.loads(body) == {"messages": MESSAGES, **fields}
+
+
+def test_messages_are_serialized_once_per_prompt():
+    calls = []
+
+    class CountingCodec(JSONCodec):
+        def dumps(self, obj):
+            calls.append(obj)
+            return super().dumps(obj)
+
+    encoder = RequestEncoder(CountingCodec())
+    item = PromptItem("p0", MESSAGES)
+    for model_name in ["m1", "m2", "m3"]:
+        encoder.encode(item, {"model": model_name})
+    assert sum(1 for obj in calls if obj is MESSAGES) == 1
+
+
+def test_cache_is_bounded_by_bytes():
+    encoder = RequestEncoder(JSONCodec(), max_cache_bytes=200)
+    items = [PromptItem(f"p{idx}", [{"role": "user", "content": "x" * 100}]) for idx in range(5)]
+    for item in items:
+        encoder.encode(item, {"model": "m1"})
+    assert encoder.cache_bytes <= 200
+    # 最近使用的prompt保留在缓存中
+    assert id(items[-1]) in encoder.cache
+    assert id(items[0]) not in encoder.cache
+
+
+def test_oversized_prompt_is_still_encoded():
+    encoder = RequestEncoder(JSONCodec(), max_cache_bytes=10)
+    item = PromptItem("p0", MESSAGES)
+    assert json.loads(encoder.encode(item, {"model": "m1"}))["messages"] == MESSAGES
+    assert len(encoder.cache) == 1
+
+
+def test_invalid_codec_raises_config_error():
+    with pytest.raises(ConfigError):
+        load_codec("simdjson")
@@ -0,0 +1,29 @@
+import pytest
+
+# 生成脚本在模块级导入openai和requests
+pytest.importorskip("openai")
+pytest.importorskip("requests")
+
+from conversation_tree.generate_conversation_tree import parse_batch_user_prompts  # noqa: E402
+
+TOPICS = ["天气", "旅行"]
+
+
+def test_parse_batch_user_prompts_strips_surrounding_text():
+    content = '好的，以下是结果：\n```json\n{"天气": " 明天会下雨吗？ ", "旅行": "推荐一个海边城市"}\n```'
+    assert parse_batch_user_prompts(content, TOPICS) == {"天气": "明天会下雨吗？", "旅行": "推荐一个海边城市"}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "没有JSON",
+        '{"天气": "明天会下雨吗？"}',
+        '{"天气": "明天会下雨吗？", "旅行": "  "}',
+        '{"天气": "明天会下雨吗？", "旅行": 1}',
+        '{"天气": "明天会下雨吗？", "旅行": "推荐一个城市"',
+        '["天气", "旅行"]'
+    ]
+)
+def test_parse_batch_user_prompts_returns_none_when_a_topic_is_missing(content):
+    assert parse_batch_user_prompts(content, TOPICS) is None
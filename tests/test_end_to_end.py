@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import utils.runner as runner
+from tests.stub_server import PROMPT_TOKENS, RESPONSE_TOKENS, stub_client
+from utils.cli import run, validate_config
+
+MODELS = [{"name": "stub-a", "url": "http://stub-a"}, {"name": "stub-b", "url": "http://stub-b"}]
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """所有请求由进程内的stub服务处理"""
+    monkeypatch.setattr(runner, "make_client", stub_client)
+
+
+@pytest.fixture
+def config(tmp_path):
+    prompt_path = tmp_path / "prompts"
+    prompt_path.mkdir()
+    for idx in range(3):
+        (prompt_path / f"prompt_{idx}.json").write_text(
+            json.dumps([{"role": "user", "content": f"question {idx}"}]), encoding="utf-8"
+        )
+    return {
+        "load_path": str(prompt_path),
+        "save_path": str(tmp_path / "results"),
+        "models": MODELS,
+        "model_config": {"max_tokens": 8},
+        "summary": {"model_summary": True, "file_summary": True},
+        "report": {"format": "csv"},
+        "registry": {"path": str(tmp_path / "runs"), "label": "stub"}
+    }
+
+
+def test_default_scenario_against_stub_server(stub_server, config, tmp_path):
+    validate_config(config)
+    results = run(config)
+
+    assert len(results) == len(MODELS) * 3
+    assert all(record.ok for record in results)
+    assert {(record.prompt_tokens, record.decode_tokens) for record in results} == {(PROMPT_TOKENS, len(RESPONSE_TOKENS))}
+    assert {record.response for record in results} == {"".join(RESPONSE_TOKENS)}
+
+    output_files = sorted(path.name for path in (tmp_path / "results").iterdir() if path.is_file())
+    assert any(name.startswith("model_summary_table_") and name.endswith(".csv") for name in output_files)
+    assert any(name.startswith("file_summary_table_") and name.endswith(".csv") for name in output_files)
+
+    index = [json.loads(line) for line in (tmp_path / "runs" / "index.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert len(index) == 1 and index[0]["label"] == "stub"
+
+
+def test_streaming_with_warmup_against_stub_server(stub_server, config):
+    config["model_config"]["stream"] = True
+    config["warmup"] = {"requests": 2}
+    config["save_response"] = False
+    results = run(config)
+
+    warmup = [record for record in results if record.warmup]
+    measured = [record for record in results if not record.warmup]
+    assert len(warmup) == len(MODELS) * 2
+    assert len(measured) == len(MODELS) * 3
+    assert all(record.ok and record.ttft >= 0 for record in measured)
+    assert {record.decode_tokens for record in measured} == {len(RESPONSE_TOKENS)}
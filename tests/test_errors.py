@@ -0,0 +1,69 @@
+import httpx
+import pytest
+
+from utils.errors import (
+    CANCELLED, CONNECT, HTTP_STATUS, MALFORMED_USAGE, NETWORK, OTHER, READ_TIMEOUT, TIMEOUT, ClientCancelled,
+    MalformedUsageError, RetryPolicy, classify_error, error_status_code, parse_usage
+)
+
+
+def status_error(status_code):
+    request = httpx.Request("POST", "http://stub/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError(f"status {status_code}", request=request, response=response)
+
+
+def test_parse_usage_reads_token_counts():
+    assert parse_usage({"usage": {"prompt_tokens": 10, "completion_tokens": 3}}) == (10, 3)
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        {},
+        {"usage": None},
+        {"usage": {"prompt_tokens": 10}},
+        {"usage": {"prompt_tokens": "10", "completion_tokens": 3}},
+        ["not", "a", "dict"]
+    ]
+)
+def test_parse_usage_rejects_malformed_usage(result):
+    with pytest.raises(MalformedUsageError):
+        parse_usage(result)
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (status_error(503), HTTP_STATUS),
+        (httpx.ConnectError("refused"), CONNECT),
+        (httpx.ConnectTimeout("connect timeout"), CONNECT),
+        (httpx.ReadTimeout("read timeout"), READ_TIMEOUT),
+        (httpx.PoolTimeout("pool timeout"), TIMEOUT),
+        (MalformedUsageError("no usage"), MALFORMED_USAGE),
+        (ClientCancelled("cancelled after 8 tokens"), CANCELLED),
+        (httpx.RemoteProtocolError("peer closed"), NETWORK),
+        (KeyError("choices"), OTHER)
+    ]
+)
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_error_status_code():
+    assert error_status_code(status_error(429)) == 429
+    assert error_status_code(httpx.ConnectError("refused")) == -1
+
+
+def test_retry_policy_never_retries_cancelled_requests():
+    policy = RetryPolicy(max_retries=3, retry_on=[CANCELLED, CONNECT])
+    assert policy.should_retry(httpx.ConnectError("refused"), 1)
+    assert not policy.should_retry(ClientCancelled("cancelled"), 1)
+    assert not policy.should_retry(httpx.ConnectError("refused"), 4)
+
+
+def test_retry_policy_retries_only_configured_status_codes():
+    policy = RetryPolicy(max_retries=2)
+    assert policy.should_retry(status_error(503), 1)
+    assert not policy.should_retry(status_error(400), 1)
+    assert policy.delay(1) == 1.0 and policy.delay(3) == 4.0
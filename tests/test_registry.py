@@ -0,0 +1,31 @@
+from utils.registry import config_fingerprint, redact_config
+
+BASE_CONFIG = {
+    "load_path": "prompts",
+    "model_config": {"max_tokens": 128},
+    "models": [{"name": "m1", "url": "http://localhost:8000", "api_key": "secret"}]
+}
+
+
+def test_fingerprint_ignores_output_and_instrumentation_keys():
+    changed = {
+        **BASE_CONFIG,
+        "save_path": "other",
+        "report": {"format": "csv"},
+        "profiling": {"profiler": "cprofile"},
+        "json_codec": "orjson",
+        "live_metrics": {"window": 5},
+        "summary": {"error_summary": True},
+        "models": [{**BASE_CONFIG["models"][0], "api_key": "rotated", "gpu_url": "http://localhost:5000"}]
+    }
+    assert config_fingerprint(changed) == config_fingerprint(BASE_CONFIG)
+
+
+def test_fingerprint_changes_with_workload():
+    assert config_fingerprint({**BASE_CONFIG, "model_config": {"max_tokens": 256}}) != config_fingerprint(BASE_CONFIG)
+    assert config_fingerprint({**BASE_CONFIG, "adaptive_sampling": {"tolerance": 0.1}}) != config_fingerprint(BASE_CONFIG)
+
+
+def test_redact_config_hides_nested_secrets():
+    redacted = redact_config({"models": [{"name": "m1", "api_key": "secret", "hf_token": "t"}], "retry": {"max_retries": 2}})
+    assert redacted == {"models": [{"name": "m1", "api_key": "***", "hf_token": "***"}], "retry": {"max_retries": 2}}
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from tests.stub_server import PROMPT_TOKENS, RESPONSE_TOKENS, chat_completion, stub_client
+from utils.errors import RetryPolicy
+from utils.live_metrics import LiveMetrics
+from utils.prompt_source import PromptItem
+from utils.runner import RunContext, process_model
+from utils.workload import WorkloadVariant
+
+MODEL = {"name": "stub-model", "url": "http://stub"}
+
+
+class FailingTokenCounter:
+    tolerance = 0.05
+
+    def count(self, model, messages, response):
+        raise RuntimeError("tokenizer crashed")
+
+
+def run_process_model(context, handler=chat_completion, variant=None):
+    async def run():
+        async with stub_client(handler=handler) as client:
+            item = PromptItem("p0", [{"role": "user", "content": "hi"}])
+            return await process_model(client, 0, MODEL, item, "", context, variant)
+    return asyncio.run(run())
+
+
+def test_process_model_records_server_usage():
+    context = RunContext(save_response=False, metrics=LiveMetrics())
+    record = run_process_model(context)
+    assert record.ok
+    assert (record.prompt_tokens, record.decode_tokens) == (PROMPT_TOKENS, len(RESPONSE_TOKENS))
+    assert context.metrics.models[MODEL["name"]].in_flight == 0
+    assert context.metrics.models[MODEL["name"]].completed == 1
+
+
+def test_in_flight_is_released_when_token_counting_raises():
+    context = RunContext(save_response=False, metrics=LiveMetrics(), token_counter=FailingTokenCounter())
+    with pytest.raises(RuntimeError):
+        run_process_model(context)
+    item = context.metrics.models[MODEL["name"]]
+    assert item.in_flight == 0
+    assert item.failed == 1
+
+
+def test_in_flight_is_released_when_cancelled_during_retry_backoff():
+    context = RunContext(save_response=False, metrics=LiveMetrics(), retry_policy=RetryPolicy(max_retries=3, backoff=60))
+
+    def unavailable(request):
+        return httpx.Response(503)
+
+    async def run():
+        async with stub_client(handler=unavailable) as client:
+            item = PromptItem("p0", [{"role": "user", "content": "hi"}])
+            task = asyncio.create_task(process_model(client, 0, MODEL, item, "", context))
+            while context.metrics.models.get(MODEL["name"]) is None or context.metrics.models[MODEL["name"]].in_flight == 0:
+                await asyncio.sleep(0)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(run())
+    assert context.metrics.models[MODEL["name"]].in_flight == 0
+
+
+def test_variant_can_turn_streaming_off():
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return chat_completion(request)
+
+    context = RunContext(save_response=False, model_config={"stream": True}, stream=True)
+    record = run_process_model(context, handler, WorkloadVariant("no-stream", {"stream": False}))
+    assert record.ok
+    assert bodies[0]["stream"] is False
+    assert "stream_options" not in bodies[0]
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import utils.slo_search as slo_search
+from utils.record import RequestResult
+from utils.runner import RunContext
+from utils.slo_search import evaluate_slo, search_model, slo_config_from
+
+MODEL = {"name": "m1", "url": "http://stub"}
+
+
+def fake_results(load, ttft_per_load=0.1, num_requests=20):
+    """首token时间随负载线性增长, tpot固定为10ms"""
+    ttft = load * ttft_per_load
+    return [
+        RequestResult(f"p{idx}", MODEL["name"], float(idx), float(idx) + ttft + 0.01 * 9, decode_tokens=10, ttft=ttft)
+        for idx in range(num_requests)
+    ]
+
+
+@pytest.fixture
+def fake_load(monkeypatch):
+    """替换开环和闭环负载, 记录每次探测的负载"""
+    probed = []
+
+    async def run_loop(client, model, prompts, load, context, duration=None, num_requests=None, **kwargs):
+        probed.append(load)
+        return fake_results(load)
+
+    monkeypatch.setattr(slo_search, "run_open_loop", run_loop)
+    monkeypatch.setattr(slo_search, "run_closed_loop", run_loop)
+    return probed
+
+
+def search(search_config):
+    config = {"slo_search": {"ttft": 2.0, "tpot": 0.1, "cooldown": 0, "bootstrap": 50, "max_iterations": 20, **search_config}}
+    return asyncio.run(search_model(None, MODEL, [], slo_config_from(config), RunContext(save_response=False)))
+
+
+def test_rate_search_converges_below_the_slo_limit(fake_load):
+    best, steps = search({"search": "rate", "min_load": 1, "max_load": 64, "tolerance": 0.05})
+    # ttft = 0.1 * rate, SLO为2秒, 可持续的最大速率为20
+    assert 20 * 0.95 <= best["load"] <= 20
+    assert best["passed"]
+    assert fake_load[:2] == [1, 64]
+    assert len(steps) == len(fake_load)
+
+
+def test_concurrency_search_finds_the_exact_limit(fake_load):
+    best, _ = search({"search": "concurrency", "min_load": 1, "max_load": 64})
+    assert best["load"] == 20
+    assert all(isinstance(load, int) for load in fake_load)
+
+
+def test_search_stops_when_the_minimum_load_fails(fake_load):
+    best, steps = search({"search": "rate", "min_load": 30, "max_load": 64})
+    assert best is None
+    assert fake_load == [30]
+
+
+def test_search_reports_the_maximum_load_when_it_passes(fake_load):
+    best, _ = search({"search": "rate", "min_load": 1, "max_load": 10})
+    assert best["load"] == 10
+    assert fake_load == [1, 10]
+
+
+def test_failed_requests_count_as_infinite_latency():
+    results = fake_results(1)
+    results[0].error = "ReadTimeout: timed out"
+    evaluation = evaluate_slo(results, 1, {"ttft": 2.0, "tpot": 0.1, "percentile": 99, "bootstrap": 50, "confidence": 0.95})
+    assert evaluation["failed"] == 1
+    assert not evaluation["passed"]
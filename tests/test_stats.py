@@ -0,0 +1,51 @@
+import math
+
+import pytest
+
+from utils.stats import bootstrap, bootstrap_ci, mean, percentile, percentile_ci
+
+
+def test_percentile_interpolates_linearly():
+    values = [4, 1, 3, 2]
+    assert percentile(values, 0) == 1
+    assert percentile(values, 100) == 4
+    assert percentile(values, 50) == pytest.approx(2.5)
+    assert percentile(values, 90) == pytest.approx(3.7)
+
+
+def test_percentile_of_empty_values_is_minus_one():
+    assert percentile([], 50) == -1
+    assert mean([]) == -1
+
+
+def test_percentile_with_infinite_values():
+    # 失败的请求在SLO评估中记为无穷大时延
+    assert percentile([1, 2, math.inf], 50) == 2
+    assert percentile([1, 2, math.inf], 99) == math.inf
+
+
+def test_bootstrap_is_reproducible():
+    values = list(range(20))
+    assert bootstrap(values, mean, 50, seed=3) == bootstrap(values, mean, 50, seed=3)
+    assert bootstrap([], mean) == []
+
+
+def test_bootstrap_ci_contains_the_sample_mean():
+    values = [float(x) for x in range(100)]
+    lower, upper = bootstrap_ci(values, mean, confidence=0.95, num_resamples=500)
+    assert lower < mean(values) < upper
+    assert bootstrap_ci([], mean) == (-1, -1)
+
+
+def test_percentile_ci_uses_order_statistics():
+    values = list(range(1, 201))
+    lower, upper = percentile_ci(values, 50, confidence=0.95)
+    assert lower < percentile(values, 50) < upper
+    assert lower in values and upper in values
+
+
+def test_percentile_ci_needs_enough_samples():
+    # P90在95%置信水平下至少需要约60个样本
+    assert percentile_ci(list(range(20)), 90) == (-1, -1)
+    assert percentile_ci([1.0], 50) == (-1, -1)
+    assert percentile_ci(list(range(100)), 90) != (-1, -1)
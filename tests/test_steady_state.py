@@ -0,0 +1,36 @@
+import pytest
+
+from utils.record import RequestResult
+from utils.steady_state import mark_warmup, metric_results, steady_state_window
+
+
+def staggered_records(num_requests=4, duration=20):
+    """第i个请求在第i秒开始, 持续duration秒: 开始时逐个爬升, 结束时逐个排空"""
+    return [RequestResult(f"p{idx}", "m1", float(idx), float(idx + duration), decode_tokens=10) for idx in range(num_requests)]
+
+
+def test_steady_state_window_excludes_ramp_up_and_drain():
+    start, end, reference, mean_in_flight = steady_state_window(staggered_records(), ratio=0.8, reference=90)
+    # 在途请求数在第3秒达到4, 在第20秒第一个请求结束时降为3
+    assert (start, end) == (3.0, 20.0)
+    assert reference == pytest.approx(4)
+    assert mean_in_flight == pytest.approx(4)
+
+
+def test_steady_state_window_lower_ratio_widens_the_window():
+    start, end, _, mean_in_flight = steady_state_window(staggered_records(), ratio=0.5, reference=90)
+    assert (start, end) == (1.0, 22.0)
+    assert 3 < mean_in_flight < 4
+
+
+def test_steady_state_window_needs_records():
+    assert steady_state_window([]) is None
+    # 未结束的请求不计入在途请求数
+    assert steady_state_window([RequestResult("p0", "m1", 0.0)]) is None
+
+
+def test_mark_warmup_per_model():
+    records = staggered_records() + [RequestResult("p0", "m2", 0.0, 5.0)]
+    marked = mark_warmup(records, {"requests": 2, "duration": 0})
+    assert marked == 3
+    assert [record.prompt for record in metric_results(records)] == ["p2", "p3"]
@@ -0,0 +1,11 @@
+from utils.summary import synthetic_summary_table, vlm_sweep_summary_table
+
+
+def test_vlm_sweep_summary_skips_empty_results(tmp_path):
+    vlm_sweep_summary_table([], {}, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_synthetic_summary_skips_empty_results(tmp_path):
+    synthetic_summary_table([], {}, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
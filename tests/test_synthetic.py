@@ -0,0 +1,26 @@
+import pytest
+
+from utils.file_helper import ConfigError
+from utils.synthetic import SyntheticSource
+
+
+def test_calibration_failure_falls_back_to_uncalibrated_tokenizer():
+    # 端口上没有服务, 校准请求会失败
+    source = SyntheticSource({"num_prompts": 2, "calibrate_with": "m1"}, [{"name": "m1", "url": "http://127.0.0.1:9"}])
+    source.prepare()
+    assert source.tokenizer.tokens_per_word == 1.0
+    assert source.tokenizer.overhead == 0
+    assert [prompt_item.name for prompt_item in source] == ["synthetic_0", "synthetic_1"]
+
+
+def test_unknown_calibrate_with_model_raises_config_error():
+    with pytest.raises(ConfigError):
+        SyntheticSource({"calibrate_with": "missing"}, [{"name": "m1", "url": "http://127.0.0.1:9"}])
+
+
+def test_same_seed_generates_same_workload():
+    config = {"num_prompts": 3, "input_len": {"type": "uniform", "min": 16, "max": 64}, "output_len": 8, "seed": 7}
+    first = [(item.messages, item.params) for item in SyntheticSource(config)]
+    second = [(item.messages, item.params) for item in SyntheticSource(config)]
+    assert first == second
+    assert all(params == {"max_tokens": 8, "ignore_eos": True} for _, params in first)
@@ -0,0 +1,126 @@
+import logging
+import os
+import re
+
+from utils.file_helper import ConfigError
+from utils.stats import mean, mean_ci, percentile, percentile_ci
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_ADAPTIVE_SAMPLING_CONFIG = {
+    "enabled": True,
+    "metrics": ["mean_decode_speed", "p90_latency"],    # 需要收敛的指标, 格式为mean_<字段>或p<分位数>_<字段>
+    "tolerance": 0.05,      # 置信区间半宽不超过估计值的该比例时视为收敛
+    "confidence": 0.95,     # 置信区间的置信水平
+    "min_samples": 20,      # 每个单元至少需要的成功请求数, 避免过早停止
+    "max_samples": 500,     # 每个单元最多发送的请求数, 达到后即使未收敛也停止
+    "batch": 10             # 每个单元每轮同时发送的请求数, 每轮结束后检查是否收敛
+}
+
+# 可用于收敛判断的字段, 只统计成功的请求
+METRIC_FIELDS = {
+    "latency": lambda record: record.elapsed_time,
+    "decode_speed": lambda record: record.decode_speed,
+    "ttft": lambda record: record.ttft,
+    "tpot": lambda record: record.tpot
+}
+
+METRIC_PATTERN = re.compile(r"^(mean|p(\d+(?:\.\d+)?))_(" + "|".join(METRIC_FIELDS) + r")$")
+
+
+class AdaptiveSampler:
+    """自适应采样: 每个模型(配置了workload_matrix时为每个模型与变体的组合, 称为单元)循环发送prompt,
+    直到所有目标指标的置信区间足够窄, 已收敛的单元提前停止, 其余单元继续发送
+
+    均值使用正态近似的置信区间, 分位数使用次序统计量给出的非参数置信区间,
+    二者都不需要重采样, 每轮检查的开销可以忽略
+
+    Attributes:
+        metrics (list): 目标指标名称, 如mean_decode_speed, p90_latency
+        tolerance (float): 置信区间半宽相对估计值的上限
+        confidence (float): 置信水平
+        min_samples (int): 每个单元至少需要的成功请求数
+        max_samples (int): 每个单元最多发送的请求数
+        batch (int): 每轮同时发送的请求数
+    """
+
+    def __init__(self, metrics, tolerance=0.05, confidence=0.95, min_samples=20, max_samples=500, batch=10):
+        self.metrics = metrics
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.batch = batch
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的adaptive_sampling字段构造, 未配置或enabled为false时返回None, 不合法时抛出ConfigError"""
+        if config.get("adaptive_sampling", None) is None:
+            return None
+        merged = dict(DEFAULT_ADAPTIVE_SAMPLING_CONFIG)
+        merged.update(config["adaptive_sampling"])
+        if merged["enabled"] is False:
+            return None
+        if len(merged["metrics"]) == 0:
+            logger.error("adaptive_sampling.metrics must not be empty")
+            raise ConfigError
+        for metric in merged["metrics"]:
+            match = METRIC_PATTERN.match(metric)
+            if match is None or (match.group(2) is not None and not 0 < float(match.group(2)) < 100):
+                logger.error(
+                    f"Invalid adaptive_sampling metric: {metric}, expected mean_<field> or p<q>_<field> "
+                    f"with field in {list(METRIC_FIELDS)}"
+                )
+                raise ConfigError
+        if merged["tolerance"] <= 0 or not 0 < merged["confidence"] < 1:
+            logger.error("adaptive_sampling requires tolerance > 0 and 0 < confidence < 1")
+            raise ConfigError
+        if not 0 < merged["min_samples"] <= merged["max_samples"] or merged["batch"] <= 0:
+            logger.error("adaptive_sampling requires 0 < min_samples <= max_samples and batch > 0")
+            raise ConfigError
+        return cls(
+            merged["metrics"], merged["tolerance"], merged["confidence"], merged["min_samples"], merged["max_samples"],
+            merged["batch"]
+        )
+
+    def precision(self, records):
+        """计算每个目标指标的估计值, 置信区间以及置信区间半宽相对估计值的比例
+
+        Args:
+            records (list): 单元内的RequestResult, 失败的请求不参与统计
+
+        Returns:
+            dict: {指标名称: {"samples", "estimate", "ci", "relative"}}, 无法计算时relative为-1
+        """
+        ok = [record for record in records if record.ok]
+        result = {}
+        for metric in self.metrics:
+            statistic, q, field = METRIC_PATTERN.match(metric).groups()
+            values = [value for value in map(METRIC_FIELDS[field], ok) if value >= 0]
+            if statistic == "mean":
+                estimate = mean(values)
+                ci = mean_ci(values, self.confidence)
+            else:
+                estimate = percentile(values, float(q))
+                ci = percentile_ci(values, float(q), self.confidence)
+            relative = -1
+            if ci != (-1, -1) and estimate > 0:
+                relative = (ci[1] - ci[0]) / 2 / estimate
+            result[metric] = {"samples": len(values), "estimate": estimate, "ci": ci, "relative": relative}
+        return result
+
+    def converged(self, precision):
+        """所有目标指标的样本数不少于min_samples且置信区间半宽不超过tolerance"""
+        return all(
+            item["samples"] >= self.min_samples and 0 <= item["relative"] <= self.tolerance for item in precision.values()
+        )
+
+    def describe(self, precision):
+        return ", ".join(
+            f"{metric} = {item['estimate']:.4g} ±{item['relative'] * 100:.1f}%" if item["relative"] >= 0 else f"{metric} = n/a"
+            for metric, item in precision.items()
+        )
@@ -0,0 +1,76 @@
+import logging
+import os
+import random
+
+from utils.file_helper import ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+BALANCE_POLICIES = ["round_robin", "least_outstanding", "power_of_two"]
+
+
+def model_urls(model):
+    """模型的所有副本地址, 配置了urls时为多个副本, 否则为url"""
+    if 'urls' in model:
+        return list(model['urls'])
+    return [model['url']]
+
+
+class EndpointBalancer:
+    """在同一模型的多个副本之间分配请求
+
+    round_robin: 依次轮询; least_outstanding: 选择在途请求最少的副本, 相同时轮询;
+    power_of_two: 随机选择两个副本, 取在途请求较少的一个.
+    所有操作都在事件循环线程中进行, 无需加锁
+
+    Args:
+        urls (list): 副本地址
+        policy (str): 负载均衡策略
+        seed (int): power_of_two的随机种子
+    """
+
+    def __init__(self, urls, policy="round_robin", seed=0):
+        if policy not in BALANCE_POLICIES:
+            logger.error(f"Invalid balance policy: {policy}, expected one of {BALANCE_POLICIES}")
+            raise ConfigError
+        assert len(urls) > 0, "At least one url is required"
+        self.urls = urls
+        self.policy = policy
+        self.outstanding = {url: 0 for url in urls}
+        self.next_idx = 0
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_model(cls, model):
+        """由model的config构造, 只有一个副本时返回None"""
+        urls = model_urls(model)
+        if len(urls) <= 1:
+            return None
+        return cls(urls, model.get('balance', "round_robin"), model.get('balance_seed', 0))
+
+    def round_robin(self):
+        url = self.urls[self.next_idx % len(self.urls)]
+        self.next_idx += 1
+        return url
+
+    def acquire(self):
+        """选择一个副本并将其在途请求数加1"""
+        if self.policy == "round_robin":
+            url = self.round_robin()
+        elif self.policy == "least_outstanding":
+            start = self.next_idx % len(self.urls)
+            self.next_idx += 1
+            ordered = self.urls[start:] + self.urls[:start]
+            url = min(ordered, key=lambda x: self.outstanding[x])
+        else:
+            first, second = self.rng.sample(self.urls, 2)
+            url = first if self.outstanding[first] <= self.outstanding[second] else second
+        self.outstanding[url] += 1
+        return url
+
+    def release(self, url):
+        self.outstanding[url] -= 1
@@ -0,0 +1,302 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+
+from utils.errors import CANCELLED
+from utils.file_helper import ConfigError, ModelConfigError, validate_model_config_params
+from utils.interference import select_prompts
+from utils.runner import DEFAULT_TIMEOUT, log_config_info, make_client, process_model, run_monitored, streaming_context
+from utils.stats import gpu_window, mean, percentile
+from utils.workload import WorkloadVariant
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_CANCELLATION_CONFIG = {
+    "prompts": None,            # 使用的prompt名称模式(支持*和?通配符), 为null时使用所有prompt
+    "model_config": {},         # 请求参数, 在全局model_config之后应用, 应使生成足够长, 如{"max_tokens": 1024, "ignore_eos": true}
+    "concurrency": [8],         # 同时在途的请求数, 可以为整数或列表, 每个并发数分别测试基线与取消两个阶段
+    "fraction": 0.5,            # 取消阶段中被主动断开的请求比例
+    "after_tokens": 32,         # 收到该数量的token后断开, 为null时不按token数断开
+    "after_seconds": None,      # 请求发出该秒数后断开, 为null时不按时间断开, 与after_tokens同时给出时以先达到者为准
+    "duration": 60,             # 每个阶段发送请求的时间, 单位为秒
+    "num_requests": None,       # 每个阶段的请求数, 给出时与duration以先达到者为准
+    "cooldown": 10,             # 每个阶段前后的等待时间, 之前的采样作为空闲显存, 之后的采样用于观察显存释放
+    "memory_tolerance": 256,    # 显存回落到空闲显存加该值(MiB)以内即视为已释放
+    "percentile": 99,           # 除P50外额外报告的分位数
+    "seed": 0
+}
+
+
+@dataclass(slots=True)
+class CancelPoint:
+    """请求被主动断开的时机, 由process_model使用, 两项都给出时以先达到者为准
+
+    Attributes:
+        tokens (int): 收到该数量的token后断开, 为None时不按token数断开
+        seconds (float): 请求发出该秒数后断开, 为None时不按时间断开
+    """
+    tokens: int = None
+    seconds: float = None
+
+
+def cancellation_config_from(config):
+    """config中的cancellation字段与默认值合并并校验, 不合法时抛出ConfigError或ModelConfigError"""
+    cancellation_config = dict(DEFAULT_CANCELLATION_CONFIG)
+    cancellation_config.update(config.get("cancellation", {}))
+    levels = cancellation_config["concurrency"]
+    if isinstance(levels, int):
+        levels = [levels]
+    if len(levels) == 0 or any(not isinstance(level, int) or level <= 0 for level in levels):
+        logger.error(f"cancellation.concurrency must be a positive integer or a list of them, got {levels}")
+        raise ConfigError
+    cancellation_config["concurrency"] = levels
+    if not 0 < cancellation_config["fraction"] <= 1:
+        logger.error(f"cancellation.fraction must be in (0, 1], got {cancellation_config['fraction']}")
+        raise ConfigError
+    if cancellation_config["after_tokens"] is None and cancellation_config["after_seconds"] is None:
+        logger.error("cancellation.after_tokens or cancellation.after_seconds must be provided")
+        raise ConfigError
+    if cancellation_config["duration"] is None and cancellation_config["num_requests"] is None:
+        logger.error("cancellation.duration or cancellation.num_requests must be provided")
+        raise ConfigError
+    flag, info = validate_model_config_params({**config.get("model_config", {}), **cancellation_config["model_config"]})
+    if flag is False:
+        logger.error(f"cancellation.model_config: {info}")
+        raise ModelConfigError
+    return cancellation_config
+
+
+def describe_cancel_point(cancellation_config):
+    parts = []
+    if cancellation_config["after_tokens"] is not None:
+        parts.append(f"{cancellation_config['after_tokens']} tokens")
+    if cancellation_config["after_seconds"] is not None:
+        parts.append(f"{cancellation_config['after_seconds']}s")
+    return " or ".join(parts)
+
+
+async def run_phase(client, model, prompts, concurrency, fraction, context, variant, cancellation_config, seed):
+    """以固定并发数发送请求(闭环), 每个请求以fraction的概率在CancelPoint处被主动断开
+
+    Returns:
+        list: (RequestResult, 是否计划断开, 是否紧接在同一worker的一次断开之后发送)
+    """
+    cancel_point = CancelPoint(cancellation_config["after_tokens"], cancellation_config["after_seconds"])
+    duration = cancellation_config["duration"]
+    num_requests = cancellation_config["num_requests"]
+    rng = random.Random(seed)
+    prompt_cycle = itertools.cycle(prompts)
+    entries = []
+    start = time.time()
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        after_cancel = False
+        while True:
+            if num_requests is not None and sent >= num_requests:
+                return
+            if duration is not None and time.time() - start >= duration:
+                return
+            sent += 1
+            planned = rng.random() < fraction
+            record = await process_model(
+                client, 0, model, next(prompt_cycle), "", context, variant, cancel_point if planned else None
+            )
+            entries.append((record, planned, after_cancel))
+            after_cancel = record.error_type == CANCELLED
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return entries
+
+
+def memory_release(samples, idle_start, start, end, release_end, tolerance):
+    """阶段结束后显存回落到空闲水平所需的时间
+
+    空闲显存为阶段开始前[idle_start, start]内的平均显存; 阶段结束后第一个不超过空闲显存加tolerance的采样即视为已释放
+
+    Returns:
+        dict: 空闲显存, 阶段结束时的显存以及释放时间(秒), 无法计算时为-1
+    """
+    idle = gpu_window(samples, idle_start, start)["mean_memory"]
+    after = [(timestamp, sum(gpu['memory_used'] for gpu in gpus)) for timestamp, gpus in samples if end <= timestamp <= release_end]
+    result = {"idle_memory": idle, "end_memory": after[0][1] if after else -1, "release_time": -1}
+    if idle < 0:
+        return result
+    for timestamp, used in after:
+        if used <= idle + tolerance:
+            result["release_time"] = timestamp - end
+            break
+    return result
+
+
+def evaluate_phase(concurrency, fraction, entries, window, samples, cancellation_config):
+    """计算某一阶段中未被断开的请求(计划断开的请求不计入)的时延与decode速度, 以及对应时间段内的GPU显存
+
+    Args:
+        concurrency (int): 并发数
+        fraction (float): 断开的比例, 0为基线
+        entries (list): run_phase的返回值
+        window (tuple): (阶段前空闲采样的开始时间, 阶段开始时间, 阶段结束时间, 阶段后释放采样的结束时间)
+        samples (list): 该模型的GPU采样
+        cancellation_config (dict): cancellation配置
+
+    Returns:
+        dict: 评估结果
+    """
+    q = cancellation_config["percentile"]
+    idle_start, start, end, release_end = window
+    records = [record for record, _, _ in entries]
+    remaining = [record for record, planned, _ in entries if not planned]
+    ok = [record for record in remaining if record.ok]
+    ttft = [record.ttft for record in ok if record.ttft >= 0]
+    tpot = [record.tpot for record in ok if record.tpot > 0]
+    after_cancel_ttft = [record.ttft for record, planned, after_cancel in entries if after_cancel and record.ok and record.ttft >= 0]
+    span = max(record.end_time for record in records) - min(record.start_time for record in records) if records else 0
+    completed_tokens = sum(record.decode_tokens for record in records if record.ok and record.decode_tokens > 0)
+    evaluation = {
+        "concurrency": concurrency,
+        "fraction": fraction,
+        "requests": len(records),
+        "cancelled": sum(1 for record in records if record.error_type == CANCELLED),
+        # 计划断开但在断开前已完成的请求不计入cancelled, 说明after_tokens或after_seconds相对回答长度过大
+        "cancel_missed": sum(1 for record, planned, _ in entries if planned and record.ok),
+        "remaining": len(remaining),
+        "failed": sum(1 for record in records if not record.ok and record.error_type != CANCELLED),
+        "p50_ttft": percentile(ttft, 50),
+        f"p{q}_ttft": percentile(ttft, q),
+        "p50_tpot": percentile(tpot, 50),
+        f"p{q}_tpot": percentile(tpot, q),
+        "p50_e2e": percentile([record.elapsed_time for record in ok], 50),
+        "decode_speed": mean([1 / value for value in tpot]),
+        "goodput": completed_tokens / span if span > 0 else -1,
+        "after_cancel_requests": len(after_cancel_ttft),
+        "p50_after_cancel_ttft": percentile(after_cancel_ttft, 50),
+        "gpu": gpu_window(samples, start, end),
+        "release": memory_release(samples, idle_start, start, end, release_end, cancellation_config["memory_tolerance"])
+    }
+    return evaluation
+
+
+def recovery(baseline, evaluation, cancellation_config):
+    """取消阶段相对基线的倍数, 接近1说明被断开的请求占用的batch位置被及时释放
+
+    Returns:
+        dict: {指标名称: 倍数}, 基线的取值不可用时为-1
+    """
+    q = cancellation_config["percentile"]
+
+    def ratio(numerator, denominator):
+        if numerator < 0 or denominator <= 0:
+            return -1
+        return numerator / denominator
+
+    result = {key: ratio(evaluation[key], baseline[key]) for key in ["p50_ttft", f"p{q}_ttft", "p50_tpot", f"p{q}_tpot"]}
+    # 断开后立即发送的请求的首token时间: 服务端未释放batch位置时这些请求需要排队
+    result["p50_after_cancel_ttft"] = ratio(evaluation["p50_after_cancel_ttft"], baseline["p50_ttft"])
+    result["decode_speed"] = ratio(evaluation["decode_speed"], baseline["decode_speed"])
+    return result
+
+
+async def cancellation_model(client, model, prompts, cancellation_config, context, samples):
+    """对单个模型在每个并发数下先测量无断开的基线, 再测量按比例断开时剩余请求的表现
+
+    Returns:
+        list: 每个并发数的(基线评估结果, 取消阶段评估结果)
+    """
+    variant = WorkloadVariant("cancellation", cancellation_config["model_config"])
+    cooldown = cancellation_config["cooldown"]
+    q = cancellation_config["percentile"]
+    evaluations = []
+    for level in cancellation_config["concurrency"]:
+        phases = []
+        for phase_idx, fraction in enumerate([0, cancellation_config["fraction"]]):
+            idle_start = time.time()
+            await asyncio.sleep(cooldown)
+            logger.info(f"Model {model['name']}: concurrency = {level}, cancel fraction = {fraction}")
+            start = time.time()
+            entries = await run_phase(
+                client, model, prompts, level, fraction, context, variant, cancellation_config,
+                f"{cancellation_config['seed']}_{level}_{phase_idx}"
+            )
+            end = time.time()
+            phases.append((entries, (idle_start, start, end)))
+        # 取消阶段之后再等待一次, 观察显存释放
+        await asyncio.sleep(cooldown)
+        release_end = time.time()
+        (baseline_entries, baseline_window), (cancel_entries, cancel_window) = phases
+        baseline = evaluate_phase(level, 0, baseline_entries, (*baseline_window, cancel_window[1]), samples, cancellation_config)
+        evaluation = evaluate_phase(
+            level, cancellation_config["fraction"], cancel_entries, (*cancel_window, release_end), samples, cancellation_config
+        )
+        evaluation["recovery"] = recovery(baseline, evaluation, cancellation_config)
+        evaluations.append((baseline, evaluation))
+        logger.info(
+            f"Model {model['name']}: concurrency = {level}, cancelled = {evaluation['cancelled']}/{evaluation['requests']}, "
+            f"p50 ttft = {evaluation['p50_ttft']:.3f}s (x{evaluation['recovery']['p50_ttft']:.2f}), "
+            f"p{q} ttft = {evaluation[f'p{q}_ttft']:.3f}s (x{evaluation['recovery'][f'p{q}_ttft']:.2f}), "
+            f"p50 ttft after cancel = {evaluation['p50_after_cancel_ttft']:.3f}s (x{evaluation['recovery']['p50_after_cancel_ttft']:.2f}), "
+            f"p50 tpot x{evaluation['recovery']['p50_tpot']:.2f}"
+        )
+        if evaluation["cancel_missed"] > 0:
+            logger.warning(
+                f"Model {model['name']}: {evaluation['cancel_missed']} requests finished before being cancelled, "
+                f"increase max_tokens or lower after_tokens / after_seconds"
+            )
+    return evaluations
+
+
+async def cancellation_main(models, prompts, cancellation_config, context, timeout, gpu_samples):
+    """依次对每个模型测试, 避免不同模型之间争用客户端资源和GPU采样时间段重叠"""
+    cancellation_results = {}
+    async with make_client(timeout) as client:
+        for model in models:
+            samples = gpu_samples.setdefault(model['name'], [])
+            cancellation_results[model['name']] = await cancellation_model(
+                client, model, prompts, cancellation_config, context, samples
+            )
+    return cancellation_results
+
+
+def run_cancellation(config, source):
+    """取消测试模式: 对config中的每个模型, 测量部分流式请求被客户端中途断开时, 剩余请求的吞吐与时延以及显存释放情况, 与无断开的基线对比
+
+    Args:
+        config (dict): config文件内容, 取消测试配置位于cancellation字段
+        source (PromptSource): prompt来源, 按名称模式从中选取, 循环使用
+
+    Returns:
+        dict: {model_name: 每个并发数的(基线评估结果, 取消阶段评估结果)}
+    """
+    from utils.summary import cancellation_summary_table
+
+    save_path = config.get("save_path", "")
+    # 按token数断开和首token时间都需要流式发送
+    context = streaming_context(config, source, "cancellation", "use cancellation.model_config instead")
+    cancellation_config = cancellation_config_from(config)
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+    log_config_info(config, source, cancellation=cancellation_config)
+    if not any('gpu_url' in model.keys() for model in models):
+        logger.warning("No model has gpu_url, GPU memory release will not be measured")
+
+    prompts = select_prompts(list(source), cancellation_config["prompts"], "cancellation")
+    logger.info(f"Prompts: {len(prompts)}, cancel after {describe_cancel_point(cancellation_config)}")
+    gpu_samples = {}
+    cancellation_results = run_monitored(
+        cancellation_main(models, prompts, cancellation_config, context, config.get("timeout", DEFAULT_TIMEOUT), gpu_samples),
+        models,
+        save_path,
+        context,
+        gpu_samples
+    )
+    cancellation_summary_table(cancellation_results, cancellation_config, save_path, config.get("report", None))
+    return cancellation_results
@@ -0,0 +1,267 @@
+import argparse
+import logging
+import os
+import sys
+
+from utils.file_helper import ConfigError, ModelConfigError, load_json_file, validate_model_config_params
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+SCENARIOS = ["default", "slo_search", "replay", "interference", "context_scaling", "cancellation"]
+
+# 这些模块导入较慢, --dry-run时不应被导入
+HEAVY_MODULES = ["httpx", "aiohttp", "pandas", "openpyxl", "transformers"]
+
+
+def input_paths(config):
+    """config中需要读取的输入路径, 与prompt_source_from_config选择prompt来源的规则一致
+
+    Returns:
+        list: [(字段名, 路径)]
+    """
+    scenario = config.get("scenario", "default")
+    if scenario == "context_scaling":
+        # prompt由context_scaling按长度生成, 不读取输入文件
+        return []
+    if "synthetic" in config:
+        paths = []
+        for key in ["input_len", "output_len"]:
+            spec = config["synthetic"].get(key, None)
+            if isinstance(spec, dict) and spec.get("type", "fixed") == "trace":
+                paths.append((f"synthetic.{key}.path", spec.get("path", "")))
+        return paths
+    if scenario == "replay":
+        return [("replay.trace", config.get("replay", {}).get("trace", ""))]
+    load_config = config.get("load_config", None)
+    if load_config is None:
+        return [("load_path", config.get("load_path", ""))]
+    if load_config.get("mode", -1) == 1:
+        return [
+            ("load_config.load_prompt_path", load_config.get("load_prompt_path", "")),
+            ("load_config.load_images_path", load_config.get("load_images_path", ""))
+        ]
+    return [("load_config.load_path", load_config.get("load_path", ""))]
+
+
+def validate_config(config):
+    """只检查config本身, 不导入网络和生成表格相关的模块, 不合法时抛出ConfigError或ModelConfigError
+
+    Args:
+        config (dict): config文件内容
+    """
+    from utils.adaptive_sampling import AdaptiveSampler
+    from utils.balancer import EndpointBalancer
+    from utils.codec import load_codec
+    from utils.profiling import ClientProfiler
+    from utils.report import REPORT_FORMATS
+    from utils.response_store import ResponseStore
+    from utils.steady_state import steady_state_config_from, warmup_config_from
+    from utils.workload import load_workload_matrix
+
+    scenario = config.get("scenario", "default")
+    if scenario not in SCENARIOS:
+        logger.error(f"Invalid scenario: {scenario}, expected one of {SCENARIOS}")
+        raise ConfigError
+    load_config = config.get("load_config", None)
+    if load_config is not None and "synthetic" not in config and load_config.get("mode", -1) not in [0, 1, 2, 3]:
+        logger.error(f"Invalid load_config mode: {load_config.get('mode', -1)}, expected one of [0, 1, 2, 3]")
+        raise ConfigError
+    for field, path in input_paths(config):
+        if not os.path.exists(path):
+            logger.error(f"{field} does not exist: {path!r}")
+            raise ConfigError
+    slo_search_config = config.get("slo_search", {})
+    if scenario == "slo_search" and slo_search_config.get("search", "rate") == "concurrency" and slo_search_config.get("min_load", 1) < 1:
+        logger.error(f"slo_search.min_load must be at least 1 when searching concurrency, got {slo_search_config['min_load']}")
+        raise ConfigError
+    flag, info = validate_model_config_params(config.get("model_config", {}))
+    if flag is False:
+        logger.error(info)
+        raise ModelConfigError
+
+    models = config.get("models", [])
+    if len(models) == 0:
+        logger.error("No model is configured in models")
+        raise ConfigError
+    names = set()
+    for model in models:
+        if 'name' not in model or ('url' not in model and 'urls' not in model):
+            logger.error(f"Every model needs a name and a url (or urls), got {model}")
+            raise ConfigError
+        if model['name'] in names:
+            logger.error(f"Duplicate model name: {model['name']}")
+            raise ConfigError
+        names.add(model['name'])
+        EndpointBalancer.from_model(model)
+
+    load_workload_matrix(config)
+    warmup_config_from(config)
+    steady_state_config_from(config)
+    ClientProfiler.from_config(config)
+    load_codec(config.get("json_codec", "json"))
+    ResponseStore.from_config(config)
+    AdaptiveSampler.from_config(config)
+    report_format = config.get("report", {}).get("format", "xlsx")
+    if report_format not in REPORT_FORMATS:
+        logger.error(f"Invalid report format: {report_format}, expected one of {REPORT_FORMATS}")
+        raise ConfigError
+
+
+def plan_workload(config):
+    """列出config计划发送的负载, 不发送任何请求
+
+    VLM sweep(mode 2)在构造时会生成缩放后的图片, 因此只根据测试文件夹列出变体名称而不构造prompt来源
+
+    Args:
+        config (dict): config文件内容
+
+    Returns:
+        dict: {"scenario", "source", "prompts", "models": [{"name", "endpoints", "balance", "variants", "requests"}]}
+    """
+    from utils.balancer import model_urls
+    from utils.prompt_source import load_test_folder, prompt_source_from_config
+    from utils.workload import load_workload_matrix
+
+    scenario = config.get("scenario", "default")
+    load_config = config.get("load_config", None)
+    variants = load_workload_matrix(config)
+    if scenario == "context_scaling":
+        # prompt由context_scaling按长度生成, 不读取load_path
+        description = "prompts generated by context_scaling"
+        prompt_names = []
+    elif load_config is not None and load_config.get("mode", -1) == 2 and "synthetic" not in config and scenario != "replay":
+        resolutions = load_config.get("resolutions", None) or [[224, 224], [448, 448], [896, 896]]
+        _, base_image_list = load_test_folder(load_config.get("load_path", ""))
+        max_images = load_config.get("max_images", None) or len(base_image_list)
+        description = f"vlm sweep of {load_config.get('load_path', '')}"
+        prompt_names = [
+            f"images_{image_count}_{width}x{height}" for width, height in resolutions for image_count in range(1, max_images + 1)
+        ]
+    else:
+        # 不调用source.prepare, 合成负载的tokenizer不会被加载或校准
+        source = prompt_source_from_config(config)
+        description = source.describe()
+        prompt_names = source.prompt_names()
+
+    plan = {"scenario": scenario, "source": description, "prompts": len(prompt_names), "models": []}
+    for model in config.get("models", []):
+        if variants is None:
+            model_variants = ["(model_config)"]
+            requests = len(prompt_names)
+        else:
+            model_variants = [variant.name for variant in variants if variant.models is None or model['name'] in variant.models]
+            requests = sum(
+                1 for prompt_name in prompt_names for variant in variants if variant.applies_to(model['name'], prompt_name)
+            )
+        plan["models"].append(
+            {
+                "name": model['name'],
+                "endpoints": model_urls(model),
+                "balance": model.get('balance', "round_robin") if len(model_urls(model)) > 1 else "",
+                "variants": model_variants,
+                "requests": requests
+            }
+        )
+    return plan
+
+
+def log_plan(config, plan):
+    logger.info(f"-------------------dry run--------------------------")
+    logger.info(f"scenario: {plan['scenario']}")
+    logger.info(f"prompt_source: {plan['source']}, prompts: {plan['prompts']}")
+    if plan["scenario"] == "slo_search":
+        logger.info(f"slo_search: {config.get('slo_search', {})}, prompts are cycled during each probe")
+    elif plan["scenario"] == "replay":
+        logger.info(f"replay: {config.get('replay', {})}")
+    elif plan["scenario"] == "interference":
+        logger.info(f"interference: {config.get('interference', {})}, prompts are cycled during each phase")
+    elif plan["scenario"] == "context_scaling":
+        logger.info(f"context_scaling: {config.get('context_scaling', {})}")
+    elif plan["scenario"] == "cancellation":
+        logger.info(f"cancellation: {config.get('cancellation', {})}, prompts are cycled during each phase")
+    logger.info(f"model_config: {config.get('model_config', {})}")
+    for item in plan["models"]:
+        balance = f", balance: {item['balance']}" if item['balance'] else ""
+        logger.info(
+            f"model_name: {item['name']}, endpoints: {', '.join(item['endpoints'])}{balance}, variants: {item['variants']}, "
+            f"planned requests: {item['requests']}"
+        )
+    if plan["scenario"] not in ["slo_search", "interference", "context_scaling", "cancellation"]:
+        adaptive_config = config.get("adaptive_sampling", None)
+        if adaptive_config is not None and adaptive_config.get("enabled", True) is not False:
+            # 自适应采样时每个单元的请求数取决于何时收敛, planned requests为每轮循环一次prompt的请求数
+            logger.info(f"adaptive_sampling: {adaptive_config}, prompts are cycled until the target metrics converge")
+        else:
+            logger.info(f"total planned requests: {sum(item['requests'] for item in plan['models'])}")
+    logger.info(f"-------------------dry run end--------------------------")
+
+
+def run(config):
+    """按照scenario运行测试, 只导入该场景需要的模块"""
+    from utils.prompt_source import prompt_source_from_config
+
+    source = prompt_source_from_config(config)
+    scenario = config.get("scenario", "default")
+    if scenario != "context_scaling":
+        # context_scaling按长度自行生成prompt, 不使用source
+        source.prepare()
+    if scenario == "slo_search":
+        from utils.slo_search import run_slo_search
+        return run_slo_search(config, source)
+    if scenario == "replay":
+        from utils.replay import run_replay
+        return run_replay(config, source)
+    if scenario == "interference":
+        from utils.interference import run_interference
+        return run_interference(config, source)
+    if scenario == "context_scaling":
+        from utils.context_scaling import run_context_scaling
+        return run_context_scaling(config, source)
+    if scenario == "cancellation":
+        from utils.cancellation import run_cancellation
+        return run_cancellation(config, source)
+    if scenario == "default":
+        from utils.runner import run_from_config
+        return run_from_config(config, source)
+    logger.error(f"Invalid scenario: {scenario}")
+    raise ConfigError
+
+
+def main(argv=None, default_config="config.json", required_keys=()):
+    """命令行入口
+
+    Args:
+        argv (list): 命令行参数, 为None时读取sys.argv
+        default_config (str): 未指定--config时使用的config文件
+        required_keys (tuple): config中必须存在的字段
+    """
+    parser = argparse.ArgumentParser(description="Run the LLM inference benchmark described by a config file")
+    parser.add_argument("--config", default=default_config, help="path to the config file")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="validate the config and list the planned workload without sending requests"
+    )
+    args = parser.parse_args(argv)
+
+    config = load_json_file(args.config)
+    for key in required_keys:
+        if key not in config:
+            logger.error(f"{key} must be assigned in {args.config}")
+            raise ConfigError
+    if args.dry_run:
+        validate_config(config)
+        plan = plan_workload(config)
+        log_plan(config, plan)
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        if loaded:
+            logger.warning(f"Heavy modules were imported during the dry run: {loaded}")
+        logger.info(f"Config {args.config} is valid")
+        return plan
+    return run(config)
+
+
+if __name__ == "__main__":
+    main()
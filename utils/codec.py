@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from utils.file_helper import ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+CODECS = ["json", "orjson", "msgspec"]
+
+# RequestEncoder缓存的messages序列化结果的总字节数上限
+DEFAULT_ENCODE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class JSONCodec:
+    """标准库json实现的编解码, 编码格式与httpx的json参数一致"""
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def decode_response(self, data):
+        """解析非流式请求的返回结果"""
+        return self.loads(data)
+
+    def decode_chunk(self, data):
+        """解析流式请求的单个分块"""
+        return self.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """orjson实现的编解码, 需要安装orjson"""
+    name = "orjson"
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError as e:
+            logger.error("json_codec orjson requires orjson, please run `pip install orjson`")
+            raise e
+        self.orjson = orjson
+        # logit_bias的键可以为int
+        self.option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj):
+        return self.orjson.dumps(obj, option=self.option)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class MsgspecCodec(JSONCodec):
+    """msgspec实现的编解码, 需要安装msgspec
+
+    解析返回结果时只解码choices中的message/delta以及usage, 跳过id, logprobs等不使用的字段;
+    解码结果转换为与json.loads结构一致的字典, 缺失的字段不出现在字典中
+    """
+    name = "msgspec"
+
+    def __init__(self):
+        try:
+            import msgspec
+        except ImportError as e:
+            logger.error("json_codec msgspec requires msgspec, please run `pip install msgspec`")
+            raise e
+        from typing import Any, Optional
+
+        class Choice(msgspec.Struct, omit_defaults=True):
+            message: Any = None
+
+        class Response(msgspec.Struct, omit_defaults=True):
+            choices: Optional[list[Choice]] = None
+            usage: Any = None
+
+        class ChunkChoice(msgspec.Struct, omit_defaults=True):
+            delta: Any = None
+
+        class Chunk(msgspec.Struct, omit_defaults=True):
+            choices: Optional[list[ChunkChoice]] = None
+            usage: Any = None
+
+        self.msgspec = msgspec
+        self.encoder = msgspec.json.Encoder()
+        self.decoder = msgspec.json.Decoder()
+        self.response_decoder = msgspec.json.Decoder(Response)
+        self.chunk_decoder = msgspec.json.Decoder(Chunk)
+
+    def dumps(self, obj):
+        return self.encoder.encode(obj)
+
+    def loads(self, data):
+        return self.decoder.decode(data)
+
+    def decode_response(self, data):
+        return self.msgspec.to_builtins(self.response_decoder.decode(data))
+
+    def decode_chunk(self, data):
+        return self.msgspec.to_builtins(self.chunk_decoder.decode(data))
+
+
+def load_codec(name="json"):
+    """根据名称构造编解码器, 名称不合法时抛出ConfigError"""
+    if name == "json":
+        return JSONCodec()
+    if name == "orjson":
+        return OrjsonCodec()
+    if name == "msgspec":
+        return MsgspecCodec()
+    logger.error(f"Invalid json_codec: {name}, expected one of {CODECS}")
+    raise ConfigError
+
+
+class RequestEncoder:
+    """请求体的编码, 每个prompt的messages只序列化一次, 之后对每个模型只序列化model, 采样参数等少量字段并拼接
+
+    messages的序列化结果缓存在encoder中, 同一prompt发送给多个模型, 多个变体以及重试时共用;
+    缓存按最近使用淘汰, 总字节数不超过max_cache_bytes, 因此整个运行期间持有的prompt再多, 也只有最近发送的prompt保留序列化结果
+
+    Attributes:
+        codec (JSONCodec): 编解码器
+        max_cache_bytes (int): 缓存的总字节数上限
+    """
+
+    def __init__(self, codec, max_cache_bytes=DEFAULT_ENCODE_CACHE_BYTES):
+        self.codec = codec
+        self.max_cache_bytes = max_cache_bytes
+        # {id(prompt_item): (prompt_item, 序列化结果)}, 同时持有prompt_item, 保证其id在缓存期间不会被复用
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+
+    def encoded_messages(self, prompt_item):
+        """prompt_item.messages的序列化结果, 命中缓存时直接返回"""
+        key = id(prompt_item)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached[1]
+        messages = self.codec.dumps(prompt_item.messages)
+        self.cache[key] = (prompt_item, messages)
+        self.cache_bytes += len(messages)
+        # 至少保留刚加入的一项
+        while self.cache_bytes > self.max_cache_bytes and len(self.cache) > 1:
+            _, (_, evicted) = self.cache.popitem(last=False)
+            self.cache_bytes -= len(evicted)
+        return messages
+
+    def encode(self, prompt_item, fields):
+        """编码一次请求的请求体
+
+        Args:
+            prompt_item (PromptItem): 询问的prompt
+            fields (dict): messages以外的请求参数
+
+        Returns:
+            bytes: 请求体
+        """
+        messages = self.encoded_messages(prompt_item)
+        rest = self.codec.dumps(fields)
+        if rest == b"{}":
+            return b'{"messages":' + messages + b"}"
+        return b'{"messages":' + messages + b"," + rest[1:]
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import Counter
+
+from utils.file_helper import ConfigError
+from utils.load_generator import run_closed_loop
+from utils.prompt_source import PromptItem
+from utils.runner import DEFAULT_TIMEOUT, log_config_info, make_client, run_monitored, streaming_context
+from utils.stats import gpu_window, mean, pearson, percentile
+from utils.tokenizer import ApproxTokenizer, load_tokenizer
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_CONTEXT_SCALING_CONFIG = {
+    "min_length": 1024,       # 第一步的prompt token数
+    "max_length": 32768,      # 最大的prompt token数, 应为模型配置的最大上下文减去output_len
+    "growth": 2.0,            # 每一步prompt token数的增长倍数
+    "lengths": None,          # 直接给出每一步的prompt token数, 给出时忽略min_length, max_length和growth
+    "output_len": 128,        # 每个请求的输出token数, 以max_tokens和ignore_eos控制
+    "concurrency": [1],       # 同时在途的请求数, 可以为整数或列表, 每个并发数分别扫描
+    "rounds": 2,              # 每一步发送concurrency * rounds个请求
+    "refine": 3,              # 在最后通过与首次失败的长度之间二分的次数
+    "resolution": 256,        # 二分的最小间隔, 单位为token
+    "max_error_rate": 0.0,    # 错误率超过该值的长度视为不可用
+    "ttft_limit": None,       # P50首token时间超过该值(秒)的长度视为不可用, 为null时不限制
+    "stop_on_failure": True,  # 某一长度不可用后不再测试更长的长度
+    "tokenizer": None,        # 本地tokenizer的名称或路径, 为null时使用以每个模型校准的近似tokenizer
+    "cooldown": 3,            # 两步之间的等待时间, 使服务端释放KV cache
+    "seed": 0
+}
+
+
+def context_scaling_config_from(config):
+    """config中的context_scaling字段与默认值合并并校验, 不合法时抛出ConfigError"""
+    scaling_config = dict(DEFAULT_CONTEXT_SCALING_CONFIG)
+    scaling_config.update(config.get("context_scaling", {}))
+    levels = scaling_config["concurrency"]
+    if isinstance(levels, int):
+        levels = [levels]
+    if len(levels) == 0 or any(not isinstance(level, int) or level <= 0 for level in levels):
+        logger.error(f"context_scaling.concurrency must be a positive integer or a list of them, got {levels}")
+        raise ConfigError
+    scaling_config["concurrency"] = levels
+    if scaling_config["lengths"] is None:
+        if scaling_config["growth"] <= 1 or not 0 < scaling_config["min_length"] <= scaling_config["max_length"]:
+            logger.error("context_scaling requires growth > 1 and 0 < min_length <= max_length")
+            raise ConfigError
+        lengths = []
+        length = scaling_config["min_length"]
+        while length < scaling_config["max_length"]:
+            lengths.append(int(length))
+            length *= scaling_config["growth"]
+        lengths.append(scaling_config["max_length"])
+        scaling_config["lengths"] = lengths
+    else:
+        scaling_config["lengths"] = sorted(set(scaling_config["lengths"]))
+        if len(scaling_config["lengths"]) == 0 or scaling_config["lengths"][0] <= 0:
+            logger.error(f"context_scaling.lengths must be positive, got {scaling_config['lengths']}")
+            raise ConfigError
+    return scaling_config
+
+
+def make_prompts(tokenizer, length, num_prompts, output_len, seed):
+    """生成num_prompts个约length个token的prompt, 每个prompt的文本从第一个词开始就不同, 避免命中服务端的prefix cache"""
+    rng = random.Random(f"{seed}_{length}")
+    content_len = max(1, length - tokenizer.chat_overhead())
+    return [
+        PromptItem(
+            f"context_{length}_{idx}",
+            [{"role": "user", "content": tokenizer.make_text(content_len, rng)}],
+            {"input_len": length, "output_len": output_len},
+            {"max_tokens": output_len, "ignore_eos": True}
+        )
+        for idx in range(num_prompts)
+    ]
+
+
+def evaluate_step(length, concurrency, results, samples, start, end, scaling_config):
+    """计算某一prompt长度下的prefill时延(首token时间), decode速度, 失败情况以及对应时间段内的GPU显存
+
+    Returns:
+        dict: 评估结果, passed表示该长度在该并发数下可用
+    """
+    ok = [record for record in results if record.ok]
+    ttft = [record.ttft for record in ok if record.ttft >= 0]
+    tpot = [record.tpot for record in ok if record.tpot > 0]
+    errors = Counter(record.error_type for record in results if not record.ok)
+    error_rate = (len(results) - len(ok)) / len(results) if results else 1
+    window = max(record.end_time for record in results) - min(record.start_time for record in results) if results else 0
+    evaluation = {
+        "length": length,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "failed": len(results) - len(ok),
+        "error_rate": error_rate,
+        "error_types": ", ".join(f"{error_type}({count})" for error_type, count in errors.most_common()),
+        "prompt_tokens": mean([record.prompt_tokens for record in ok if record.prompt_tokens >= 0]),
+        "p50_ttft": percentile(ttft, 50),
+        "p99_ttft": percentile(ttft, 99),
+        "prefill_speed": mean([record.prompt_tokens / record.ttft for record in ok if record.ttft > 0 and record.prompt_tokens > 0]),
+        "decode_speed": mean([1 / value for value in tpot]),
+        "throughput": sum(record.decode_tokens for record in ok if record.decode_tokens > 0) / window if window > 0 else -1,
+        "gpu": gpu_window(samples, start, end)
+    }
+    passed = len(ok) > 0 and error_rate <= scaling_config["max_error_rate"]
+    if scaling_config["ttft_limit"] is not None and passed:
+        passed = evaluation["p50_ttft"] <= scaling_config["ttft_limit"]
+    evaluation["passed"] = passed
+    return evaluation
+
+
+def max_usable_length(steps):
+    """所有不超过该长度的步骤均可用的最大长度, 第一步即不可用时为-1; 以及第一个不可用的长度, 不存在时为-1"""
+    usable = -1
+    for step in sorted(steps, key=lambda step: step["length"]):
+        if not step["passed"]:
+            return usable, step["length"]
+        usable = step["length"]
+    return usable, -1
+
+
+async def scale_model(client, model, tokenizer, concurrency, scaling_config, context, samples):
+    """对单个模型在给定并发数下依次测试每个prompt长度, 之后在最后可用与首次不可用的长度之间二分
+
+    Returns:
+        list: 每一步的评估结果, 按测试顺序排列
+    """
+    steps = []
+
+    async def step(length):
+        prompts = make_prompts(tokenizer, length, concurrency * scaling_config["rounds"], scaling_config["output_len"], scaling_config["seed"])
+        logger.info(f"Model {model['name']}: concurrency = {concurrency}, prompt length = {length}")
+        start = time.time()
+        results = await run_closed_loop(client, model, prompts, concurrency, context, num_requests=len(prompts))
+        evaluation = evaluate_step(length, concurrency, results, samples, start, time.time(), scaling_config)
+        steps.append(evaluation)
+        logger.info(
+            f"Model {model['name']}: prompt length = {length}, p50 ttft = {evaluation['p50_ttft']:.3f}s, "
+            f"decode speed = {evaluation['decode_speed']:.2f} tokens/s, failed = {evaluation['failed']}/{evaluation['requests']}, "
+            f"peak gpu memory = {evaluation['gpu']['peak_memory']} MiB, passed = {evaluation['passed']}"
+        )
+        await asyncio.sleep(scaling_config["cooldown"])
+        return evaluation
+
+    for length in scaling_config["lengths"]:
+        evaluation = await step(length)
+        if not evaluation["passed"] and scaling_config["stop_on_failure"] is True:
+            break
+
+    usable, failed = max_usable_length(steps)
+    lower = max(usable, 0)
+    for _ in range(scaling_config["refine"]):
+        if failed < 0 or failed - lower <= scaling_config["resolution"]:
+            break
+        middle = (lower + failed) // 2
+        if (await step(middle))["passed"]:
+            lower = middle
+        else:
+            failed = middle
+    return steps
+
+
+def summarize_scaling(steps, concurrency):
+    """一个模型在一个并发数下的扫描结果: 最大可用长度, 首次不可用的长度及原因, 以及长度与显存, 首token时间的相关性"""
+    usable, failed = max_usable_length(steps)
+    ordered = sorted(steps, key=lambda step: step["length"])
+    with_memory = [step for step in ordered if step["gpu"]["peak_memory"] >= 0]
+    with_ttft = [step for step in ordered if step["p50_ttft"] >= 0]
+    failed_step = next((step for step in ordered if step["length"] == failed), None)
+    return {
+        "concurrency": concurrency,
+        "max_usable_length": usable,
+        "first_failed_length": failed,
+        "failure": "" if failed_step is None else (
+            failed_step["error_types"] or f"p50 ttft {failed_step['p50_ttft']:.3f}s exceeds ttft_limit"
+        ),
+        "steps": len(steps),
+        "memory_correlation": pearson([step["length"] for step in with_memory], [step["gpu"]["peak_memory"] for step in with_memory]),
+        "ttft_correlation": pearson([step["length"] for step in with_ttft], [step["p50_ttft"] for step in with_ttft]),
+        "peak_memory": max([step["gpu"]["peak_memory"] for step in with_memory], default=-1),
+        "memory_total": with_memory[-1]["gpu"]["memory_total"] if with_memory else -1
+    }
+
+
+async def calibrate_tokenizer(tokenizer, model):
+    """在线程中校准近似tokenizer, 避免同步的校准请求阻塞事件循环; 校准失败时记录错误并保留未校准的比例"""
+    try:
+        await asyncio.to_thread(tokenizer.calibrate, model)
+    except Exception as e:
+        logger.error(
+            f"Failed to calibrate the approx tokenizer with model {model['name']}, falling back to tokens_per_word = "
+            f"{tokenizer.tokens_per_word}, overhead = {tokenizer.overhead}: {type(e).__name__}: {e}"
+        )
+
+
+async def context_scaling_main(models, tokenizers, scaling_config, context, timeout, gpu_samples):
+    """依次对每个模型的每个并发数扫描, 避免不同模型之间争用客户端资源与GPU
+
+    未配置tokenizer时, 扫描每个模型前先用该模型校准其近似tokenizer
+    """
+    scaling_results = {}
+    async with make_client(timeout) as client:
+        for model in models:
+            if scaling_config["tokenizer"] is None:
+                await calibrate_tokenizer(tokenizers[model['name']], model)
+            samples = gpu_samples.setdefault(model['name'], [])
+            scaling_results[model['name']] = []
+            for concurrency in scaling_config["concurrency"]:
+                steps = await scale_model(client, model, tokenizers[model['name']], concurrency, scaling_config, context, samples)
+                summary = summarize_scaling(steps, concurrency)
+                logger.info(
+                    f"Model {model['name']}: max usable context at concurrency {concurrency} = {summary['max_usable_length']} tokens"
+                    + (f", first failure at {summary['first_failed_length']} ({summary['failure']})" if summary['first_failed_length'] > 0 else "")
+                )
+                scaling_results[model['name']].append((summary, steps))
+    return scaling_results
+
+
+def run_context_scaling(config, source):
+    """上下文长度扩展测试: 对config中的每个模型, 以逐步增长的prompt长度测量prefill时延, decode速度和失败点,
+    并与gpu_url监控到的显存对照, 得到给定并发数下的最大可用上下文
+
+    Args:
+        config (dict): config文件内容, 测试配置位于context_scaling字段
+        source (PromptSource): 未使用, prompt由context_scaling按长度生成
+
+    Returns:
+        dict: {model_name: [(每个并发数的汇总结果, 每一步的评估结果列表)]}
+    """
+    from utils.summary import context_scaling_summary_table
+
+    save_path = config.get("save_path", "")
+    context = streaming_context(config, source, "context_scaling")
+    scaling_config = context_scaling_config_from(config)
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+    log_config_info(config, source, context_scaling=scaling_config)
+    if not any('gpu_url' in model for model in models):
+        logger.warning("No model has gpu_url, GPU memory will not be correlated with context length")
+
+    tokenizers = {}
+    for model in models:
+        if scaling_config["tokenizer"] is not None:
+            tokenizers[model['name']] = load_tokenizer(scaling_config["tokenizer"])
+        else:
+            # 不同模型的词表不同, 在context_scaling_main中分别校准
+            tokenizers[model['name']] = ApproxTokenizer()
+
+    gpu_samples = {}
+    scaling_results = run_monitored(
+        context_scaling_main(models, tokenizers, scaling_config, context, config.get("timeout", DEFAULT_TIMEOUT), gpu_samples),
+        models,
+        save_path,
+        context,
+        gpu_samples
+    )
+    context_scaling_summary_table(scaling_results, save_path, config.get("report", None))
+    return scaling_results
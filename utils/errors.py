@@ -0,0 +1,135 @@
+import httpx
+
+# 错误类型
+HTTP_STATUS = "http_status"           # 服务端返回非2xx状态码
+CONNECT = "connect"                   # 建立连接失败或连接超时
+READ_TIMEOUT = "read_timeout"         # 等待服务端返回时超时
+TIMEOUT = "timeout"                   # 其他超时, 如写入超时和连接池等待超时
+MALFORMED_USAGE = "malformed_usage"   # 返回结果中缺少usage或格式不正确
+NETWORK = "network"                   # 其他网络错误, 如连接中断
+CANCELLED = "cancelled"               # 客户端按计划主动断开, 不是服务端的错误, 也不会重试
+OTHER = "other"                       # 其他错误
+
+ERROR_TYPES = [HTTP_STATUS, CONNECT, READ_TIMEOUT, TIMEOUT, MALFORMED_USAGE, NETWORK, CANCELLED, OTHER]
+
+DEFAULT_RETRY_ON = [CONNECT, READ_TIMEOUT, HTTP_STATUS]
+DEFAULT_RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class MalformedUsageError(Exception):
+    """Raised when a response does not carry a valid usage block."""
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+class ClientCancelled(Exception):
+    """Raised when the client abandons a request on purpose, e.g. after receiving enough tokens."""
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+def parse_usage(result):
+    """从返回结果中读取prompt和completion的token数, 格式不正确时抛出MalformedUsageError"""
+    usage = result.get('usage') if isinstance(result, dict) else None
+    if not isinstance(usage, dict):
+        raise MalformedUsageError(f"usage is missing in response: {usage}")
+    prompt_tokens = usage.get('prompt_tokens')
+    completion_tokens = usage.get('completion_tokens')
+    if not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+        raise MalformedUsageError(f"usage is malformed: {usage}")
+    return prompt_tokens, completion_tokens
+
+
+def classify_error(error):
+    """将异常归类为ERROR_TYPES中的一种
+
+    Args:
+        error (Exception): 请求过程中抛出的异常
+
+    Returns:
+        str: 错误类型
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return HTTP_STATUS
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+        return CONNECT
+    if isinstance(error, httpx.ReadTimeout):
+        return READ_TIMEOUT
+    if isinstance(error, httpx.TimeoutException):
+        return TIMEOUT
+    if isinstance(error, MalformedUsageError):
+        return MALFORMED_USAGE
+    if isinstance(error, ClientCancelled):
+        return CANCELLED
+    if isinstance(error, httpx.TransportError):
+        return NETWORK
+    return OTHER
+
+
+def error_status_code(error):
+    """HTTP状态码错误时返回状态码, 否则返回-1"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    return -1
+
+
+class RetryPolicy:
+    """请求失败后的重试策略
+
+    Attributes:
+        max_retries (int): 最大重试次数, 0为不重试
+        backoff (float): 第i次重试前等待backoff * 2 ** i秒
+        retry_on (list): 需要重试的错误类型
+        retry_status (list): 错误类型为http_status时, 需要重试的状态码
+    """
+
+    def __init__(self, max_retries=0, backoff=1.0, retry_on=None, retry_status=None):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_on = retry_on if retry_on is not None else DEFAULT_RETRY_ON
+        self.retry_status = retry_status if retry_status is not None else DEFAULT_RETRY_STATUS
+
+    @classmethod
+    def from_config(cls, retry_config):
+        """由config中的retry字段构造, retry_config为None时不重试"""
+        if not retry_config:
+            return cls()
+        return cls(
+            max_retries=retry_config.get("max_retries", 0),
+            backoff=retry_config.get("backoff", 1.0),
+            retry_on=retry_config.get("retry_on", None),
+            retry_status=retry_config.get("retry_status", None)
+        )
+
+    def should_retry(self, error, attempt):
+        """attempt为已经尝试的次数"""
+        if attempt > self.max_retries:
+            return False
+        error_type = classify_error(error)
+        if error_type == CANCELLED or error_type not in self.retry_on:
+            return False
+        if error_type == HTTP_STATUS:
+            return error_status_code(error) in self.retry_status
+        return True
+
+    def delay(self, attempt):
+        return self.backoff * 2 ** (attempt - 1)
+
+
+def build_timeout(timeout_config, default):
+    """由config中的timeout字段构造httpx.Timeout
+
+    timeout_config可以是数值(所有阶段共用), 也可以是包含connect, read, write, pool中若干键的字典,
+    未给出的阶段使用default
+    """
+    if timeout_config is None:
+        return httpx.Timeout(default)
+    if isinstance(timeout_config, dict):
+        return httpx.Timeout(
+            default,
+            connect=timeout_config.get("connect", default),
+            read=timeout_config.get("read", default),
+            write=timeout_config.get("write", default),
+            pool=timeout_config.get("pool", default)
+        )
+    return httpx.Timeout(timeout_config)
@@ -130,7 +130,9 @@ request_body = {
     "presence_penalty": float,      # Penalizes new tokens based on their presence, range: -2.0 to 2.0
     "frequency_penalty": float,     # Penalizes new tokens based on frequency, range: -2.0 to 2.0
     "logit_bias": dict,             # A dictionary mapping tokens (str or int) to bias values (float), range: -100 to 100
-    "user": str                     # A unique identifier for your end-user, typically a string
+    "user": str,                    # A unique identifier for your end-user, typically a string
+    "ignore_eos": bool,             # (vLLM) Whether to ignore the EOS token and keep generating until max_tokens
+    "min_tokens": int               # (vLLM) The minimum number of tokens to generate, must be a non-negative integer
 }
 
 def validate_model_config_params(model_config):
@@ -153,6 +155,8 @@ def validate_model_config_params(model_config):
             return (False, "top_p must be between 0 and 1.")
         if key == "n" and value <= 0:
             return (False, "n must be a positive integer.")
+        if key == "min_tokens" and value < 0:
+            return (False, "min_tokens must be a non-negative integer.")
         if (key == "max_tokens" or key == "max_completion_tokens") and value < 0:
             return (False, "max_completion_tokens must be a non-negative integer.")
         if key in ["presence_penalty", "frequency_penalty"] and not (-2.0 <= value <= 2.0):
@@ -1,6 +1,7 @@
 import logging
 import os
 import asyncio
+import time
 from datetime import datetime
 import aiohttp
 
@@ -40,15 +41,19 @@ async def fetch_gpu_info(api_url):
             return None
 
 
-async def monitor_gpu(api_url, interval, file_name, stop_event):
+async def monitor_gpu(api_url, interval, file_name, stop_event, samples=None):
+    """定期拉取GPU信息并写入file_name, samples不为None时同时追加(time.time(), GPU信息列表), 供测试过程中与请求对照"""
     while not stop_event.is_set():
         response = await fetch_gpu_info(api_url)
         if response:  # Ensure the response is valid
             gpu_info2txt(file_name, response)
+            if samples is not None:
+                samples.append((time.time(), response))
         await asyncio.sleep(interval)
 
 
-async def gpu_main(models, save_path, stop_event):
+async def gpu_main(models, save_path, stop_event, samples=None):
+    """samples不为None时为{模型名称: 采样列表}, 每个配置了gpu_url的模型的采样会追加到对应的列表中"""
     tasks = []
     gpu_info_path = os.path.join(save_path, "gpu_info")
     os.makedirs(gpu_info_path, exist_ok=True)
@@ -67,7 +72,8 @@ async def gpu_main(models, save_path, stop_event):
                 model['gpu_url'] + "/gpu_info",
                 interval=interval,
                 file_name=file_name,
-                stop_event=stop_event
+                stop_event=stop_event,
+                samples=None if samples is None else samples.setdefault(model['name'], [])
             )
         )
 
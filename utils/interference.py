@@ -0,0 +1,245 @@
+import asyncio
+import fnmatch
+import logging
+import os
+import time
+
+from utils.file_helper import ConfigError, ModelConfigError, validate_model_config_params
+from utils.load_generator import run_closed_loop, run_open_loop
+from utils.runner import DEFAULT_TIMEOUT, log_config_info, make_client, run_monitored, streaming_context
+from utils.stats import bootstrap, mean, percentile
+from utils.workload import WorkloadVariant
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_INTERFERENCE_CONFIG = {
+    "probe_prompts": None,            # 探测请求使用的prompt名称模式(支持*和?通配符), 为null时使用所有prompt
+    "probe_model_config": {},         # 探测请求的参数, 在全局model_config之后应用, 如{"max_tokens": 64}
+    "probe_rate": 1.0,                # 探测请求的平均到达速率(泊松), 单位为请求数/秒, 应足够低使探测请求之间几乎不排队
+    "probe_duration": 60,             # 每个阶段发送探测请求的时间, 单位为秒
+    "probe_requests": None,           # 每个阶段的探测请求数, 给出时与probe_duration以先达到者为准
+    "background_prompts": None,       # 背景请求使用的prompt名称模式, 为null时使用所有prompt
+    "background_model_config": {},    # 背景请求的参数, 如{"max_tokens": 4096, "ignore_eos": true}
+    "background_concurrency": [4],    # 背景负载的并发数, 可以为整数或列表, 列表中每个值测试一次
+    "ramp": 10,                       # 背景负载开始后等待的时间, 单位为秒, 使服务端进入稳定状态后再发送探测请求
+    "cooldown": 5,                    # 两个阶段之间的等待时间, 使服务端排空队列
+    "percentile": 99,                 # 除P50外额外报告的分位数
+    "bootstrap": 1000,                # 计算时延膨胀倍数置信区间时的重采样次数
+    "confidence": 0.95                # 置信区间的置信水平
+}
+
+
+def interference_config_from(config):
+    """config中的interference字段与默认值合并并校验, 不合法时抛出ConfigError或ModelConfigError"""
+    interference_config = dict(DEFAULT_INTERFERENCE_CONFIG)
+    interference_config.update(config.get("interference", {}))
+    levels = interference_config["background_concurrency"]
+    if isinstance(levels, int):
+        levels = [levels]
+    if len(levels) == 0 or any(not isinstance(level, int) or level <= 0 for level in levels):
+        logger.error(f"interference.background_concurrency must be a positive integer or a list of them, got {levels}")
+        raise ConfigError
+    interference_config["background_concurrency"] = levels
+    if interference_config["probe_rate"] <= 0:
+        logger.error(f"interference.probe_rate must be positive, got {interference_config['probe_rate']}")
+        raise ConfigError
+    if interference_config["probe_duration"] is None and interference_config["probe_requests"] is None:
+        logger.error("interference.probe_duration or interference.probe_requests must be provided")
+        raise ConfigError
+    for key in ["probe_model_config", "background_model_config"]:
+        flag, info = validate_model_config_params({**config.get("model_config", {}), **interference_config[key]})
+        if flag is False:
+            logger.error(f"interference.{key}: {info}")
+            raise ModelConfigError
+    return interference_config
+
+
+def select_prompts(prompts, patterns, role):
+    """按名称模式筛选prompt, patterns为None时返回所有prompt, 筛选结果为空时抛出ConfigError"""
+    if patterns is None:
+        selected = list(prompts)
+    else:
+        selected = [
+            prompt_item for prompt_item in prompts if any(fnmatch.fnmatchcase(prompt_item.name, pattern) for pattern in patterns)
+        ]
+    if len(selected) == 0:
+        logger.error(f"No prompt matches the {role} patterns {patterns}")
+        raise ConfigError
+    return selected
+
+
+def probe_latencies(results):
+    """成功的探测请求的首token时间, 每个输出token时间以及端到端时延; 未收到首token时首token时间记为端到端时延"""
+    ok = [record for record in results if record.ok]
+    return {
+        "ttft": [record.ttft if record.ttft >= 0 else record.elapsed_time for record in ok],
+        "tpot": [record.tpot for record in ok if record.tpot >= 0],
+        "e2e": [record.elapsed_time for record in ok]
+    }
+
+
+def evaluate_phase(level, probe_results, background_results, interference_config):
+    """计算某一背景负载下探测请求的时延分位数, 以及背景请求的吞吐
+
+    Args:
+        level (int): 背景负载的并发数, 0为无背景负载的基线
+        probe_results (list): 探测请求的RequestResult
+        background_results (list): 背景请求的RequestResult
+        interference_config (dict): interference配置
+
+    Returns:
+        dict: 评估结果, 其中latencies为探测请求的原始时延, 用于计算膨胀倍数的置信区间
+    """
+    q = interference_config["percentile"]
+    latencies = probe_latencies(probe_results)
+    evaluation = {
+        "level": level,
+        "probes": len(probe_results),
+        "failed": sum(1 for record in probe_results if not record.ok),
+        "latencies": latencies,
+        "background_requests": len(background_results),
+        "background_failed": sum(1 for record in background_results if not record.ok),
+        "background_throughput": -1
+    }
+    for metric, values in latencies.items():
+        evaluation[f"p50_{metric}"] = percentile(values, 50)
+        evaluation[f"p{q}_{metric}"] = percentile(values, q)
+        evaluation[f"mean_{metric}"] = mean(values)
+    if background_results:
+        window = max(record.end_time for record in background_results) - min(record.start_time for record in background_results)
+        decode_tokens = sum(record.decode_tokens for record in background_results if record.ok and record.decode_tokens > 0)
+        evaluation["background_throughput"] = decode_tokens / window if window > 0 else -1
+    return evaluation
+
+
+def inflation(baseline, evaluation, interference_config):
+    """探测请求相对基线的时延膨胀倍数, P50首token时间的倍数附带bootstrap置信区间
+
+    基线与负载下的探测请求相互独立, 分别重采样后计算P50之比
+
+    Returns:
+        dict: {指标名称: 膨胀倍数}, 基线的取值不可用时为-1
+    """
+    q = interference_config["percentile"]
+
+    def ratio(numerator, denominator):
+        if numerator < 0 or denominator <= 0:
+            return -1
+        return numerator / denominator
+
+    result = {}
+    for metric in ["ttft", "tpot", "e2e"]:
+        for prefix in ["p50", f"p{q}"]:
+            key = f"{prefix}_{metric}"
+            result[key] = ratio(evaluation[key], baseline[key])
+
+    def median(values):
+        return percentile(values, 50)
+
+    loaded = bootstrap(evaluation["latencies"]["ttft"], median, interference_config["bootstrap"], seed=0)
+    idle = bootstrap(baseline["latencies"]["ttft"], median, interference_config["bootstrap"], seed=1)
+    ratios = [ratio(a, b) for a, b in zip(loaded, idle) if b > 0]
+    alpha = (1 - interference_config["confidence"]) / 2 * 100
+    result["p50_ttft_ci"] = (percentile(ratios, alpha), percentile(ratios, 100 - alpha)) if ratios else (-1, -1)
+    return result
+
+
+async def interference_model(client, model, probe_prompts, background_prompts, interference_config, context):
+    """对单个模型先测量无背景负载时的探测请求时延, 再依次在每个背景并发数下测量
+
+    背景请求以闭环方式保持固定并发, 开始ramp秒后发送探测请求; 探测结束后停止发送背景请求并等待在途的背景请求完成
+
+    Returns:
+        list: 每个阶段的评估结果, 第一个为基线
+    """
+    probe_variant = WorkloadVariant("probe", interference_config["probe_model_config"])
+    background_variant = WorkloadVariant("background", interference_config["background_model_config"])
+
+    async def probe():
+        return await run_open_loop(
+            client, model, probe_prompts, interference_config["probe_rate"], context, interference_config["probe_duration"],
+            interference_config["probe_requests"], variant=probe_variant
+        )
+
+    q = interference_config["percentile"]
+    logger.info(f"Model {model['name']}: measuring idle baseline")
+    phases = [evaluate_phase(0, await probe(), [], interference_config)]
+    baseline = phases[0]
+    logger.info(
+        f"Model {model['name']}: baseline p50 ttft = {baseline['p50_ttft']:.3f}s, p{q} ttft = {baseline[f'p{q}_ttft']:.3f}s, "
+        f"p50 e2e = {baseline['p50_e2e']:.3f}s"
+    )
+    if baseline["failed"] == baseline["probes"]:
+        logger.warning(f"Model {model['name']}: all baseline probes failed, latency inflation cannot be computed")
+
+    for level in interference_config["background_concurrency"]:
+        await asyncio.sleep(interference_config["cooldown"])
+        logger.info(f"Model {model['name']}: background concurrency = {level}")
+        stop_event = asyncio.Event()
+        background_task = asyncio.create_task(
+            run_closed_loop(client, model, background_prompts, level, context, stop_event=stop_event, variant=background_variant)
+        )
+        await asyncio.sleep(interference_config["ramp"])
+        if background_task.done():
+            logger.warning(f"Model {model['name']}: background load stopped before probing, check the background requests")
+        probe_results = await probe()
+        stop_event.set()
+        drain_start = time.time()
+        background_results = await background_task
+        evaluation = evaluate_phase(level, probe_results, background_results, interference_config)
+        evaluation["inflation"] = inflation(baseline, evaluation, interference_config)
+        phases.append(evaluation)
+        logger.info(
+            f"Model {model['name']}: background concurrency = {level}, p50 ttft = {evaluation['p50_ttft']:.3f}s "
+            f"(x{evaluation['inflation']['p50_ttft']:.2f}), p{q} ttft = {evaluation[f'p{q}_ttft']:.3f}s "
+            f"(x{evaluation['inflation'][f'p{q}_ttft']:.2f}), background drained in {time.time() - drain_start:.1f}s"
+        )
+    return phases
+
+
+async def interference_main(models, probe_prompts, background_prompts, interference_config, context, timeout):
+    """依次对每个模型测试, 避免不同模型之间争用客户端资源"""
+    interference_results = {}
+    async with make_client(timeout) as client:
+        for model in models:
+            interference_results[model['name']] = await interference_model(
+                client, model, probe_prompts, background_prompts, interference_config, context
+            )
+    return interference_results
+
+
+def run_interference(config, source):
+    """干扰测试模式: 对config中的每个模型, 测量持续的重负载背景请求下轻量探测请求相对空闲时的时延膨胀
+
+    Args:
+        config (dict): config文件内容, 干扰测试配置位于interference字段
+        source (PromptSource): prompt来源, 探测请求与背景请求按名称模式从中选取, 循环使用
+
+    Returns:
+        dict: {model_name: 每个阶段的评估结果列表, 第一个为基线}
+    """
+    from utils.summary import interference_summary_table
+
+    save_path = config.get("save_path", "")
+    context = streaming_context(config, source, "interference", "use probe_model_config and background_model_config instead")
+    interference_config = interference_config_from(config)
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+    log_config_info(config, source, interference=interference_config)
+
+    prompts = list(source)
+    probe_prompts = select_prompts(prompts, interference_config["probe_prompts"], "probe")
+    background_prompts = select_prompts(prompts, interference_config["background_prompts"], "background")
+    logger.info(f"Probe prompts: {len(probe_prompts)}, background prompts: {len(background_prompts)}")
+    interference_results = run_monitored(
+        interference_main(models, probe_prompts, background_prompts, interference_config, context, config.get("timeout", DEFAULT_TIMEOUT)),
+        models,
+        save_path,
+        context
+    )
+    interference_summary_table(interference_results, interference_config, save_path, config.get("report", None))
+    return interference_results
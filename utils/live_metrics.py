@@ -0,0 +1,245 @@
+import asyncio
+import collections
+import logging
+import os
+import sys
+import time
+
+from utils.errors import CANCELLED
+from utils.stats import percentile
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+# Prometheus指标名称的前缀
+METRIC_PREFIX = "llm_test"
+
+
+class ModelMetrics:
+    """单个模型的累计计数以及滑动窗口内已完成请求的(结束时间, 时延, 首token时间, decode token数, 是否成功, 是否主动断开)
+
+    客户端主动断开(cancelled)的请求单独计数, 不计入failed与errors
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.decode_tokens = 0
+        self.latency_sum = 0.0
+        self.errors = collections.Counter()
+        self.window = collections.deque()
+
+
+class LiveMetrics:
+    """运行过程中的实时指标, 由process_model在请求开始和结束时更新
+
+    吞吐和时延分位数基于最近window秒内完成的请求计算; 所有更新都在事件循环线程中进行, 无需加锁
+
+    Attributes:
+        window (float): 滑动窗口长度, 单位为秒
+        interval (float): 终端面板的刷新间隔, 单位为秒
+        dashboard (bool): 是否在终端显示实时面板
+        prometheus_port (int): Prometheus /metrics接口的端口, 为None时不开启
+        prometheus_host (str): /metrics接口监听的地址
+    """
+
+    def __init__(self, window=10, interval=1, dashboard=True, prometheus_port=None, prometheus_host="0.0.0.0"):
+        self.window = window
+        self.interval = interval
+        self.dashboard = dashboard
+        self.prometheus_port = prometheus_port
+        self.prometheus_host = prometheus_host
+        self.models = {}
+        self.start_time = time.time()
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的live_metrics字段构造, 未配置或enabled为false时返回None"""
+        live_config = config.get("live_metrics", None)
+        if live_config is None or live_config.get("enabled", True) is False:
+            return None
+        return cls(
+            window=live_config.get("window", 10),
+            interval=live_config.get("interval", 1),
+            dashboard=live_config.get("dashboard", True),
+            prometheus_port=live_config.get("prometheus_port", None),
+            prometheus_host=live_config.get("prometheus_host", "0.0.0.0")
+        )
+
+    def model(self, model_name):
+        if model_name not in self.models:
+            self.models[model_name] = ModelMetrics()
+        return self.models[model_name]
+
+    def request_started(self, model_name):
+        self.model(model_name).in_flight += 1
+
+    def request_finished(self, record):
+        item = self.model(record.model)
+        item.in_flight -= 1
+        item.completed += 1
+        cancelled = record.error_type == CANCELLED
+        if cancelled:
+            item.cancelled += 1
+        elif not record.ok:
+            item.failed += 1
+            item.errors[record.error_type] += 1
+        else:
+            item.decode_tokens += max(record.decode_tokens, 0)
+            item.latency_sum += record.elapsed_time
+        item.window.append((record.end_time, record.elapsed_time, record.ttft, max(record.decode_tokens, 0), record.ok, cancelled))
+
+    def snapshot(self, now=None):
+        """每个模型当前的指标
+
+        Returns:
+            dict: {模型名称: 指标字典}
+        """
+        now = time.time() if now is None else now
+        span = min(self.window, max(now - self.start_time, 1e-6))
+        snapshot = {}
+        for model_name, item in self.models.items():
+            while item.window and item.window[0][0] < now - self.window:
+                item.window.popleft()
+            latencies = [x[1] for x in item.window if x[4]]
+            ttfts = [x[2] for x in item.window if x[4] and x[2] >= 0]
+            snapshot[model_name] = {
+                "in_flight": item.in_flight,
+                "completed": item.completed,
+                "failed": item.failed,
+                "cancelled": item.cancelled,
+                "decode_tokens": item.decode_tokens,
+                "latency_sum": item.latency_sum,
+                "errors": dict(item.errors),
+                "request_rate": len(item.window) / span,
+                "token_rate": sum(x[3] for x in item.window) / span,
+                "window_error_rate": sum(1 for x in item.window if not x[4] and not x[5]) / len(item.window) if item.window else 0,
+                "p50_latency": percentile(latencies, 50),
+                "p99_latency": percentile(latencies, 99),
+                "p50_ttft": percentile(ttfts, 50),
+                "p99_ttft": percentile(ttfts, 99)
+            }
+        return snapshot
+
+
+def render_dashboard(metrics, snapshot):
+    """将snapshot渲染为终端表格"""
+    elapsed = time.time() - metrics.start_time
+    lines = [
+        f"[live metrics] elapsed {elapsed:.0f}s, window {metrics.window}s",
+        f"{'Model':<32} {'InFlight':>8} {'Done':>8} {'Failed':>7} {'Cancel':>7} {'Req/s':>8} {'Tok/s':>10} "
+        f"{'P50 Lat':>8} {'P99 Lat':>8} {'P50 TTFT':>9} {'P99 TTFT':>9}  Errors"
+    ]
+    for model_name, item in snapshot.items():
+        errors = ", ".join(f"{error_type}:{count}" for error_type, count in item["errors"].items())
+        lines.append(
+            f"{model_name[-32:]:<32} {item['in_flight']:>8} {item['completed']:>8} {item['failed']:>7} {item['cancelled']:>7} "
+            f"{item['request_rate']:>8.2f} {item['token_rate']:>10.1f} {item['p50_latency']:>8.3f} {item['p99_latency']:>8.3f} "
+            f"{item['p50_ttft']:>9.3f} {item['p99_ttft']:>9.3f}  {errors}"
+        )
+    return lines
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshot):
+    """将snapshot渲染为Prometheus文本格式"""
+
+    def label(model_name, **extra):
+        labels = {"model": model_name, **extra}
+        return ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels.items())
+
+    metric_defs = [
+        ("requests_in_flight", "gauge", "Requests currently in flight"),
+        ("requests_total", "counter", "Finished requests by status"),
+        ("request_errors_total", "counter", "Failed requests by error type"),
+        ("decode_tokens_total", "counter", "Decode tokens of successful requests"),
+        ("request_rate", "gauge", "Finished requests per second in the rolling window"),
+        ("decode_token_rate", "gauge", "Decode tokens per second in the rolling window"),
+        ("request_latency_seconds", "summary", "End-to-end latency of successful requests in the rolling window"),
+        ("ttft_seconds", "gauge", "Time to first token of successful requests in the rolling window")
+    ]
+    samples = {name: [] for name, _, _ in metric_defs}
+    for model_name, item in snapshot.items():
+        samples["requests_in_flight"].append(f"{{{label(model_name)}}} {item['in_flight']}")
+        ok_count = item['completed'] - item['failed'] - item['cancelled']
+        samples["requests_total"].append(f"{{{label(model_name, status='ok')}}} {ok_count}")
+        samples["requests_total"].append(f"{{{label(model_name, status='failed')}}} {item['failed']}")
+        samples["requests_total"].append(f"{{{label(model_name, status='cancelled')}}} {item['cancelled']}")
+        for error_type, count in item["errors"].items():
+            samples["request_errors_total"].append(f"{{{label(model_name, error_type=error_type)}}} {count}")
+        samples["decode_tokens_total"].append(f"{{{label(model_name)}}} {item['decode_tokens']}")
+        samples["request_rate"].append(f"{{{label(model_name)}}} {item['request_rate']:.6f}")
+        samples["decode_token_rate"].append(f"{{{label(model_name)}}} {item['token_rate']:.6f}")
+        for quantile in ["0.5", "0.99"]:
+            key = "p50" if quantile == "0.5" else "p99"
+            if item[f"{key}_latency"] >= 0:
+                samples["request_latency_seconds"].append(f"{{{label(model_name, quantile=quantile)}}} {item[f'{key}_latency']:.6f}")
+            if item[f"{key}_ttft"] >= 0:
+                samples["ttft_seconds"].append(f"{{{label(model_name, quantile=quantile)}}} {item[f'{key}_ttft']:.6f}")
+        samples["request_latency_seconds"].append(f"_sum{{{label(model_name)}}} {item['latency_sum']:.6f}")
+        samples["request_latency_seconds"].append(f"_count{{{label(model_name)}}} {ok_count}")
+
+    lines = []
+    for name, metric_type, help_text in metric_defs:
+        full_name = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        lines.extend(f"{full_name}{sample}" for sample in samples[name])
+    return "\n".join(lines) + "\n"
+
+
+async def start_prometheus_server(metrics):
+    """在当前事件循环中启动/metrics接口, 返回用于关闭的runner"""
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render_prometheus(metrics.snapshot()), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, metrics.prometheus_host, metrics.prometheus_port)
+    await site.start()
+    logger.info(f"Prometheus metrics available at http://{metrics.prometheus_host}:{metrics.prometheus_port}/metrics")
+    return runner
+
+
+async def live_metrics_main(metrics, stop_event):
+    """按interval刷新终端面板, 并在配置了端口时开放/metrics接口, stop_event被设置后停止"""
+    runner = None
+    if metrics.prometheus_port is not None:
+        runner = await start_prometheus_server(metrics)
+    interactive = sys.stdout.isatty()
+    if metrics.dashboard is True and interactive:
+        # 面板原地刷新, 逐请求的httpx日志会打乱面板
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    last_height = 0
+    try:
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=metrics.interval)
+            except asyncio.TimeoutError:
+                pass
+            if metrics.dashboard is not True:
+                continue
+            lines = render_dashboard(metrics, metrics.snapshot())
+            if interactive:
+                # 光标回到上一次面板的开头并清除其后内容, 使面板原地刷新
+                prefix = f"\033[{last_height}F\033[J" if last_height > 0 else ""
+                sys.stdout.write(prefix + "\n".join(lines) + "\n")
+                last_height = len(lines)
+            else:
+                sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+    finally:
+        if runner is not None:
+            await runner.cleanup()
@@ -0,0 +1,94 @@
+import asyncio
+import itertools
+import logging
+import os
+import random
+import time
+
+from utils.runner import process_model
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+
+async def run_open_loop(client, model, prompts, rate, context, duration=None, num_requests=None, seed=0, variant=None):
+    """以泊松到达的方式按照给定速率向单个模型发送请求(开环), 发送速率不受请求完成情况影响
+
+    duration和num_requests至少给出一个, 二者都给出时以先达到者为准; 发送结束后等待所有在途请求完成
+
+    Args:
+        client (AsyncClient): 用于异步发送请求的client
+        model (dict): config文件中某个model的config信息
+        prompts (list): PromptItem列表, 循环使用
+        rate (float): 平均每秒发送的请求数
+        context (RunContext): 本次运行的共享设置
+        duration (float): 发送持续时间, 单位为秒
+        num_requests (int): 发送请求的总数
+        seed (int): 到达间隔的随机种子
+        variant (WorkloadVariant): 每个请求使用的变体, 为None时只使用全局model_config
+
+    Returns:
+        list: 每个请求的RequestResult
+    """
+    assert duration is not None or num_requests is not None, "duration or num_requests must be provided"
+    rng = random.Random(seed)
+    prompt_cycle = itertools.cycle(prompts)
+    tasks = []
+    start = time.time()
+    next_arrival = start
+    while True:
+        if num_requests is not None and len(tasks) >= num_requests:
+            break
+        if duration is not None and next_arrival - start >= duration:
+            break
+        delay = next_arrival - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(
+            process_model(client, 0, model, next(prompt_cycle), "", context, variant)
+        ))
+        next_arrival += rng.expovariate(rate)
+    return list(await asyncio.gather(*tasks))
+
+
+async def run_closed_loop(client, model, prompts, concurrency, context, duration=None, num_requests=None, stop_event=None, variant=None):
+    """以固定并发数向单个模型发送请求(闭环), 每个worker在上一个请求完成后立即发送下一个请求
+
+    Args:
+        client (AsyncClient): 用于异步发送请求的client
+        model (dict): config文件中某个model的config信息
+        prompts (list): PromptItem列表, 循环使用
+        concurrency (int): 并发数
+        context (RunContext): 本次运行的共享设置
+        duration (float): 发送持续时间, 单位为秒, 到达后不再发送新请求
+        num_requests (int): 发送请求的总数
+        stop_event (asyncio.Event): 被设置后不再发送新请求, 用于持续时间由外部决定的负载
+        variant (WorkloadVariant): 每个请求使用的变体, 为None时只使用全局model_config
+
+    Returns:
+        list: 每个请求的RequestResult
+    """
+    assert duration is not None or num_requests is not None or stop_event is not None, \
+        "duration, num_requests or stop_event must be provided"
+    prompt_cycle = itertools.cycle(prompts)
+    results = []
+    start = time.time()
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while True:
+            if num_requests is not None and sent >= num_requests:
+                return
+            if duration is not None and time.time() - start >= duration:
+                return
+            if stop_event is not None and stop_event.is_set():
+                return
+            sent += 1
+            results.append(await process_model(client, 0, model, next(prompt_cycle), "", context, variant))
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return results
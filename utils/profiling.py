@@ -0,0 +1,263 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from datetime import datetime
+
+from utils.file_helper import ConfigError
+from utils.stats import percentile
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+PROFILERS = ["cprofile", "pyinstrument"]
+
+DEFAULT_PROFILING_CONFIG = {
+    "enabled": True,
+    "lag_interval": 0.05,     # 事件循环延迟的采样间隔, 单位为秒
+    "lag_warning": 0.1,       # 事件循环延迟超过该值(秒)的采样计为延迟过高
+    "profiler": None,         # cprofile或pyinstrument, 为null时不记录函数级profile
+    "max_lag_samples": 100000  # 最多保存的延迟采样数, 超过后只更新计数和最大值
+}
+
+# 需要占用事件循环线程CPU的阶段, 其总耗时计入客户端开销; http为等待网络的时间, 不计入
+CPU_PHASES = ["json_encode", "json_decode", "persistence", "summary"]
+# 在线程池中执行的阶段, 耗时为工作线程中实际执行的时间(不含排队), 不占用事件循环, 单独报告
+THREAD_PHASES = ["local_token_count"]
+
+
+class PhaseStats:
+    """单个阶段的累计耗时"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed, count=1):
+        self.count += count
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+
+class ClientProfiler:
+    """客户端的性能剖析, 用于判断客户端是否成为瓶颈
+
+    记录事件循环延迟的采样, 以及json编解码, http收发, 保存结果, 本地token计数和生成summary各阶段的耗时,
+    可选地以cProfile或pyinstrument记录整个运行的函数级profile. 所有更新都在事件循环线程中进行, 无需加锁
+
+    Attributes:
+        lag_interval (float): 事件循环延迟的采样间隔
+        lag_warning (float): 判定延迟过高的阈值
+        profiler (str): 函数级profile的工具, 为None时不记录
+        max_lag_samples (int): 最多保存的延迟采样数
+    """
+
+    def __init__(self, lag_interval=0.05, lag_warning=0.1, profiler=None, max_lag_samples=100000):
+        if profiler is not None and profiler not in PROFILERS:
+            logger.error(f"Invalid profiler: {profiler}, expected one of {PROFILERS}")
+            raise ConfigError
+        self.lag_interval = lag_interval
+        self.lag_warning = lag_warning
+        self.profiler = profiler
+        self.max_lag_samples = max_lag_samples
+        self.phases = {}
+        self.lag_samples = []
+        self.lag_count = 0
+        self.lag_max = 0.0
+        self.late_count = 0
+        self.wall_start = None
+        self.cpu_start = None
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.function_profiler = None
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的profiling字段构造, 未配置或enabled为false时返回None"""
+        profiling_config = config.get("profiling", None)
+        if profiling_config is None:
+            return None
+        merged = dict(DEFAULT_PROFILING_CONFIG)
+        merged.update(profiling_config)
+        if merged["enabled"] is False:
+            return None
+        return cls(merged["lag_interval"], merged["lag_warning"], merged["profiler"], merged["max_lag_samples"])
+
+    def add(self, phase_name, elapsed, count=1):
+        if phase_name not in self.phases:
+            self.phases[phase_name] = PhaseStats()
+        self.phases[phase_name].add(elapsed, count)
+
+    @contextlib.contextmanager
+    def phase(self, phase_name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase_name, time.perf_counter() - start)
+
+    def start(self):
+        """开始计时, 配置了profiler时同时开始记录函数级profile"""
+        if self.profiler == "cprofile":
+            import cProfile
+            self.function_profiler = cProfile.Profile()
+        elif self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                logger.error("pyinstrument profiling requires pyinstrument, please run `pip install pyinstrument`")
+                raise e
+            # profile覆盖整个事件循环, 按线程采样即可, 等待网络的时间体现为事件循环中的select
+            self.function_profiler = Profiler(async_mode="disabled")
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        if self.function_profiler is not None:
+            if self.profiler == "cprofile":
+                self.function_profiler.enable()
+            else:
+                self.function_profiler.start()
+
+    def stop(self):
+        if self.function_profiler is not None:
+            if self.profiler == "cprofile":
+                self.function_profiler.disable()
+            else:
+                self.function_profiler.stop()
+        self.wall_time = time.perf_counter() - self.wall_start
+        self.cpu_time = time.process_time() - self.cpu_start
+
+    async def lag_monitor(self, stop_event):
+        """每隔lag_interval秒醒来一次, 实际醒来时间与预期时间之差即为事件循环延迟"""
+        while not stop_event.is_set():
+            expected = time.perf_counter() + self.lag_interval
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.lag_interval)
+            except asyncio.TimeoutError:
+                pass
+            if stop_event.is_set():
+                break
+            lag = max(0.0, time.perf_counter() - expected)
+            self.lag_count += 1
+            if lag > self.lag_max:
+                self.lag_max = lag
+            if lag > self.lag_warning:
+                self.late_count += 1
+                if self.late_count == 1:
+                    logger.warning(f"Event loop lag {lag:.3f}s exceeds {self.lag_warning}s, the client may be the bottleneck")
+            if len(self.lag_samples) < self.max_lag_samples:
+                self.lag_samples.append(lag)
+
+    def overview(self, request_num):
+        """整体开销指标
+
+        Args:
+            request_num (int): 本次运行的请求数
+
+        Returns:
+            dict: 指标名称与取值
+        """
+        cpu_phase_time = sum(self.phases[name].total for name in CPU_PHASES if name in self.phases)
+        thread_phase_time = sum(self.phases[name].total for name in THREAD_PHASES if name in self.phases)
+        request_phase_time = cpu_phase_time - (self.phases["summary"].total if "summary" in self.phases else 0)
+        return {
+            "Requests": request_num,
+            "Wall Time (s)": round(self.wall_time, 3),
+            "Client CPU Time (s)": round(self.cpu_time, 3),
+            "Client CPU Utilization": round(self.cpu_time / self.wall_time, 4) if self.wall_time > 0 else -1,
+            "Measured Client Work (s)": round(cpu_phase_time, 3),
+            "Client Work per Request (ms)": round(request_phase_time / request_num * 1000, 3) if request_num > 0 else -1,
+            "Off-loop Thread Work (s)": round(thread_phase_time, 3),
+            "Lag Samples": self.lag_count,
+            "Mean Loop Lag (ms)": round(sum(self.lag_samples) / len(self.lag_samples) * 1000, 3) if self.lag_samples else -1,
+            "P50 Loop Lag (ms)": round(percentile(self.lag_samples, 50) * 1000, 3) if self.lag_samples else -1,
+            "P99 Loop Lag (ms)": round(percentile(self.lag_samples, 99) * 1000, 3) if self.lag_samples else -1,
+            "Max Loop Lag (ms)": round(self.lag_max * 1000, 3),
+            "Late Lag Samples": self.late_count,
+            "Function Profiler": self.profiler or ""
+        }
+
+    def write_report(self, request_num, save_path, report_config=None):
+        """保存各阶段耗时与整体开销的表格, 以及函数级profile
+
+        cProfile的结果保存为.prof文件, 可用pstats, snakeviz等工具查看; pyinstrument的结果保存为.html和.pyisession文件
+
+        Args:
+            request_num (int): 本次运行的请求数
+            save_path (str): 保存路径
+            report_config (dict): config中的report字段, 决定表格的输出格式
+
+        Returns:
+            list: 写出的文件路径
+        """
+        import pandas as pd
+
+        from utils.report import write_table
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_files = []
+        if self.function_profiler is not None:
+            if self.profiler == "cprofile":
+                profile_path = os.path.join(save_path, f"profile_{timestamp}.prof")
+                self.function_profiler.dump_stats(profile_path)
+                output_files.append(profile_path)
+            else:
+                session_path = os.path.join(save_path, f"profile_{timestamp}.pyisession")
+                self.function_profiler.last_session.save(session_path)
+                html_path = os.path.join(save_path, f"profile_{timestamp}.html")
+                with open(html_path, 'w', encoding='utf-8') as f:
+                    f.write(self.function_profiler.output_html())
+                output_files.extend([session_path, html_path])
+
+        data = []
+        for phase_name, stats in self.phases.items():
+            data.append(
+                {
+                    "Phase": phase_name,
+                    "Client CPU": phase_name in CPU_PHASES,
+                    "Off Loop": phase_name in THREAD_PHASES,
+                    "Count": stats.count,
+                    "Total (s)": round(stats.total, 4),
+                    "Mean (ms)": round(stats.total / stats.count * 1000, 4) if stats.count > 0 else -1,
+                    "Max (ms)": round(stats.max * 1000, 4),
+                    "Share of Wall Time": round(stats.total / self.wall_time, 4) if self.wall_time > 0 else -1
+                }
+            )
+        overview = self.overview(request_num)
+        table_files = write_table(
+            {
+                # 每个指标单独一列, 使csv和parquet中每列类型一致
+                "overview": pd.DataFrame([overview]),
+                "phases": pd.DataFrame(data)
+            },
+            "profile_summary_table",
+            save_path,
+            report_config
+        )
+        output_files.extend(table_files)
+        logger.info(
+            f"Client profile: CPU utilization {overview['Client CPU Utilization']}, client work per request "
+            f"{overview['Client Work per Request (ms)']}ms, p99 loop lag {overview['P99 Loop Lag (ms)']}ms, saved to {', '.join(table_files)}"
+        )
+        return output_files
+
+
+def timed_call(func, *args):
+    """执行func并返回(结果, 耗时), 用于在工作线程中计时, 使耗时不含线程池排队和事件循环调度的时间"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def profile_phase(profiler, phase_name):
+    """profiler不为None时记录phase_name阶段的耗时, 否则不做任何事"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(phase_name)
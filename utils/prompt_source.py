@@ -0,0 +1,290 @@
+import copy
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+
+from utils.file_helper import load_json_txt_prompt, load_json_vlm_prompt, ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+
+@dataclass
+class PromptItem:
+    """一条待发送的prompt
+
+    Attributes:
+        name (str): prompt名称, 用于保存回答信息和summary
+        messages (list): 发送给模型的messages
+        info (dict): prompt的额外信息, 如sweep中的图片数量和分辨率
+        params (dict): 该prompt专属的请求参数, 如max_tokens, 会覆盖model_config中的同名参数
+    """
+    name: str
+    messages: list
+    info: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+
+
+class PromptSource:
+    """prompt来源的基类, 迭代时依次产生PromptItem
+
+    Attributes:
+        sequential (bool): 是否需要依次串行发送每个prompt, 默认为并行
+        stream (bool): 是否需要以流式发送请求以记录首token时间
+    """
+    sequential = False
+    stream = False
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def describe(self):
+        return self.__class__.__name__
+
+    def prepare(self):
+        """发送请求前的准备工作, 如加载或校准tokenizer, 默认不做任何事; --dry-run时不调用"""
+        pass
+
+    def prompt_names(self):
+        """按迭代顺序的prompt名称, --dry-run时用于列出计划的负载"""
+        return [prompt_item.name for prompt_item in self]
+
+    def extra_summary(self, results, save_path, summary_info, report_config=None):
+        """运行结束后输出来源特有的summary, 默认不输出; report_config为config中的report字段, 决定输出格式"""
+        pass
+
+
+class TextFileSource(PromptSource):
+    """load_path文件夹下的每个文件为一个prompt"""
+
+    def __init__(self, load_path):
+        self.load_path = load_path
+
+    def __iter__(self):
+        for file_name in sorted(os.listdir(self.load_path)):
+            file_path = os.path.join(self.load_path, file_name)
+            if os.path.isfile(file_path):
+                yield PromptItem(file_name, load_json_txt_prompt(file_path))
+
+    def describe(self):
+        return f"text files in {self.load_path}"
+
+
+class JSONLSource(PromptSource):
+    """jsonl文件中的每一行为一个prompt
+
+    每行可以是messages列表, 也可以是{"name": ..., "messages": [...]}形式的字典, 未提供name时以行号命名
+    """
+
+    def __init__(self, load_path):
+        self.load_path = load_path
+
+    def __iter__(self):
+        base_name = os.path.splitext(os.path.basename(self.load_path))[0]
+        with open(self.load_path, 'r', encoding='utf-8') as file:
+            for line_idx, line in enumerate(file):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    content = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Failed to parse JSON in line {line_idx} of file: {self.load_path}")
+                    logger.error(f"Error: {e}")
+                    continue
+                if isinstance(content, list):
+                    yield PromptItem(f"{base_name}_{line_idx}", content)
+                else:
+                    yield PromptItem(content.get('name', f"{base_name}_{line_idx}"), content['messages'])
+
+    def describe(self):
+        return f"jsonl prompts in {self.load_path}"
+
+
+def attach_images(prompt, image_path_list):
+    """将图片以file://的形式追加到第一条message中, 返回新的prompt"""
+    current_prompt = copy.deepcopy(prompt)
+    for image_path in image_path_list:
+        current_prompt[0]['content'].append({"type": "image_url", "image_url": {"url": "file://" + image_path}})
+    return current_prompt
+
+
+def load_test_folder(test_path):
+    """读取mode 0格式的测试文件夹, 返回prompt以及图片路径列表"""
+    prompt = None
+    image_path_list = []
+    for item in sorted(os.listdir(test_path)):
+        item_path = os.path.join(test_path, item)
+
+        if os.path.isfile(item_path) and item.endswith('.txt'): # prompt
+            prompt = load_json_vlm_prompt(item_path)
+
+        elif os.path.isdir(item_path): # images
+            for image in sorted(os.listdir(item_path)):
+                image_path = os.path.join(item_path, image)
+                if os.path.isfile(image_path):
+                    image_path_list.append(os.path.abspath(image_path))
+    return prompt, image_path_list
+
+
+class VLMTestSource(PromptSource):
+    """VLM mode 0, load_path下每个文件夹为一个测试, 包含一个prompt文件和一个图片文件夹"""
+
+    def __init__(self, load_path):
+        self.load_path = load_path
+
+    def __iter__(self):
+        for test_name in sorted(os.listdir(self.load_path)):
+            test_path = os.path.join(self.load_path, test_name)
+            if not os.path.isdir(test_path):
+                continue
+            prompt, image_path_list = load_test_folder(test_path)
+            yield PromptItem(test_name, attach_images(prompt, image_path_list))
+
+    def describe(self):
+        return f"vlm mode 0 tests in {self.load_path}"
+
+
+class VLMImageSource(PromptSource):
+    """VLM mode 1, prompt保持不变, load_images_path下的每张图片与prompt构成一个输入"""
+
+    def __init__(self, load_images_path, prompt):
+        assert prompt != None, "In mode == 1, prompt path must be provided by the user"
+        self.load_images_path = load_images_path
+        self.prompt = prompt
+
+    def __iter__(self):
+        for image_name in sorted(os.listdir(self.load_images_path)):
+            image_path = os.path.join(self.load_images_path, image_name)
+            if os.path.isfile(image_path):
+                yield PromptItem(image_name, attach_images(self.prompt, [os.path.abspath(image_path)]))
+
+    def describe(self):
+        return f"vlm mode 1 images in {self.load_images_path}"
+
+
+class VLMSweepSource(PromptSource):
+    """VLM mode 2, 以一个mode 0格式的测试为基础, 生成1..N张图片与多个目标分辨率的所有组合
+
+    基础测试中的图片会被循环使用以凑足max_images张, 并缩放到每个目标分辨率后保存在save_path/sweep_images下,
+    保证服务端可以通过file://访问到缩放后的图片. 各变体之间串行以避免相互干扰, 请求以流式发送, 用首token时间作为prefill时间
+    """
+    sequential = True
+    stream = True
+
+    def __init__(self, load_path, save_path, max_images=None, resolutions=None):
+        self.load_path = load_path
+        self.save_path = save_path
+        self.max_images = max_images
+        self.resolutions = resolutions if resolutions is not None else [[224, 224], [448, 448], [896, 896]]
+        self.prompt, self.sweep_info = self.build_sweep_variants()
+
+    def build_sweep_variants(self):
+        """生成所有变体
+
+        Returns:
+            tuple: (prompt, sweep_info), sweep_info为{variant_name: {"image_count", "width", "height", "pixels", "image_path_list"}}
+        """
+        try:
+            from PIL import Image
+        except ImportError as e:
+            logger.error("Sweep mode requires Pillow, please run `pip install pillow`")
+            raise e
+
+        prompt, base_image_list = load_test_folder(self.load_path)
+        assert prompt != None, f"No prompt file found in {self.load_path}"
+        assert len(base_image_list) > 0, f"No image found in {self.load_path}"
+        max_images = self.max_images if self.max_images is not None else len(base_image_list)
+
+        sweep_info = {}
+        for width, height in self.resolutions:
+            resolution_folder = os.path.abspath(os.path.join(self.save_path, "sweep_images", f"{width}x{height}"))
+            os.makedirs(resolution_folder, exist_ok=True)
+            resized_list = []
+            for idx in range(max_images):
+                base_image = base_image_list[idx % len(base_image_list)]
+                resized_path = os.path.join(resolution_folder, f"image_{idx}.jpg")
+                with Image.open(base_image) as image:
+                    image.convert("RGB").resize((width, height)).save(resized_path, format="JPEG")
+                resized_list.append(resized_path)
+
+            for image_count in range(1, max_images + 1):
+                variant_name = f"images_{image_count}_{width}x{height}"
+                sweep_info[variant_name] = {
+                    "image_count": image_count,
+                    "width": width,
+                    "height": height,
+                    "pixels": image_count * width * height,
+                    "image_path_list": resized_list[:image_count]
+                }
+        return prompt, sweep_info
+
+    def __iter__(self):
+        for variant_name, info in self.sweep_info.items():
+            yield PromptItem(variant_name, attach_images(self.prompt, info['image_path_list']), info)
+
+    def describe(self):
+        return f"vlm sweep variants {list(self.sweep_info.keys())}"
+
+    def extra_summary(self, results, save_path, summary_info, report_config=None):
+        if summary_info.get("sweep_summary", False) is True:
+            from utils.summary import vlm_sweep_summary_table
+            vlm_sweep_summary_table(results, self.sweep_info, save_path, report_config)
+
+
+def prompt_source_from_config(config):
+    """根据config构造prompt来源
+
+    存在synthetic时构造合成负载; scenario为replay时从replay.trace中逐条读取trace; 存在load_config时按照VLM的mode构造(0: 测试文件夹, 1: 单prompt多图片, 2: sweep, 3: jsonl),
+    否则使用load_path, 其为文件夹时每个文件为一个prompt, 为.jsonl文件时每行为一个prompt
+
+    Args:
+        config (dict): config文件内容
+
+    Returns:
+        PromptSource: prompt来源
+    """
+    if "synthetic" in config:
+        from utils.synthetic import SyntheticSource
+        return SyntheticSource(config["synthetic"], config.get("models", []))
+
+    if config.get("scenario", "default") == "replay":
+        from utils.trace import TraceSource
+        replay_config = config.get("replay", {})
+        return TraceSource(
+            replay_config.get("trace", ""),
+            replay_config.get("match_output_len", True),
+            replay_config.get("start", 0),
+            replay_config.get("duration", None),
+            replay_config.get("max_requests", None)
+        )
+
+    load_config = config.get("load_config", None)
+    if load_config is None:
+        load_path = config.get("load_path", "")
+        if os.path.isfile(load_path) and load_path.endswith(".jsonl"):
+            return JSONLSource(load_path)
+        return TextFileSource(load_path)
+
+    mode = load_config.get("mode", -1)
+    if mode == 0: # load底下只有一个路径，既存在prompt也存在image
+        return VLMTestSource(load_config.get("load_path", ""))
+    elif mode == 1: # load底下存在一个image文件夹和一个prompt文件，每个prompt和image文件夹中的一个文件构成输入
+        prompt = load_json_vlm_prompt(load_config.get("load_prompt_path", ""))
+        return VLMImageSource(load_config.get("load_images_path", ""), prompt)
+    elif mode == 2: # load底下为一个mode 0格式的基础测试, 自动生成不同图片数量和分辨率的变体
+        return VLMSweepSource(
+            load_config.get("load_path", ""),
+            config.get("save_path", ""),
+            load_config.get("max_images", None),
+            load_config.get("resolutions", None)
+        )
+    elif mode == 3: # load_path为jsonl文件, 每行为一个prompt
+        return JSONLSource(load_config.get("load_path", ""))
+    else:
+        logger.error(f"Invalid load_config mode: {mode}")
+        raise ConfigError
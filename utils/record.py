@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class RequestResult:
+    """单个请求的测试结果, 从发送请求一直使用到生成summary
+
+    时间均为time.time()得到的浮点秒数, 未知的数值字段为-1; 请求失败时error不为None,
+    此时token相关字段为-1, end_time为失败发生的时间. prompt和model字段引用共享的字符串对象, 不会为每条记录复制
+
+    使用slots后对象本身为19个字段的指针加对象头, 在64位CPython上约184字节, 加上各自独立的浮点数(start_time,
+    end_time, ttft)和超出小整数缓存的token数, 一条不含回答的记录约330字节. 默认情况下response保存完整回答,
+    此时内存占用主要由回答长度决定, 记录数量很大时应开启metrics_only, 使response为None
+
+    Attributes:
+        prompt (str): prompt名称
+        model (str): 模型名称
+        start_time (float): 请求开始时间
+        end_time (float): 请求结束时间
+        prompt_tokens (int): prompt token数
+        decode_tokens (int): 生成token数
+        ttft (float): 首token时间(秒), 仅流式请求时有效
+        response (str): 模型回答内容
+        error (str): 错误信息, 成功时为None
+        error_type (str): 错误类型, 取值见utils.errors.ERROR_TYPES, 成功时为None
+        status_code (int): 错误类型为http_status时的状态码, 否则为-1
+        attempts (int): 发送次数, 大于1表示发生过重试
+        usage_source (str): prompt_tokens和decode_tokens的来源, server为服务端返回的usage, local为本地token计数
+        local_prompt_tokens (int): 本地计数的prompt token数, 未开启本地计数或无法计数时为-1
+        local_decode_tokens (int): 本地计数的生成token数, 未开启本地计数时为-1
+        endpoint (str): 最后一次发送所使用的副本地址, 请求未发出时为None
+        variant (str): workload_matrix中的变体名称, 未使用变体时为None
+        warmup (bool): 是否为预热请求, 预热请求的结果照常保存但不计入指标
+        response_ref (int): metrics_only模式下回答在ResponseStore中的行号, 此时response为None; 未保存时为-1
+    """
+    prompt: str
+    model: str
+    start_time: float
+    end_time: float = -1.0
+    prompt_tokens: int = -1
+    decode_tokens: int = -1
+    ttft: float = -1.0
+    response: str = None
+    error: str = None
+    error_type: str = None
+    status_code: int = -1
+    attempts: int = 1
+    usage_source: str = "server"
+    local_prompt_tokens: int = -1
+    local_decode_tokens: int = -1
+    endpoint: str = None
+    variant: str = None
+    warmup: bool = False
+    response_ref: int = -1
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def elapsed_time(self):
+        if self.end_time < 0:
+            return -1
+        return self.end_time - self.start_time
+
+    @property
+    def decode_speed(self):
+        elapsed_time = self.elapsed_time
+        if not self.ok or self.decode_tokens < 0 or elapsed_time <= 0:
+            return -1
+        return self.decode_tokens / elapsed_time
+
+    @property
+    def tpot(self):
+        """首token之后平均每个输出token的时间, 仅流式请求且生成多于一个token时有效"""
+        if not self.ok or self.ttft < 0 or self.decode_tokens <= 1:
+            return -1
+        return (self.elapsed_time - self.ttft) / (self.decode_tokens - 1)
+
+    def to_dict(self):
+        """转换为可直接json序列化的字典, 时间以isoformat表示"""
+        return {
+            "file": self.prompt,
+            "model": self.model,
+            "start_time": datetime.fromtimestamp(self.start_time).isoformat(),
+            "end_time": datetime.fromtimestamp(self.end_time).isoformat() if self.end_time >= 0 else -1,
+            "elapsed_time": self.elapsed_time,
+            "ttft": self.ttft,
+            "prompt_token_len": self.prompt_tokens,
+            "decode_token_len": self.decode_tokens,
+            "response": self.response,
+            "error": self.error,
+            "error_type": self.error_type,
+            "attempts": self.attempts,
+            "usage_source": self.usage_source,
+            "local_prompt_token_len": self.local_prompt_tokens,
+            "local_decode_token_len": self.local_decode_tokens,
+            "endpoint": self.endpoint,
+            "variant": self.variant,
+            "warmup": self.warmup
+        }
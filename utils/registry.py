@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from utils.stats import bootstrap, mean, percentile
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_REGISTRY_PATH = "runs"
+
+# 决定发送给服务端的负载的config字段, 只有这些字段参与config指纹的计算;
+# save_path, summary, report, profiling, json_codec, live_metrics, registry等输出与观测相关的字段不影响负载
+FINGERPRINT_KEYS = [
+    "scenario", "models", "model_config", "load_path", "load_config", "synthetic", "workload_matrix", "timeout", "retry",
+    "max_concurrency", "warmup", "adaptive_sampling", "slo_search", "replay", "interference", "context_scaling", "cancellation"
+]
+
+# models中不影响负载的字段: 鉴权信息, GPU监控地址以及本地token计数使用的tokenizer
+MODEL_FINGERPRINT_EXCLUDED_KEYS = ["api_key", "gpu_url", "gpu_interval", "tokenizer"]
+
+# 保存到meta.json前需要隐去的config字段(如模型的api_key), 按字段名匹配, 不区分大小写
+SECRET_KEYS = ["api_key", "apikey", "token", "access_token", "password", "secret", "authorization"]
+SECRET_SUFFIXES = ["_key", "_token", "_secret", "_password"]
+REDACTED = "***"
+
+# 参与比较的指标: (字段名, 是否越大越好)
+COMPARE_METRICS = [
+    ("elapsed_time", False),
+    ("ttft", False),
+    ("tpot", False),
+    ("decode_speed", True)
+]
+
+
+def config_fingerprint(config):
+    """config中影响测试负载的部分(模型, 请求参数, prompt来源等)的哈希, 用于判断两次运行是否可比"""
+    content = {key: config[key] for key in FINGERPRINT_KEYS if key in config}
+    if "models" in content:
+        content["models"] = [
+            {key: value for key, value in model.items() if key not in MODEL_FINGERPRINT_EXCLUDED_KEYS} for model in content["models"]
+        ]
+    return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+
+def is_secret_key(key):
+    key = str(key).lower()
+    return key in SECRET_KEYS or any(key.endswith(suffix) for suffix in SECRET_SUFFIXES)
+
+
+def redact_config(value):
+    """返回隐去了api_key等敏感字段的副本, 嵌套的字典和列表同样处理"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if is_secret_key(key) and item is not None else redact_config(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact_config(item) for item in value]
+    return value
+
+
+def record_metrics(record):
+    """单个请求中参与比较的指标, 无效值为-1; 使用了workload_matrix变体时, 模型名称后附加变体名称, 使不同变体分别比较"""
+    return {
+        "model": record.model if record.variant is None else f"{record.model} [{record.variant}]",
+        "prompt": record.prompt,
+        "ok": record.ok,
+        "error_type": record.error_type,
+        "elapsed_time": record.elapsed_time if record.ok else -1,
+        "ttft": record.ttft if record.ok else -1,
+        "tpot": record.tpot,
+        "decode_speed": record.decode_speed,
+        "prompt_tokens": record.prompt_tokens,
+        "decode_tokens": record.decode_tokens
+    }
+
+
+def summarize_requests(requests):
+    """按模型汇总请求指标"""
+    models = {}
+    for item in requests:
+        models.setdefault(item["model"], []).append(item)
+    summary = {}
+    for model_name, items in models.items():
+        ok_items = [item for item in items if item["ok"]]
+        latencies = [item["elapsed_time"] for item in ok_items]
+        ttfts = [item["ttft"] for item in ok_items if item["ttft"] >= 0]
+        speeds = [item["decode_speed"] for item in ok_items if item["decode_speed"] >= 0]
+        summary[model_name] = {
+            "requests": len(items),
+            "failed": len(items) - len(ok_items),
+            "error_rate": (len(items) - len(ok_items)) / len(items),
+            "mean_latency": mean(latencies),
+            "p50_latency": percentile(latencies, 50),
+            "p99_latency": percentile(latencies, 99),
+            "mean_ttft": mean(ttfts),
+            "mean_decode_speed": mean(speeds)
+        }
+    return summary
+
+
+class RunRegistry:
+    """保存每次运行的config指纹, 汇总指标以及逐请求指标的目录
+
+    目录结构:
+        <path>/index.jsonl: 每行为一次运行的run_id, 时间, label, scenario和config指纹
+        <path>/<run_id>/meta.json: 运行信息, 隐去api_key等敏感字段的config以及按模型汇总的指标
+        <path>/<run_id>/requests.jsonl: 逐请求的指标, 用于比较时的bootstrap
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, label=None):
+        self.path = path
+        self.label = label
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的registry字段构造, 未配置, 为false或enabled为false时返回None
+
+        registry为true时使用默认目录, 为字符串时作为目录, 为字典时读取path, label和enabled
+        """
+        registry_config = config.get("registry", None)
+        if registry_config is None or registry_config is False:
+            return None
+        if registry_config is True:
+            return cls()
+        if isinstance(registry_config, str):
+            return cls(registry_config)
+        if registry_config.get("enabled", True) is False:
+            return None
+        return cls(registry_config.get("path", DEFAULT_REGISTRY_PATH), registry_config.get("label", None))
+
+    def register(self, config, results, label=None):
+        """保存一次运行, 返回run_id, label为None时使用config中的label
+
+        run_id由时间(精确到秒)和config指纹组成, 同一秒内相同config的运行依次附加_1, _2等后缀, 不会覆盖已有的运行
+        """
+        if label is None:
+            label = self.label
+        timestamp = datetime.now()
+        fingerprint = config_fingerprint(config)
+        base_run_id = f"{timestamp.strftime('%Y%m%d_%H%M%S')}_{fingerprint[:6]}"
+        os.makedirs(self.path, exist_ok=True)
+        run_id = base_run_id
+        suffix = 0
+        while True:
+            run_path = os.path.join(self.path, run_id)
+            try:
+                os.makedirs(run_path)
+                break
+            except FileExistsError:
+                suffix += 1
+                run_id = f"{base_run_id}_{suffix}"
+
+        requests = [record_metrics(record) for record in results]
+        with open(os.path.join(run_path, "requests.jsonl"), 'w', encoding='utf-8') as file:
+            for item in requests:
+                file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        meta = {
+            "run_id": run_id,
+            "time": timestamp.isoformat(),
+            "label": label,
+            "scenario": config.get("scenario", "default"),
+            "fingerprint": fingerprint,
+            "save_path": config.get("save_path", ""),
+            "summary": summarize_requests(requests),
+            "config": redact_config(config)
+        }
+        with open(os.path.join(run_path, "meta.json"), 'w', encoding='utf-8') as file:
+            json.dump(meta, file, indent=4, ensure_ascii=False)
+        with open(os.path.join(self.path, "index.jsonl"), 'a', encoding='utf-8') as file:
+            index_item = {key: meta[key] for key in ["run_id", "time", "label", "scenario", "fingerprint"]}
+            file.write(json.dumps(index_item, ensure_ascii=False) + "\n")
+        logger.info(f"Registered run {run_id} (fingerprint {fingerprint}) in {self.path}")
+        return run_id
+
+    def list_runs(self):
+        index_path = os.path.join(self.path, "index.jsonl")
+        if not os.path.exists(index_path):
+            return []
+        with open(index_path, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def resolve(self, run_ref):
+        """run_ref可以是完整的run_id, run_id前缀, label, 或者-1, -2等表示倒数第几次运行"""
+        runs = self.list_runs()
+        if run_ref.lstrip("-").isdigit() and run_ref.startswith("-"):
+            return runs[int(run_ref)]["run_id"]
+        for run in runs:
+            if run["run_id"] == run_ref:
+                return run_ref
+        matched = [run["run_id"] for run in runs if run["run_id"].startswith(run_ref) or run["label"] == run_ref]
+        assert len(matched) > 0, f"Run {run_ref} not found in {self.path}"
+        if len(matched) > 1:
+            logger.warning(f"Run {run_ref} matches {len(matched)} runs, using the latest one {matched[-1]}")
+        return matched[-1]
+
+    def load(self, run_ref):
+        """读取一次运行
+
+        Returns:
+            tuple: (meta, 逐请求指标列表)
+        """
+        run_path = os.path.join(self.path, self.resolve(run_ref))
+        with open(os.path.join(run_path, "meta.json"), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        with open(os.path.join(run_path, "requests.jsonl"), 'r', encoding='utf-8') as file:
+            requests = [json.loads(line) for line in file if line.strip()]
+        return meta, requests
+
+
+def compare_samples(baseline, candidate, higher_is_better, threshold, num_resamples, confidence):
+    """比较两组样本的均值, 相对变化的置信区间由两组独立重采样得到
+
+    置信区间不包含0且相对变化超过threshold时判定为regression或improvement
+
+    Returns:
+        dict: 均值, 相对变化及其置信区间, 结论
+    """
+    result = {
+        "baseline_n": len(baseline),
+        "candidate_n": len(candidate),
+        "baseline_mean": mean(baseline),
+        "candidate_mean": mean(candidate),
+        "change": -1,
+        "ci": (-1, -1),
+        "verdict": "insufficient samples"
+    }
+    if len(baseline) < 2 or len(candidate) < 2 or result["baseline_mean"] <= 0:
+        return result
+    result["change"] = result["candidate_mean"] / result["baseline_mean"] - 1
+    baseline_means = bootstrap(baseline, mean, num_resamples, seed=0)
+    candidate_means = bootstrap(candidate, mean, num_resamples, seed=1)
+    changes = [c / b - 1 for b, c in zip(baseline_means, candidate_means) if b > 0]
+    alpha = (1 - confidence) / 2 * 100
+    low, high = percentile(changes, alpha), percentile(changes, 100 - alpha)
+    result["ci"] = (low, high)
+
+    if low <= 0 <= high or abs(result["change"]) < threshold:
+        result["verdict"] = "no change"
+    elif (result["change"] > 0) == higher_is_better:
+        result["verdict"] = "improvement"
+    else:
+        result["verdict"] = "regression"
+    return result
+
+
+def compare_runs(registry, run_refs, threshold=0.02, num_resamples=1000, confidence=0.95, output_path=".", report_config=None):
+    """以第一个运行为基准, 按模型以及按模型和prompt比较其余运行, 结果按report配置保存
+
+    Args:
+        registry (RunRegistry): 运行记录
+        run_refs (list): 运行的引用, 格式见RunRegistry.resolve
+        threshold (float): 判定regression/improvement的最小相对变化
+        num_resamples (int): bootstrap重采样次数
+        confidence (float): 置信区间的置信水平
+        output_path (str): 比较结果的保存路径
+        report_config (dict): 格式同config中的report字段, 决定比较结果的输出格式
+
+    Returns:
+        tuple: (按模型的比较结果DataFrame, 按prompt的比较结果DataFrame)
+    """
+    import pandas as pd
+
+    from utils.report import write_table
+
+    assert len(run_refs) >= 2, "At least two runs are required for comparison"
+    runs = [registry.load(run_ref) for run_ref in run_refs]
+    baseline_meta, baseline_requests = runs[0]
+    for meta, _ in runs[1:]:
+        if meta["fingerprint"] != baseline_meta["fingerprint"]:
+            logger.warning(
+                f"Run {meta['run_id']} has a different config fingerprint ({meta['fingerprint']}) from the baseline "
+                f"{baseline_meta['run_id']} ({baseline_meta['fingerprint']}), differences may come from the config"
+            )
+
+    def group(requests, by_prompt):
+        groups = {}
+        for item in requests:
+            key = (item["model"], item["prompt"]) if by_prompt else (item["model"],)
+            groups.setdefault(key, []).append(item)
+        return groups
+
+    def build(by_prompt):
+        data = []
+        baseline_groups = group(baseline_requests, by_prompt)
+        for meta, requests in runs[1:]:
+            candidate_groups = group(requests, by_prompt)
+            for key in baseline_groups:
+                if key not in candidate_groups:
+                    continue
+                baseline_items, candidate_items = baseline_groups[key], candidate_groups[key]
+                row = {"Baseline Run": baseline_meta["run_id"], "Run": meta["run_id"], "Model": key[0]}
+                if by_prompt:
+                    row["Prompt"] = key[1]
+                row["Baseline Error Rate"] = round(sum(1 for x in baseline_items if not x["ok"]) / len(baseline_items), 4)
+                row["Error Rate"] = round(sum(1 for x in candidate_items if not x["ok"]) / len(candidate_items), 4)
+                verdicts = []
+                for metric, higher_is_better in COMPARE_METRICS:
+                    baseline = [x[metric] for x in baseline_items if x["ok"] and x[metric] >= 0]
+                    candidate = [x[metric] for x in candidate_items if x["ok"] and x[metric] >= 0]
+                    if len(baseline) == 0 and len(candidate) == 0:
+                        continue
+                    result = compare_samples(baseline, candidate, higher_is_better, threshold, num_resamples, confidence)
+                    row[f"Baseline {metric}"] = round(result["baseline_mean"], 4)
+                    row[f"{metric}"] = round(result["candidate_mean"], 4)
+                    row[f"{metric} Change"] = round(result["change"], 4) if result["verdict"] != "insufficient samples" else -1
+                    row[f"{metric} CI"] = f"[{result['ci'][0]:.4f}, {result['ci'][1]:.4f}]"
+                    row[f"{metric} Verdict"] = result["verdict"]
+                    verdicts.append(result["verdict"])
+                if row["Error Rate"] > row["Baseline Error Rate"] + threshold:
+                    verdicts.append("regression")
+                if "regression" in verdicts:
+                    row["Verdict"] = "regression"
+                elif "improvement" in verdicts:
+                    row["Verdict"] = "improvement"
+                elif all(verdict == "insufficient samples" for verdict in verdicts):
+                    row["Verdict"] = "insufficient samples"
+                else:
+                    row["Verdict"] = "no change"
+                data.append(row)
+        return pd.DataFrame(data)
+
+    df_models = build(by_prompt=False)
+    df_prompts = build(by_prompt=True)
+
+    os.makedirs(output_path, exist_ok=True)
+    output_files = write_table({"models": df_models, "prompts": df_prompts}, "compare_table", output_path, report_config)
+    logger.info(f"Comparison saved to {', '.join(output_files)}")
+    return df_models, df_prompts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage registered runs and compare them")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_PATH, help="registry path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list registered runs")
+    compare_parser = subparsers.add_parser("compare", help="compare runs against the first one")
+    compare_parser.add_argument("runs", nargs="+", help="run id, run id prefix, label, or -1 for the latest run")
+    compare_parser.add_argument("--threshold", type=float, default=0.02, help="minimum relative change for a verdict")
+    compare_parser.add_argument("--resamples", type=int, default=1000, help="bootstrap resamples")
+    compare_parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the intervals")
+    compare_parser.add_argument("--output", default=".", help="path to save the comparison table")
+    compare_parser.add_argument("--format", default="xlsx", help="report format of the comparison table: xlsx, csv or parquet")
+    args = parser.parse_args()
+
+    run_registry = RunRegistry(args.registry)
+    if args.command == "list":
+        for run in run_registry.list_runs():
+            print(f"{run['run_id']}  {run['time']}  {run['scenario']:<10}  {run['fingerprint']}  {run['label'] or ''}")
+    else:
+        df_models, _ = compare_runs(
+            run_registry, args.runs, args.threshold, args.resamples, args.confidence, args.output, {"format": args.format}
+        )
+        columns = ["Run", "Model", "Verdict"] + [f"{metric} Change" for metric, _ in COMPARE_METRICS if f"{metric} Change" in df_models.columns]
+        print(df_models[columns].to_string(index=False) if len(df_models) > 0 else "No common model to compare")
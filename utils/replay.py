@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import time
+
+from utils.file_helper import ConfigError
+from utils.runner import (
+    DEFAULT_TIMEOUT, RunContext, checked_result, finish_run, log_config_info, make_client, process_model, prompt_save_folder,
+    run_monitored, validate_model_config
+)
+from utils.steady_state import mark_warmup, steady_state_config_from, warmup_config_from
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_REPLAY_CONFIG = {
+    "trace": "",                 # trace文件路径
+    "speed": 1.0,                # 回放倍速, 2为两倍速(到达间隔减半), 0.5为半速
+    "match_output_len": True,    # 是否以max_tokens和ignore_eos复现原始输出长度
+    "start": 0,                  # 从trace中offset为start秒处开始回放
+    "duration": None,            # 只回放start之后duration秒内的请求
+    "max_requests": None,        # 最多回放的请求数
+    "parallel": False,           # 为true时所有模型同时回放, 否则依次对每个模型回放
+    "save_response": False,      # 是否保存每个请求的回答, 长trace下会产生大量文件
+    "lag_warning": 1.0           # 发送时间落后于计划超过该值(秒)时告警
+}
+
+
+class ScheduleStats:
+    """回放过程中发送时间相对计划时间的偏差, 只保存累计量以支持长trace"""
+
+    def __init__(self, lag_warning):
+        self.lag_warning = lag_warning
+        self.count = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.late_count = 0
+        self.planned_span = 0.0
+        self.actual_span = 0.0
+
+    def add(self, lag):
+        self.count += 1
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag > self.lag_warning:
+            self.late_count += 1
+            if self.late_count == 1:
+                logger.warning(f"Replay is {lag:.3f}s behind schedule, the client may be overloaded")
+
+    @property
+    def mean_lag(self):
+        return self.total_lag / self.count if self.count > 0 else -1
+
+
+async def replay(client, models, source, speed, context, save_path, stats):
+    """按照trace中记录的到达时间向models发送请求, 每个请求同时发送给所有models(及其适用的workload_matrix变体)
+
+    trace逐条读取, 已完成的请求不再持有task, 因此内存占用只与在途请求数和结果数量有关
+
+    Args:
+        client (AsyncClient): 用于异步发送请求的client
+        models (list): 回放的模型
+        source (TraceSource): trace来源
+        speed (float): 回放倍速
+        context (RunContext): 本次运行的共享设置
+        save_path (str): 保存路径, 仅在保存回答时使用
+        stats (ScheduleStats): 发送时间偏差统计
+
+    Returns:
+        list: 每个请求的RequestResult
+    """
+    results = []
+    pending = set()
+
+    async def send(model_idx, model, prompt_item, save_folder, variant):
+        try:
+            output = await process_model(client, model_idx, model, prompt_item, save_folder, context, variant)
+        except Exception as e:
+            output = e
+        results.append(checked_result(output, prompt_item, model, variant))
+
+    start = time.time()
+    last_offset = 0
+    for prompt_item in source:
+        offset = prompt_item.info["offset"] / speed
+        last_offset = offset
+        delay = start + offset - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats.add(time.time() - start - offset)
+
+        save_folder = prompt_save_folder(save_path, prompt_item, context)
+        for model_idx, model in enumerate(models):
+            for variant in context.variants_for(model, prompt_item):
+                task = asyncio.create_task(send(model_idx, model, prompt_item, save_folder, variant))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+    stats.planned_span = last_offset
+    stats.actual_span = time.time() - start
+
+    if pending:
+        await asyncio.gather(*list(pending))
+    return results
+
+
+async def replay_main(models, source, replay_config, context, save_path, timeout):
+    """parallel为true时所有模型同时回放, 否则依次回放, 使每个模型都独立承受与生产一致的负载
+
+    Returns:
+        tuple: (每个请求的RequestResult, {模型名称或"all": ScheduleStats})
+    """
+    results = []
+    schedule = {}
+    async with make_client(timeout) as client:
+        groups = [models] if replay_config["parallel"] is True else [[model] for model in models]
+        for group in groups:
+            key = "all" if len(group) > 1 else group[0]['name']
+            logger.info(f"Replaying {source.describe()} at {replay_config['speed']}x against {[model['name'] for model in group]}")
+            stats = ScheduleStats(replay_config["lag_warning"])
+            results.extend(await replay(client, group, source, replay_config["speed"], context, save_path, stats))
+            schedule[key] = stats
+    return results, schedule
+
+
+def run_replay(config, source):
+    """回放模式: 按照trace中记录的到达时间(可按speed缩放)向config中的模型发送请求
+
+    Args:
+        config (dict): config文件内容, 回放配置位于replay字段
+        source (TraceSource): trace来源
+
+    Returns:
+        list: results, 每个请求的RequestResult
+    """
+    save_path = config.get("save_path", "")
+    validate_model_config(config.get("model_config", {}))
+    replay_config = dict(DEFAULT_REPLAY_CONFIG)
+    replay_config.update(config.get("replay", {}))
+    if replay_config["speed"] <= 0:
+        logger.error(f"replay.speed must be positive, got {replay_config['speed']}")
+        raise ConfigError
+    context = RunContext.from_config(config, source)
+    context.save_response = replay_config["save_response"] and context.response_store is None
+    warmup_config = warmup_config_from(config)
+    steady_config = steady_state_config_from(config)
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+    log_config_info(config, source, replay=replay_config)
+
+    results, schedule = run_monitored(
+        replay_main(models, source, replay_config, context, save_path, config.get("timeout", DEFAULT_TIMEOUT)),
+        models,
+        save_path,
+        context
+    )
+
+    if warmup_config is not None:
+        # 回放需要保持trace中的时间线, 无法插入单独的预热阶段, 只能裁剪开头的请求
+        mark_warmup(results, warmup_config)
+
+    def write_replay_summary(measured, path, report_config):
+        from utils.summary import replay_summary_table
+        replay_summary_table(measured, schedule, replay_config["speed"], path, report_config)
+
+    finish_run(config, source, context, results, steady_config, {"replay_summary": write_replay_summary})
+    return results
@@ -0,0 +1,194 @@
+import logging
+import math
+import numbers
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.file_helper import ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+REPORT_FORMATS = ["xlsx", "workbook", "csv", "parquet"]
+
+# Excel单元格最多32767个字符, xlsx格式下默认在此之前截断
+EXCEL_RESPONSE_LIMIT = 32000
+
+DEFAULT_REPORT_CONFIG = {
+    "format": "xlsx",                 # xlsx: 每个表格一个文件; workbook: 所有表格写入一个多sheet文件; csv; parquet
+    "parallel": True,                 # 是否并行写入多个表格
+    "response_limit": "auto",         # 回答的最大字符数, auto时xlsx/workbook为32000, csv/parquet不截断, null为不截断
+    "externalize_responses": True     # 截断的回答是否完整保存到单独的jsonl文件
+}
+
+
+# XML 1.0中不允许出现的控制字符, openpyxl遇到时会抛出IllegalCharacterError
+ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+# Excel单元格的最大字符数
+EXCEL_CELL_LIMIT = 32767
+
+
+def xlsx_value(value):
+    """转换为可以写入单元格的值, NaN和inf写为空单元格, 过长的字符串截断"""
+    if type(value).__module__ == "numpy":
+        # numpy.bool_等标量不属于bool或numbers.Number, 先转换为python类型
+        value = value.item()
+    if value is None or isinstance(value, (bool, str)):
+        pass
+    elif isinstance(value, numbers.Number):
+        if value != value or value in (math.inf, -math.inf):
+            return None
+        return value
+    else:
+        value = str(value)
+    if isinstance(value, str):
+        value = ILLEGAL_XML_CHARS.sub("", value[:EXCEL_CELL_LIMIT])
+    return value
+
+
+def write_xlsx(sheets, output_file_path):
+    """使用openpyxl的write_only模式逐行写入xlsx, 已写出的行不在内存中保留单元格对象
+
+    Args:
+        sheets (dict): {sheet名称: DataFrame}
+        output_file_path (str): 输出路径
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name[:31])
+        worksheet.append([str(column) for column in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append([xlsx_value(value) for value in row])
+    workbook.save(output_file_path)
+    return output_file_path
+
+
+def write_csv(df, output_file_path):
+    df.to_csv(output_file_path, index=False, encoding='utf-8')
+    return output_file_path
+
+
+def write_parquet(df, output_file_path):
+    try:
+        df.to_parquet(output_file_path, index=False)
+    except ImportError as e:
+        logger.error("Parquet export requires pyarrow, please run `pip install pyarrow`")
+        raise e
+    return output_file_path
+
+
+def report_config_from(report_config):
+    """report配置与默认值合并并校验, 不合法时抛出ConfigError"""
+    config = dict(DEFAULT_REPORT_CONFIG)
+    config.update(report_config or {})
+    if config["format"] not in REPORT_FORMATS:
+        logger.error(f"Invalid report format: {config['format']}, expected one of {REPORT_FORMATS}")
+        raise ConfigError
+    return config
+
+
+def table_jobs(sheets, table_name, save_path, report_format, timestamp):
+    """一个表格的写入任务列表, 元素为(writer, 数据, 输出路径)
+
+    xlsx和workbook格式下一个表格写为一个文件, 多个sheet时写入同一文件; csv和parquet格式下每个sheet单独一个文件
+    """
+    if report_format in ["xlsx", "workbook"]:
+        return [(write_xlsx, sheets, os.path.join(save_path, f"{table_name}_{timestamp}.xlsx"))]
+    writer = write_csv if report_format == "csv" else write_parquet
+    jobs = []
+    for sheet_name, df in sheets.items():
+        name = table_name if len(sheets) == 1 else f"{table_name}_{sheet_name}"
+        jobs.append((writer, df, os.path.join(save_path, f"{name}_{timestamp}.{report_format}")))
+    return jobs
+
+
+def write_table(sheets, table_name, save_path, report_config=None):
+    """按照report配置写出一个summary表格, 文件名为<table_name>_<时间戳>
+
+    Args:
+        sheets (DataFrame or dict): 表格内容, 为字典时为{sheet名称: DataFrame}
+        table_name (str): 表格名称
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 格式见DEFAULT_REPORT_CONFIG
+
+    Returns:
+        list: 写出的文件路径
+    """
+    config = report_config_from(report_config)
+    if not isinstance(sheets, dict):
+        sheets = {table_name.replace("_table", ""): sheets}
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return [writer(data, path) for writer, data, path in table_jobs(sheets, table_name, save_path, config["format"], timestamp)]
+
+
+def export_reports(results, summary_info, save_path, report_config=None, response_store=None):
+    """从一份共享的数据构造model/error/file/response summary, 并按照report配置写出
+
+    Args:
+        results (list): 每个请求的RequestResult
+        summary_info (dict): config中的summary字段, 决定输出哪些表格
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 格式见DEFAULT_REPORT_CONFIG
+        response_store (ResponseStore): metrics_only模式下回答的存储, 为None时回答位于RequestResult.response中
+
+    Returns:
+        list: 写出的文件路径
+    """
+    from utils.summary import results_frame, model_summary_frame, error_summary_frame, file_summary_frame, response_summary_frame
+
+    config = report_config_from(report_config)
+    report_format = config["format"]
+    response_limit = config["response_limit"]
+    if response_limit == "auto":
+        response_limit = EXCEL_RESPONSE_LIMIT if report_format in ["xlsx", "workbook"] else None
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = results_frame(results)
+    # 预热请求只出现在file/response summary中
+    metric_base = base[~base["warmup"]] if len(base) > 0 else base
+    tables = {}
+    if summary_info.get("model_summary", False) is True:
+        tables["model_summary_table"] = model_summary_frame(metric_base)
+    if summary_info.get("file_summary", False) is True:
+        tables["file_summary_table"] = file_summary_frame(base)
+    if summary_info.get("response_summary", False) is True:
+        if response_store is not None and response_store.mode == "drop":
+            logger.warning("Responses are dropped in metrics_only mode, response_summary is skipped")
+        elif response_store is not None:
+            # 回答只在此时从压缩文件中读取, 读取时即截断, 截断处注明完整回答在压缩文件中的行号, 无需再另外保存
+            responses = response_store.read(base["response_ref"], response_limit)
+            tables["response_summary_table"] = response_summary_frame(base.assign(response=responses))
+        else:
+            externalized_path = None
+            if config["externalize_responses"] is True and response_limit is not None:
+                externalized_path = os.path.join(save_path, f"responses_{timestamp}.jsonl")
+            tables["response_summary_table"] = response_summary_frame(base, response_limit, externalized_path)
+    if summary_info.get("error_summary", False) is True:
+        tables["error_summary_table"] = error_summary_frame(metric_base)
+    if len(tables) == 0:
+        return []
+
+    if report_format == "workbook":
+        # 单个文件无法并行写入
+        output_file_path = os.path.join(save_path, f"summary_{timestamp}.xlsx")
+        return [write_xlsx({name.replace("_table", ""): df for name, df in tables.items()}, output_file_path)]
+
+    jobs = []
+    for name, df in tables.items():
+        jobs.extend(table_jobs({name.replace("_table", ""): df}, name, save_path, report_format, timestamp))
+
+    max_workers = min(len(jobs), os.cpu_count() or 1)
+    if config["parallel"] is not True or max_workers == 1:
+        return [writer(data, path) for writer, data, path in jobs]
+    # 使用线程而非进程, 避免将包含回答的DataFrame序列化后复制到子进程; parquet在pyarrow中写入时释放GIL
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(writer, data, path) for writer, data, path in jobs]
+        return [future.result() for future in futures]
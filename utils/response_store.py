@@ -0,0 +1,118 @@
+import gzip
+import json
+import logging
+import os
+from datetime import datetime
+
+from utils.file_helper import ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+RESPONSE_STORE_MODES = ["spill", "drop"]
+
+DEFAULT_METRICS_ONLY_CONFIG = {
+    "enabled": True,
+    "responses": "spill",     # spill: 回答写入压缩文件; drop: 不保存回答
+    "compresslevel": 1        # gzip压缩级别, 1~9, 级别越高文件越小, 但占用事件循环的CPU时间越多
+}
+
+
+class ResponseStore:
+    """metrics_only模式下回答的存储, 内存中的RequestResult只保留数值指标
+
+    spill模式下每个请求完成时即将结果(与save_response保存的json一致, 但不包含prompt)追加写入gzip压缩的jsonl文件,
+    RequestResult中只记录其行号, 生成response summary时再按需读取; drop模式下直接丢弃回答
+
+    Attributes:
+        path (str): 压缩文件路径, drop模式下为None
+        mode (str): spill或drop
+        compresslevel (int): gzip压缩级别
+    """
+
+    def __init__(self, path, mode="spill", compresslevel=1):
+        if mode not in RESPONSE_STORE_MODES:
+            logger.error(f"Invalid metrics_only.responses: {mode}, expected one of {RESPONSE_STORE_MODES}")
+            raise ConfigError
+        self.path = path if mode == "spill" else None
+        self.mode = mode
+        self.compresslevel = compresslevel
+        self.count = 0
+        self.file = None
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的metrics_only字段构造, 未配置或enabled为false时返回None"""
+        metrics_only_config = config.get("metrics_only", None)
+        if metrics_only_config is None:
+            return None
+        merged = dict(DEFAULT_METRICS_ONLY_CONFIG)
+        merged.update(metrics_only_config)
+        if merged["enabled"] is False:
+            return None
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(config.get("save_path", ""), f"responses_{timestamp}.jsonl.gz")
+        return cls(path, merged["responses"], merged["compresslevel"])
+
+    def put(self, record, message):
+        """写入一个请求的结果
+
+        Args:
+            record (RequestResult): 请求结果, 其中的response尚未清除
+            message (dict): 服务端返回的message
+
+        Returns:
+            int: 在文件中的行号(从0开始), drop模式下为-1
+        """
+        if self.mode == "drop":
+            return -1
+        if self.file is None:
+            # 只在第一次写入时创建文件, 未发送请求的场景不会留下空文件
+            self.file = gzip.open(self.path, 'wt', compresslevel=self.compresslevel, encoding='utf-8')
+        saved = record.to_dict()
+        saved['model_url'] = record.endpoint
+        saved['response'] = message
+        self.file.write(json.dumps(saved, ensure_ascii=False) + "\n")
+        line_idx = self.count
+        self.count += 1
+        return line_idx
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.mode == "spill" and self.count > 0:
+            logger.info(f"{self.count} responses saved to {self.path}")
+
+    def read(self, refs, limit=None):
+        """按行号读取回答内容, 只解析refs中的行, 读取后即截断, 内存中最多保留len(refs)个截断后的回答
+
+        Args:
+            refs (iterable): 行号, -1表示没有保存的回答
+            limit (int): 回答的最大字符数, 为None时不截断, 截断处注明完整回答所在的行
+
+        Returns:
+            list: 与refs一一对应的回答内容, 没有保存的回答为None
+        """
+        refs = list(refs)
+        if self.mode == "drop" or self.count == 0:
+            return [None] * len(refs)
+        if self.file is not None:
+            # 未写完gzip尾部的文件无法完整读取
+            self.close()
+        needed = set(ref for ref in refs if ref >= 0)
+        contents = {}
+        with gzip.open(self.path, 'rt', encoding='utf-8') as file:
+            for line_idx, line in enumerate(file):
+                if line_idx not in needed:
+                    continue
+                content = (json.loads(line).get('response') or {}).get('content')
+                if content is not None and limit is not None and len(content) > limit:
+                    content = f"{content[:limit]} ...[truncated, full response in {os.path.basename(self.path)} line {line_idx + 1}]"
+                contents[line_idx] = content
+                if len(contents) == len(needed):
+                    break
+        return [contents.get(ref, None) for ref in refs]
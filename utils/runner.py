@@ -0,0 +1,761 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+import httpx
+
+from utils.adaptive_sampling import AdaptiveSampler
+from utils.balancer import EndpointBalancer, model_urls
+from utils.codec import JSONCodec, RequestEncoder, load_codec
+from utils.file_helper import validate_model_config_params, ModelConfigError
+from utils.errors import (
+    CANCELLED, ClientCancelled, MalformedUsageError, RetryPolicy, build_timeout, classify_error, error_status_code, parse_usage
+)
+from utils.live_metrics import LiveMetrics, live_metrics_main
+from utils.profiling import ClientProfiler, profile_phase, timed_call
+from utils.record import RequestResult
+from utils.registry import RunRegistry
+from utils.response_store import ResponseStore
+from utils.steady_state import metric_results, steady_state_config_from, warmup_config_from
+from utils.tokenizer import TokenCounter
+from utils.workload import load_workload_matrix
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_TIMEOUT = 3600
+
+
+# RUNNING RELATED
+async def stream_chat_completion(client, url, body, headers, codec, profiler=None, cancel_tokens=None, **kwargs):
+    """以流式方式发送请求, 记录首token时间, 并将分块结果拼接为与非流式一致的格式
+
+    Args:
+        client (AsyncClient): 用于异步发送请求的client
+        url (str): 请求地址
+        body (bytes): 编码后的请求体, 其中stream为true
+        headers (dict): 请求头
+        codec (JSONCodec): 解析分块使用的编解码器
+        profiler (ClientProfiler): 为None时不记录各阶段耗时
+        cancel_tokens (int): 收到该数量的内容分块(约等于token数)后断开连接并抛出ClientCancelled, 为None时读取完整回答
+        kwargs: 传递给client.stream的其他参数, 如timeout
+
+    Returns:
+        tuple: (拼接后的result, 首token到达时间time.time())
+    """
+    first_token_time = -1
+    content = []
+    usage = None
+    decode_time = 0.0
+    decode_count = 0
+    http_start = time.perf_counter()
+    async with client.stream("POST", url, content=body, headers=headers, **kwargs) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            decode_start = time.perf_counter()
+            chunk = codec.decode_chunk(data)
+            decode_time += time.perf_counter() - decode_start
+            decode_count += 1
+            if chunk.get('usage'):
+                usage = chunk['usage']
+            for choice in chunk.get('choices') or []:
+                delta = choice.get('delta', {}).get('content')
+                if delta:
+                    if first_token_time == -1:
+                        first_token_time = time.time()
+                    content.append(delta)
+                    if cancel_tokens is not None and len(content) >= cancel_tokens:
+                        # 退出async with时未读完的连接被关闭, 服务端由此感知客户端断开
+                        raise ClientCancelled(f"cancelled after {len(content)} tokens")
+    if profiler is not None:
+        profiler.add("json_decode", decode_time, decode_count)
+        profiler.add("http", time.perf_counter() - http_start - decode_time)
+    result = {
+        "choices": [{"message": {"role": "assistant", "content": "".join(content)}}],
+        "usage": usage
+    }
+    return result, first_token_time
+
+
+class RunContext:
+    """一次运行中所有请求共享的设置
+
+    Attributes:
+        save_response (bool): 是否保存具体回答
+        model_config (dict): 模型请求时额外参数
+        stream (bool): 是否以流式发送请求, 流式时会记录首token时间
+        retry_policy (RetryPolicy): 重试策略, 为None时不重试
+        token_counter (TokenCounter): 本地token计数, 为None时完全使用服务端返回的usage
+        metrics (LiveMetrics): 实时指标, 为None时不统计
+        balancers (dict): {模型名称: EndpointBalancer}, 只包含配置了多个副本的模型
+        variants (list): workload_matrix中的WorkloadVariant, 为None时每个prompt对每个模型只发送一次
+        profiler (ClientProfiler): 客户端性能剖析, 为None时不记录
+        codec (JSONCodec): 请求体编码与返回结果解析使用的编解码器, 为None时使用标准库json
+        response_store (ResponseStore): metrics_only模式下回答的存储, 不为None时回答不保留在内存中, 也不再逐个保存json文件
+    """
+
+    def __init__(
+        self, save_response=True, model_config=None, stream=False, retry_policy=None, token_counter=None, metrics=None, balancers=None,
+        variants=None, profiler=None, codec=None, response_store=None
+    ):
+        self.save_response = save_response
+        self.model_config = model_config
+        self.stream = stream
+        self.retry_policy = retry_policy
+        self.token_counter = token_counter
+        self.metrics = metrics
+        self.balancers = balancers or {}
+        self.variants = variants
+        self.profiler = profiler
+        self.codec = codec or JSONCodec()
+        self.encoder = RequestEncoder(self.codec)
+        self.response_store = response_store
+
+    @classmethod
+    def from_config(cls, config, source=None):
+        model_config = config.get("model_config", {})
+        response_store = ResponseStore.from_config(config)
+        return cls(
+            save_response=config.get("save_response", True) and response_store is None,
+            model_config=model_config,
+            stream=(source is not None and source.stream) or model_config.get("stream", False) is True,
+            retry_policy=RetryPolicy.from_config(config.get("retry", None)),
+            token_counter=TokenCounter.from_config(config),
+            metrics=LiveMetrics.from_config(config),
+            balancers={
+                model['name']: balancer for model in config.get("models", [])
+                if (balancer := EndpointBalancer.from_model(model)) is not None
+            },
+            variants=load_workload_matrix(config),
+            profiler=ClientProfiler.from_config(config),
+            codec=load_codec(config.get("json_codec", "json")),
+            response_store=response_store
+        )
+
+    def variants_for(self, model, prompt_item):
+        """prompt_item对model需要发送的变体, 未配置workload_matrix时为[None]"""
+        if self.variants is None:
+            return [None]
+        return [variant for variant in self.variants if variant.applies_to(model['name'], prompt_item.name)]
+
+
+def make_client(timeout=DEFAULT_TIMEOUT):
+    """创建所有请求共享的client, 不限制连接数以免客户端成为瓶颈"""
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    return httpx.AsyncClient(timeout=build_timeout(timeout, DEFAULT_TIMEOUT), limits=limits)
+
+
+async def send_request(client, model, body, stream, timeout=None, url=None, profiler=None, codec=None, cancel_tokens=None):
+    """发送一次请求, url为None时使用model的url, 多副本时由process_model指定副本地址
+
+    Args:
+        body (bytes): 由RequestEncoder编码的请求体
+        codec (JSONCodec): 解析返回结果使用的编解码器, 为None时使用标准库json
+        cancel_tokens (int): 流式请求收到该数量的token后主动断开, 为None时不断开
+
+    Returns:
+        tuple: (result, 首token到达时间time.time(), 非流式或未收到内容时为-1)
+    """
+    api_key = model['api_key'] if 'api_key' in model else 'token-123'
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    url = f"{model['url'] if url is None else url}/v1/chat/completions"
+    extra = {} if timeout is None else {"timeout": timeout}
+    codec = codec or JSONCodec()
+    if stream is True:
+        return await stream_chat_completion(client, url, body, headers, codec, profiler, cancel_tokens, **extra)
+    with profile_phase(profiler, "http"):
+        response = await client.post(url, content=body, headers=headers, **extra)
+        response.raise_for_status()
+    with profile_phase(profiler, "json_decode"):
+        return codec.decode_response(response.content), -1
+
+
+async def cancel_after(coro, seconds):
+    """coro在seconds秒内未完成时将其取消(连接随之关闭), 并抛出ClientCancelled"""
+    try:
+        return await asyncio.wait_for(coro, seconds)
+    except asyncio.TimeoutError:
+        raise ClientCancelled(f"cancelled after {seconds}s") from None
+
+
+async def process_model(client, model_idx, model, prompt_item, save_folder, context, variant=None, cancel_point=None, warmup=False):
+    """对模型发送具体请求, 按照retry_policy对失败的请求进行重试
+
+    模型配置了多个副本时, 每次发送前由balancer选择副本;
+    服务端未返回usage时, 若配置了本地token计数则使用本地计数, 否则记为malformed_usage错误;
+    二者都存在时记录本地计数, 用于校验服务端的usage
+
+    Args:
+        client (AsyncClient): 用于异步发送请求的client
+        model_idx (int): model序号
+        model (dict): config文件中某个model的config信息, 其中的timeout会覆盖全局的timeout
+        prompt_item (PromptItem): 询问的prompt
+        save_folder (str): 模型保存路径
+        context (RunContext): 本次运行的共享设置
+        variant (WorkloadVariant): workload_matrix中的变体, 其model_config最后应用, 为None时不使用变体
+        cancel_point (CancelPoint): 主动断开的时机, 见utils.cancellation, 为None时等待请求完成; 断开的请求记为cancelled错误
+        warmup (bool): 是否为预热阶段的请求, 预热请求照常保存但不计入指标
+
+    Returns:
+        RequestResult: 用于评估的模型生成信息, 请求失败时error不为None, 时间包含重试的耗时
+    """
+    record = RequestResult(prompt_item.name, model['name'], time.time(), warmup=warmup)
+    # messages由encoder单独序列化并缓存, 此处只组装每个模型不同的字段
+    config = {"model": model['name']}
+    if context.model_config is not None:
+        config.update(context.model_config)
+    if prompt_item.params:
+        config.update(prompt_item.params)
+    stream = context.stream
+    if variant is not None:
+        config.update(variant.model_config)
+        record.variant = variant.name
+        # 变体中给出stream时以变体为准, 可以在全局流式时关闭流式
+        stream = variant.model_config.get("stream", stream) is True
+    if stream is True:
+        config['stream'] = True
+        config['stream_options'] = {"include_usage": True}
+    with profile_phase(context.profiler, "json_encode"):
+        body = context.encoder.encode(prompt_item, config)
+    timeout = build_timeout(model['timeout'], DEFAULT_TIMEOUT) if 'timeout' in model else None
+    retry_policy = context.retry_policy
+    token_counter = context.token_counter
+    balancer = context.balancers.get(model['name'], None)
+    if context.metrics is not None:
+        context.metrics.request_started(model['name'])
+    attempt = 0
+    # 请求开始与结束成对记录, 重试等待或本地token计数中抛出的异常(包括CancelledError)也不会使在途请求数泄漏
+    try:
+        while True:
+            attempt += 1
+            attempt_start = time.time()
+            endpoint = model_urls(model)[0] if balancer is None else balancer.acquire()
+            record.endpoint = endpoint
+            try:
+                try:
+                    request = send_request(
+                        client, model, body, stream, timeout, endpoint, context.profiler, context.codec,
+                        None if cancel_point is None else cancel_point.tokens
+                    )
+                    if cancel_point is not None and cancel_point.seconds is not None:
+                        request = cancel_after(request, cancel_point.seconds)
+                    result, first_token_time = await request
+                finally:
+                    if balancer is not None:
+                        balancer.release(endpoint)
+                message = result['choices'][0]['message']
+                try:
+                    prompt_tokens, decode_tokens = parse_usage(result)
+                    usage_source = "server"
+                except MalformedUsageError:
+                    if token_counter is None:
+                        raise
+                    prompt_tokens, decode_tokens, usage_source = -1, -1, "local"
+                break
+            except Exception as e:
+                if retry_policy is not None and retry_policy.should_retry(e, attempt):
+                    delay = retry_policy.delay(attempt)
+                    logger.warning(
+                        f"Retry {attempt}/{retry_policy.max_retries} for model {model['name']} file {prompt_item.name} in {delay}s: {type(e).__name__}: {e}"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                record.end_time = time.time()
+                record.attempts = attempt
+                record.error = f"{type(e).__name__}: {e}"
+                record.error_type = classify_error(e)
+                record.status_code = error_status_code(e)
+                if record.error_type != CANCELLED:
+                    logger.error(f"Error ({record.error_type}) processing model {model['name']} for file {prompt_item.name}: {e}")
+                return record
+
+        record.end_time = time.time()
+        record.attempts = attempt
+        if first_token_time != -1:
+            # 首token时间从最后一次发送开始计算
+            record.ttft = first_token_time - attempt_start
+        record.response = message.get('content')
+        record.usage_source = usage_source
+        if token_counter is not None:
+            # tokenize为CPU密集操作, 放到线程中执行以免阻塞事件循环; 耗时在线程中测量, 在事件循环线程中累加
+            (record.local_prompt_tokens, record.local_decode_tokens), elapsed = await asyncio.to_thread(
+                timed_call, token_counter.count, model, prompt_item.messages, record.response or ""
+            )
+            if context.profiler is not None:
+                context.profiler.add("local_token_count", elapsed)
+        if usage_source == "local":
+            prompt_tokens, decode_tokens = record.local_prompt_tokens, record.local_decode_tokens
+        record.prompt_tokens = prompt_tokens
+        record.decode_tokens = decode_tokens
+    except BaseException as e:
+        if record.error is None:
+            record.end_time = time.time()
+            record.attempts = attempt
+            record.error = f"{type(e).__name__}: {e}"
+            record.error_type = classify_error(e)
+        raise
+    finally:
+        if context.metrics is not None:
+            context.metrics.request_finished(record)
+
+    # save res to file
+    if context.response_store is not None:
+        with profile_phase(context.profiler, "persistence"):
+            record.response_ref = context.response_store.put(record, message)
+        record.response = None
+    elif context.save_response is True:
+        saved = record.to_dict()
+        saved['model_url'] = record.endpoint
+        saved['prompt'] = prompt_item.messages
+        saved['response'] = message
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{model_idx}"
+        normalized_path = model['name'].rstrip("/")
+        variant_suffix = "" if variant is None else f"_{variant.name}"
+        if warmup is True:
+            variant_suffix += "_warmup"
+        model_file_name = f"{os.path.basename(normalized_path)}{variant_suffix}_{timestamp}.json"
+        model_file_path = os.path.join(save_folder, model_file_name)
+        with profile_phase(context.profiler, "persistence"), open(model_file_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=4, ensure_ascii=False)
+    return record
+
+
+async def limited(semaphore, coro):
+    """在semaphore限制下执行coro, semaphore为None时不做限制"""
+    if semaphore is None:
+        return await coro
+    async with semaphore:
+        return await coro
+
+
+async def process_prompt(client, semaphores, prompt_item, models, save_path, results, context):
+    """将单一prompt分配给多个模型并行处理, 配置了workload_matrix时每个模型的所有适用变体同时发送
+
+    Args:
+        client (AsyncClient): 所有请求共享的client
+        semaphores (list): 每个模型的并发限制, 元素为None时不做限制
+        prompt_item (PromptItem): 询问的prompt
+        models (list): config文件中的model信息
+        save_path (str): 保存路径
+        results (list): 用于生成summary的RequestResult列表, 每个请求的结果会追加到其中
+        context (RunContext): 本次运行的共享设置
+    """
+    save_folder = prompt_save_folder(save_path, prompt_item, context)
+
+    jobs = [
+        (model_idx, model, variant)
+        for model_idx, model in enumerate(models)
+        for variant in context.variants_for(model, prompt_item)
+    ]
+    tasks = [
+        limited(
+            semaphores[model_idx],
+            process_model(client, model_idx, model, prompt_item, save_folder, context, variant)
+        )
+        for model_idx, model, variant in jobs
+    ]
+    outputs = await asyncio.gather(*tasks, return_exceptions=True)
+
+    for (_, model, variant), output in zip(jobs, outputs):
+        results.append(checked_result(output, prompt_item, model, variant))
+
+
+def prompt_save_folder(save_path, prompt_item, context):
+    """保存回答时每个prompt单独一个文件夹, 不保存回答时返回空字符串"""
+    if context.save_response is not True:
+        return ""
+    save_folder = os.path.join(save_path, os.path.splitext(prompt_item.name)[0])
+    os.makedirs(save_folder, exist_ok=True)
+    return save_folder
+
+
+def checked_result(output, prompt_item, model, variant):
+    """gather(return_exceptions=True)的输出为异常时转换为失败的RequestResult"""
+    if not isinstance(output, BaseException):
+        return output
+    # process_model内部已处理请求错误, 此处为保存结果等其他环节的异常
+    logger.error(f"Model: {model['name']}, Model_URL: {', '.join(model_urls(model))} Unexpected error: {output}")
+    return RequestResult(
+        prompt_item.name, model['name'], time.time(), time.time(),
+        error=f"{type(output).__name__}: {output}", error_type=classify_error(output),
+        variant=None if variant is None else variant.name
+    )
+
+
+async def warmup_phase(client, semaphores, source, models, save_path, results, context, warmup_config):
+    """正式测试前的预热阶段, 所有模型的预热请求完成后才返回
+
+    每个模型循环使用source中的前几个prompt, 每轮同时发送warmup_config["requests"]个请求(至少1个),
+    直到发送了requests个请求且距预热开始已超过duration秒; 预热请求标记为warmup, 照常保存但不计入指标
+    """
+    if warmup_config is None or (warmup_config["requests"] <= 0 and warmup_config["duration"] <= 0):
+        return
+    round_size = max(1, warmup_config["requests"])
+    # 只取出每轮需要的prompt, 不为预热将整个source载入内存
+    prompts = list(itertools.islice(source, round_size))
+    if len(prompts) == 0:
+        return
+
+    async def warmup_model(model_idx, model):
+        prompt_cycle = itertools.cycle(prompts)
+        start = time.time()
+        sent = 0
+        while sent < warmup_config["requests"] or time.time() - start < warmup_config["duration"]:
+            batch = [next(prompt_cycle) for _ in range(round_size)]
+            tasks = [
+                limited(
+                    semaphores[model_idx],
+                    process_model(
+                        client, model_idx, model, prompt_item, prompt_save_folder(save_path, prompt_item, context), context,
+                        warmup=True
+                    )
+                )
+                for prompt_item in batch
+            ]
+            outputs = await asyncio.gather(*tasks, return_exceptions=True)
+            for prompt_item, output in zip(batch, outputs):
+                record = checked_result(output, prompt_item, model, None)
+                record.warmup = True
+                results.append(record)
+            sent += len(batch)
+        logger.info(f"Model {model['name']}: {sent} warm-up requests finished in {time.time() - start:.1f}s")
+
+    await asyncio.gather(*[warmup_model(model_idx, model) for model_idx, model in enumerate(models)])
+
+
+async def main(source, models, save_path, results, context, timeout=DEFAULT_TIMEOUT, max_concurrency=0, warmup_config=None):
+    """发送source中所有prompt
+
+    所有请求共享一个client以复用连接; max_concurrency大于0时限制每个模型同时在途的请求数;
+    source.sequential为True时依次发送每个prompt; 配置了warmup_config时先完成预热阶段再发送正式请求
+
+    Args:
+        source (PromptSource): prompt来源
+        models (list): config文件中的model信息
+        save_path (str): 保存路径
+        results (list): 用于生成summary的RequestResult列表
+        context (RunContext): 本次运行的共享设置
+        timeout (float or dict): 单个请求的超时时间, 单位为秒, 为字典时可分别设置connect, read, write, pool
+        max_concurrency (int): 每个模型同时在途的最大请求数, 0为不限制
+        warmup_config (dict): 预热配置, 格式见utils.steady_state.DEFAULT_WARMUP_CONFIG, 为None时不预热
+    """
+    semaphores = [asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None for _ in models]
+    async with make_client(timeout) as client:
+        await warmup_phase(client, semaphores, source, models, save_path, results, context, warmup_config)
+        if source.sequential is True:
+            for prompt_item in source:
+                await process_prompt(client, semaphores, prompt_item, models, save_path, results, context)
+        else:
+            tasks = [
+                process_prompt(client, semaphores, prompt_item, models, save_path, results, context)
+                for prompt_item in source
+            ]
+            await asyncio.gather(*tasks)
+
+
+async def adaptive_cell(client, semaphore, model_idx, model, variant, prompts, save_path, results, context, sampler):
+    """对一个单元(模型与变体的组合)循环发送prompt, 每轮同时发送sampler.batch个请求, 直到目标指标收敛或达到max_samples
+
+    收敛判断与停止条件只使用参与统计的请求, 预热请求不计入
+
+    Returns:
+        dict: {"model", "variant", "requests", "failed", "rounds", "stop_reason", "precision"}
+    """
+    label = model['name'] if variant is None else f"{model['name']} ({variant.name})"
+    prompt_cycle = itertools.cycle(prompts)
+    records = []
+    rounds = 0
+    while True:
+        rounds += 1
+        batch = [next(prompt_cycle) for _ in range(min(sampler.batch, sampler.max_samples - len(records)))]
+        tasks = [
+            limited(
+                semaphore,
+                process_model(
+                    client, model_idx, model, prompt_item, prompt_save_folder(save_path, prompt_item, context), context, variant
+                )
+            )
+            for prompt_item in batch
+        ]
+        outputs = await asyncio.gather(*tasks, return_exceptions=True)
+        batch_results = [checked_result(output, prompt_item, model, variant) for prompt_item, output in zip(batch, outputs)]
+        records.extend(metric_results(batch_results))
+        results.extend(batch_results)
+        precision = sampler.precision(records)
+        if sampler.converged(precision):
+            stop_reason = "converged"
+        elif len(records) >= sampler.max_samples:
+            stop_reason = "max_samples"
+        elif len(records) >= sampler.min_samples and not any(record.ok for record in records):
+            stop_reason = "all_failed"
+        else:
+            logger.info(f"{label}: {len(records)} requests, {sampler.describe(precision)}")
+            continue
+        break
+    logger.info(f"{label}: stopped ({stop_reason}) after {len(records)} requests, {sampler.describe(precision)}")
+    return {
+        "model": model['name'],
+        "variant": None if variant is None else variant.name,
+        "requests": len(records),
+        "failed": sum(1 for record in records if not record.ok),
+        "rounds": rounds,
+        "stop_reason": stop_reason,
+        "precision": precision
+    }
+
+
+async def adaptive_main(
+    source, models, save_path, results, context, sampler, timeout=DEFAULT_TIMEOUT, max_concurrency=0, warmup_config=None
+):
+    """自适应采样: 所有单元同时发送, 每个单元独立判断是否收敛, 已收敛的单元停止后不再占用服务端资源
+
+    source中的prompt被循环使用, 此时不区分source.sequential; 预热阶段以及其余参数与main相同
+
+    Returns:
+        list: 每个单元的adaptive_cell结果
+    """
+    semaphores = [asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None for _ in models]
+    prompts = list(source)
+    tasks = []
+    async with make_client(timeout) as client:
+        await warmup_phase(client, semaphores, source, models, save_path, results, context, warmup_config)
+        for model_idx, model in enumerate(models):
+            for variant in context.variants if context.variants is not None else [None]:
+                cell_prompts = [
+                    prompt_item for prompt_item in prompts if variant is None or variant.applies_to(model['name'], prompt_item.name)
+                ]
+                if len(cell_prompts) == 0:
+                    continue
+                tasks.append(
+                    adaptive_cell(
+                        client, semaphores[model_idx], model_idx, model, variant, cell_prompts, save_path, results, context, sampler
+                    )
+                )
+        return list(await asyncio.gather(*tasks))
+
+
+async def with_gpu_monitor(coro, models, save_path, metrics=None, profiler=None, gpu_samples=None):
+    """运行coro, 存在配置了gpu_url的模型时同时监控GPU, 配置了实时指标时同时刷新面板和/metrics接口,
+    配置了profiler时同时采样事件循环延迟, coro结束后停止监控; gpu_samples不为None时GPU采样同时按模型追加到其中
+
+    Returns:
+        coro的返回值
+    """
+    monitors = []
+    stop_event = asyncio.Event()
+    if any('gpu_url' in model.keys() for model in models):
+        # aiohttp只在监控GPU时需要
+        from utils.gpu_monitor import gpu_main
+        monitors.append(gpu_main(models, save_path, stop_event, gpu_samples))
+    if metrics is not None:
+        monitors.append(live_metrics_main(metrics, stop_event))
+    if profiler is not None:
+        monitors.append(profiler.lag_monitor(stop_event))
+    if len(monitors) == 0:
+        return await coro
+    monitor_task = asyncio.gather(*monitors)
+    try:
+        return await coro
+    finally:
+        stop_event.set()
+        await monitor_task
+
+
+def validate_model_config(model_config):
+    """校验model_config, 不合法时抛出ModelConfigError"""
+    flag, info = validate_model_config_params(model_config)
+    if flag is False:
+        logger.error(info)
+        raise ModelConfigError
+
+
+def log_config_info(config, source, **extra):
+    """打印本次运行的配置信息, extra中的键值对会额外打印"""
+    models = config.get("models", [])
+    retry_policy = RetryPolicy.from_config(config.get("retry", None))
+
+    logger.info(f"-------------------config information--------------------------")
+
+    logger.info(f"model_count: {len(models)}")
+    logger.info(f"prompt_source: {source.describe()}")
+    logger.info(f"save_path: {config.get('save_path', '')}")
+    logger.info(f"save_response: {config.get('save_response', True)}")
+    logger.info(f"summary_info: {config.get('summary', {})}" )
+    logger.info(f"model_config: {config.get('model_config', {})}")
+    logger.info(
+        f"timeout: {config.get('timeout', DEFAULT_TIMEOUT)}, max_concurrency: {config.get('max_concurrency', 0)}, max_retries: {retry_policy.max_retries}"
+    )
+    if config.get("token_counting", None):
+        logger.info(f"token_counting: {config['token_counting']}")
+    if config.get("live_metrics", None):
+        logger.info(f"live_metrics: {config['live_metrics']}")
+    if config.get("workload_matrix", None):
+        logger.info(f"workload_matrix: {config['workload_matrix']}")
+    if config.get("warmup", None):
+        logger.info(f"warmup: {config['warmup']}")
+    if config.get("steady_state", None):
+        logger.info(f"steady_state: {config['steady_state']}")
+    if config.get("profiling", None):
+        logger.info(f"profiling: {config['profiling']}")
+    if config.get("json_codec", "json") != "json":
+        logger.info(f"json_codec: {config['json_codec']}")
+    if config.get("metrics_only", None):
+        logger.info(f"metrics_only: {config['metrics_only']}")
+    if config.get("adaptive_sampling", None):
+        logger.info(f"adaptive_sampling: {config['adaptive_sampling']}")
+    for key, value in extra.items():
+        logger.info(f"{key}: {value}")
+    for model in models:
+        if 'gpu_url' in model.keys():
+            logger.info(
+                f"model_name: {model['name']}, model_url: {', '.join(model_urls(model))}, gpu_url: {model['gpu_url']}, gpu_interval: {model.get('gpu_interval', 3)}"
+            )
+        else:
+            logger.info(f"model_name: {model['name']}, model_url: {', '.join(model_urls(model))}")
+        if len(model_urls(model)) > 1:
+            logger.info(f"model_name: {model['name']}, balance: {model.get('balance', 'round_robin')}")
+
+    logger.info(f"-------------------config information end--------------------------")
+
+
+def streaming_context(config, source, scenario, variants_hint="every request uses the global model_config"):
+    """slo_search, interference等探测场景共用的RunContext: 需要首token时间, 始终以流式发送, 不保存具体回答
+
+    这些场景不使用workload_matrix, 也不输出客户端剖析报告
+
+    Args:
+        config (dict): config文件内容
+        source (PromptSource): prompt来源
+        scenario (str): 场景名称, 用于日志
+        variants_hint (str): 配置了workload_matrix时, 告警中给出的替代配置
+
+    Returns:
+        RunContext: 本次运行的共享设置
+    """
+    validate_model_config(config.get("model_config", {}))
+    context = RunContext.from_config(config, source)
+    context.stream = True
+    context.save_response = False
+    context.response_store = None
+    context.profiler = None
+    if context.variants is not None:
+        logger.warning(f"workload_matrix is not used in {scenario}, {variants_hint}")
+    return context
+
+
+def run_monitored(coro, models, save_path, context, gpu_samples=None):
+    """在新的事件循环中运行coro, 同时监控GPU, 实时指标以及事件循环延迟, 结束后关闭回答存储
+
+    配置了profiler时在此开始计时, 由finish_run停止并输出报告
+
+    Returns:
+        coro的返回值
+    """
+    if context.profiler is not None:
+        context.profiler.start()
+    output = asyncio.run(with_gpu_monitor(coro, models, save_path, context.metrics, context.profiler, gpu_samples))
+    if context.response_store is not None:
+        context.response_store.close()
+    return output
+
+
+def finish_run(config, source, context, results, steady_config=None, extra_tables=None):
+    """default与replay场景运行结束后的共同步骤: 输出summary表格, 保存运行记录, 输出客户端剖析报告
+
+    预热请求(RequestResult.warmup为True)只出现在file/response summary中, 不计入其余表格和运行记录
+
+    Args:
+        config (dict): config文件内容
+        source (PromptSource): prompt来源, 用于输出来源特有的summary
+        context (RunContext): 本次运行的共享设置
+        results (list): 每个请求的RequestResult
+        steady_config (dict): 稳态区间配置, 为None时不输出steady_state_summary
+        extra_tables (dict): 场景特有的表格, {summary中的开关名称: writer(measured, save_path, report_config)}, 开关默认为false
+
+    Returns:
+        list: 计入指标的RequestResult
+    """
+    # pandas等生成表格所需的模块较重, 只在实际运行时导入, 使导入runner本身保持轻量
+    from utils.report import export_reports
+    from utils.summary import replica_summary_table, steady_state_summary_table, token_check_summary_table, variant_summary_table
+
+    save_path = config.get("save_path", "")
+    summary_info = config.get("summary", {})
+    report_config = config.get("report", None)
+    measured = metric_results(results)
+
+    with profile_phase(context.profiler, "summary"):
+        export_reports(results, summary_info, save_path, report_config, context.response_store)
+        if context.token_counter is not None and summary_info.get("token_check_summary", False) is True:
+            token_check_summary_table(results, context.token_counter.tolerance, save_path, report_config)
+        if len(context.balancers) > 0 and summary_info.get("replica_summary", False) is True:
+            replica_summary_table(measured, summary_info.get("replica_slow_threshold", 1.5), save_path, report_config)
+        if context.variants is not None and summary_info.get("variant_summary", False) is True:
+            variant_summary_table(measured, context.variants, save_path, report_config)
+        if steady_config is not None and summary_info.get("steady_state_summary", False) is True:
+            steady_state_summary_table(measured, steady_config, save_path, report_config)
+        for summary_name, writer in (extra_tables or {}).items():
+            if summary_info.get(summary_name, False) is True:
+                writer(measured, save_path, report_config)
+        source.extra_summary(measured, save_path, summary_info, report_config)
+
+    registry = RunRegistry.from_config(config)
+    if registry is not None:
+        registry.register(config, measured)
+    if context.profiler is not None:
+        context.profiler.stop()
+        context.profiler.write_report(len(results), save_path, report_config)
+    return measured
+
+
+def run_from_config(config, source):
+    """根据config运行完整测试流程: 校验配置, 发送请求, 监控GPU, 输出summary
+
+    Args:
+        config (dict): config文件内容
+        source (PromptSource): prompt来源
+
+    Returns:
+        list: results, 每个请求的RequestResult
+    """
+    save_path = config.get("save_path", "")
+    timeout = config.get("timeout", DEFAULT_TIMEOUT)
+    max_concurrency = config.get("max_concurrency", 0)
+    validate_model_config(config.get("model_config", {}))
+    context = RunContext.from_config(config, source)
+    warmup_config = warmup_config_from(config)
+    steady_config = steady_state_config_from(config)
+    sampler = AdaptiveSampler.from_config(config)
+
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+
+    log_config_info(config, source)
+
+    results = []
+
+    if sampler is None:
+        run_coro = main(source, models, save_path, results, context, timeout, max_concurrency, warmup_config)
+    else:
+        run_coro = adaptive_main(source, models, save_path, results, context, sampler, timeout, max_concurrency, warmup_config)
+    cell_reports = run_monitored(run_coro, models, save_path, context)
+
+    def write_adaptive_sampling_summary(measured, path, report_config):
+        from utils.summary import adaptive_sampling_summary_table
+        adaptive_sampling_summary_table(cell_reports, sampler, path, report_config)
+
+    extra_tables = {} if sampler is None else {"adaptive_sampling_summary": write_adaptive_sampling_summary}
+    finish_run(config, source, context, results, steady_config, extra_tables)
+    return results
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import math
+import os
+
+from utils.file_helper import ConfigError
+from utils.load_generator import run_open_loop, run_closed_loop
+from utils.runner import DEFAULT_TIMEOUT, log_config_info, make_client, run_monitored, streaming_context
+from utils.stats import percentile, bootstrap
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_SLO_CONFIG = {
+    "ttft": 2.0,              # 首token时间的SLO, 单位为秒
+    "tpot": 0.1,              # 每个输出token时间的SLO, 单位为秒
+    "percentile": 99,         # SLO针对的分位数
+    "search": "rate",         # rate: 搜索每秒请求数(开环), concurrency: 搜索并发数(闭环)
+    "min_load": None,         # 搜索下界, 为null时rate搜索为0.5, concurrency搜索为1
+    "max_load": 64,
+    "duration": 60,           # 每个负载下的测试时间, 单位为秒
+    "num_requests": None,     # 每个负载下的请求数, 给出时与duration以先达到者为准
+    "tolerance": 0.1,         # rate搜索时, 上下界的相对差小于tolerance即停止
+    "max_iterations": 8,
+    "cooldown": 5,            # 两次测试之间的等待时间, 使服务端排空队列
+    "bootstrap": 1000,        # 计算置信度时的重采样次数
+    "confidence": 0.95        # 分位数置信区间的置信水平
+}
+
+
+def slo_config_from(config):
+    """config中的slo_search字段与默认值合并并校验, 不合法时抛出ConfigError
+
+    concurrency搜索时上下界取整, 且下界至少为1, 否则闭环负载不会启动任何worker
+    """
+    slo_config = dict(DEFAULT_SLO_CONFIG)
+    slo_config.update(config.get("slo_search", {}))
+    if slo_config["search"] not in ["rate", "concurrency"]:
+        logger.error(f"slo_search.search must be rate or concurrency, got {slo_config['search']}")
+        raise ConfigError
+    if slo_config["search"] == "rate":
+        if slo_config["min_load"] is None:
+            slo_config["min_load"] = 0.5
+        if not 0 < slo_config["min_load"] <= slo_config["max_load"]:
+            logger.error("slo_search requires 0 < min_load <= max_load")
+            raise ConfigError
+        return slo_config
+    if slo_config["min_load"] is None:
+        slo_config["min_load"] = 1
+    if not 1 <= slo_config["min_load"] <= slo_config["max_load"]:
+        logger.error(f"slo_search with search = concurrency requires 1 <= min_load <= max_load, got {slo_config['min_load']}")
+        raise ConfigError
+    slo_config["min_load"] = max(1, round(slo_config["min_load"]))
+    slo_config["max_load"] = max(slo_config["min_load"], round(slo_config["max_load"]))
+    return slo_config
+
+
+def evaluate_slo(results, load, slo_config):
+    """计算某一负载下的分位数时延, goodput以及满足SLO的置信度
+
+    失败的请求视为时延无穷大; 只生成一个token的请求tpot记为0.
+    置信度为对请求重采样后, 分位数时延仍满足SLO的比例
+
+    Args:
+        results (list): 该负载下每个请求的RequestResult
+        load (float): 负载, 每秒请求数或并发数
+        slo_config (dict): SLO配置
+
+    Returns:
+        dict: 评估结果
+    """
+    q = slo_config["percentile"]
+    ttft_slo = slo_config["ttft"]
+    tpot_slo = slo_config["tpot"]
+
+    samples = []
+    for record in results:
+        if not record.ok:
+            samples.append((math.inf, math.inf))
+            continue
+        ttft = record.ttft if record.ttft >= 0 else record.elapsed_time
+        tpot = record.tpot if record.tpot >= 0 else 0
+        samples.append((ttft, tpot))
+
+    def meets(sample_list):
+        return percentile([x[0] for x in sample_list], q) <= ttft_slo and percentile([x[1] for x in sample_list], q) <= tpot_slo
+
+    p_ttft = percentile([x[0] for x in samples], q)
+    p_tpot = percentile([x[1] for x in samples], q)
+    resampled = bootstrap(samples, lambda x: (percentile([y[0] for y in x], q), percentile([y[1] for y in x], q)), slo_config["bootstrap"])
+    alpha = (1 - slo_config["confidence"]) / 2 * 100
+    confidence = sum(1 for ttft, tpot in resampled if ttft <= ttft_slo and tpot <= tpot_slo) / len(resampled) if resampled else 0
+
+    good_num = sum(1 for ttft, tpot in samples if ttft <= ttft_slo and tpot <= tpot_slo)
+    window = max(r.end_time for r in results) - min(r.start_time for r in results) if results else 0
+    return {
+        "load": load,
+        "requests": len(results),
+        "failed": sum(1 for r in results if not r.ok),
+        "passed": len(samples) > 0 and meets(samples),
+        "p_ttft": p_ttft,
+        "p_tpot": p_tpot,
+        "p_ttft_ci": (percentile([x[0] for x in resampled], alpha), percentile([x[0] for x in resampled], 100 - alpha)),
+        "p_tpot_ci": (percentile([x[1] for x in resampled], alpha), percentile([x[1] for x in resampled], 100 - alpha)),
+        "confidence": confidence,
+        "goodput": good_num / window if window > 0 else -1,
+        "throughput": (len(results) - sum(1 for r in results if not r.ok)) / window if window > 0 else -1
+    }
+
+
+async def search_model(client, model, prompts, slo_config, context):
+    """对单个模型二分搜索满足SLO的最大负载
+
+    Returns:
+        tuple: (最大可持续负载下的评估结果, 未找到时为None; 每一步的评估结果列表)
+    """
+    steps = []
+    is_rate = slo_config["search"] == "rate"
+
+    async def probe(load):
+        logger.info(f"Model {model['name']}: probing {slo_config['search']} = {load}")
+        if is_rate:
+            results = await run_open_loop(client, model, prompts, load, context, slo_config["duration"], slo_config["num_requests"])
+        else:
+            results = await run_closed_loop(client, model, prompts, load, context, slo_config["duration"], slo_config["num_requests"])
+        evaluation = evaluate_slo(results, load, slo_config)
+        steps.append(evaluation)
+        logger.info(
+            f"Model {model['name']}: {slo_config['search']} = {load}, p{slo_config['percentile']} ttft = {evaluation['p_ttft']:.3f}s, "
+            f"p{slo_config['percentile']} tpot = {evaluation['p_tpot']:.4f}s, passed = {evaluation['passed']}"
+        )
+        await asyncio.sleep(slo_config["cooldown"])
+        return evaluation
+
+    def converged(lower, upper):
+        if is_rate:
+            return upper - lower <= slo_config["tolerance"] * lower
+        return upper - lower <= 1
+
+    lower, upper = slo_config["min_load"], slo_config["max_load"]
+    best = await probe(lower)
+    if not best["passed"]:
+        logger.warning(f"Model {model['name']}: SLO is not met even at the minimum load {lower}")
+        return None, steps
+
+    evaluation = await probe(upper)
+    if evaluation["passed"]:
+        logger.warning(f"Model {model['name']}: SLO is met at the maximum load {upper}, the real limit may be higher")
+        return evaluation, steps
+
+    for _ in range(slo_config["max_iterations"]):
+        if converged(lower, upper):
+            break
+        middle = (lower + upper) / 2 if is_rate else (lower + upper) // 2
+        evaluation = await probe(middle)
+        if evaluation["passed"]:
+            lower, best = middle, evaluation
+        else:
+            upper = middle
+    return best, steps
+
+
+async def slo_search_main(models, prompts, slo_config, context, timeout):
+    """依次对每个模型进行搜索, 避免不同模型之间争用客户端资源"""
+    search_results = {}
+    async with make_client(timeout) as client:
+        for model in models:
+            search_results[model['name']] = await search_model(client, model, prompts, slo_config, context)
+    return search_results
+
+
+def run_slo_search(config, source):
+    """SLO搜索模式: 对config中的每个模型, 搜索满足时延SLO的最大请求速率或并发数
+
+    Args:
+        config (dict): config文件内容, SLO配置位于slo_search字段
+        source (PromptSource): prompt来源, 其中的prompt会被循环使用
+
+    Returns:
+        dict: {model_name: (最大可持续负载下的评估结果, 每一步的评估结果列表)}
+    """
+    from utils.summary import slo_search_summary_table
+
+    save_path = config.get("save_path", "")
+    context = streaming_context(config, source, "slo_search")
+    slo_config = slo_config_from(config)
+    models = config.get("models", [])
+    os.makedirs(save_path, exist_ok=True)
+    log_config_info(config, source, slo_search=slo_config)
+
+    prompts = list(source)
+    assert len(prompts) > 0, "No prompt found for slo search"
+    search_results = run_monitored(
+        slo_search_main(models, prompts, slo_config, context, config.get("timeout", DEFAULT_TIMEOUT)), models, save_path, context
+    )
+    slo_search_summary_table(search_results, slo_config, save_path, config.get("report", None))
+    return search_results
@@ -0,0 +1,108 @@
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from utils.stats import percentile
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MODULES = [
+    "utils.cli", "utils.runner", "utils.replay", "utils.slo_search", "utils.interference", "utils.context_scaling", "utils.cancellation"
+]
+
+# 在新的解释器中导入模块, 输出导入耗时以及导入了哪些重量级模块
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from utils.cli import HEAVY_MODULES
+print(json.dumps({{"elapsed": elapsed, "heavy": [name for name in HEAVY_MODULES if name in sys.modules]}}))
+"""
+
+
+def measure_import(module, repeat):
+    """在独立进程中重复导入module, 每次都是冷启动的解释器, 不受已加载模块的影响
+
+    Returns:
+        dict: {"Target", "Median (ms)", "Min (ms)", "Max (ms)", "Heavy Modules"}
+    """
+    elapsed = []
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+            cwd=project_root,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        elapsed.append(result["elapsed"])
+        heavy = result["heavy"]
+    return summarize(f"import {module}", elapsed, heavy)
+
+
+def measure_dry_run(config_path, repeat):
+    """测量start_testing.py --dry-run的整个进程耗时, 包括解释器启动"""
+    config_path = os.path.abspath(config_path)
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(project_root, "start_testing.py"), "--config", config_path, "--dry-run"],
+            cwd=os.path.dirname(config_path),
+            capture_output=True,
+            check=True
+        )
+        elapsed.append(time.perf_counter() - start)
+    return summarize("start_testing.py --dry-run", elapsed, [])
+
+
+def summarize(target, elapsed, heavy):
+    return {
+        "Target": target,
+        "Median (ms)": round(percentile(elapsed, 50) * 1000, 1),
+        "Min (ms)": round(min(elapsed) * 1000, 1),
+        "Max (ms)": round(max(elapsed) * 1000, 1),
+        "Heavy Modules": ", ".join(heavy)
+    }
+
+
+def run_startup_benchmark(repeat=5, config_path=None):
+    """测量各入口模块的导入耗时, 指定config_path时同时测量--dry-run的总耗时
+
+    Args:
+        repeat (int): 每项重复的次数
+        config_path (str): --dry-run使用的config文件
+
+    Returns:
+        list: 每项的测量结果
+    """
+    rows = [measure_import(module, repeat) for module in TARGET_MODULES]
+    if config_path is not None:
+        rows.append(measure_dry_run(config_path, repeat))
+    for row in rows:
+        heavy = f", heavy modules: {row['Heavy Modules']}" if row['Heavy Modules'] else ""
+        logger.info(
+            f"{row['Target']}: median {row['Median (ms)']}ms, min {row['Min (ms)']}ms, max {row['Max (ms)']}ms{heavy}"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the benchmark entry points")
+    parser.add_argument("--repeat", type=int, default=5, help="number of cold imports per target")
+    parser.add_argument("--config", default=None, help="also time a --dry-run with this config file")
+    args = parser.parse_args()
+    run_startup_benchmark(args.repeat, args.config)
@@ -0,0 +1,126 @@
+import math
+import random
+from statistics import NormalDist
+
+
+def percentile(values, q):
+    """线性插值计算分位数, values为空时返回-1
+
+    Args:
+        values (list): 数值列表, 可包含math.inf
+        q (float): 分位数, 范围0~100
+
+    Returns:
+        float: 分位数
+    """
+    if len(values) == 0:
+        return -1
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper or ordered[upper] == ordered[lower]:
+        return ordered[lower]
+    if math.isinf(ordered[upper]):
+        return math.inf
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def mean(values):
+    if len(values) == 0:
+        return -1
+    return sum(values) / len(values)
+
+
+def bootstrap(values, statistic, num_resamples=1000, seed=0):
+    """对values有放回地重采样num_resamples次, 返回每次重采样得到的statistic
+
+    Args:
+        values (list): 样本, 元素可以是任意对象
+        statistic (callable): 作用在重采样样本上的统计量
+        num_resamples (int): 重采样次数
+        seed (int): 随机种子, 保证结果可复现
+
+    Returns:
+        list: 每次重采样的统计量
+    """
+    if len(values) == 0:
+        return []
+    rng = random.Random(seed)
+    size = len(values)
+    return [statistic([values[rng.randrange(size)] for _ in range(size)]) for _ in range(num_resamples)]
+
+
+def bootstrap_ci(values, statistic, confidence=0.95, num_resamples=1000, seed=0):
+    """statistic的bootstrap百分位置信区间, values为空时返回(-1, -1)"""
+    samples = bootstrap(values, statistic, num_resamples, seed)
+    if len(samples) == 0:
+        return -1, -1
+    alpha = (1 - confidence) / 2 * 100
+    return percentile(samples, alpha), percentile(samples, 100 - alpha)
+
+
+def mean_ci(values, confidence=0.95):
+    """均值的正态近似置信区间, 样本少于2个时返回(-1, -1)"""
+    size = len(values)
+    if size < 2:
+        return -1, -1
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    center = sum(values) / size
+    std = math.sqrt(sum((value - center) ** 2 for value in values) / (size - 1))
+    half_width = z * std / math.sqrt(size)
+    return center - half_width, center + half_width
+
+
+def percentile_ci(values, q, confidence=0.95):
+    """分位数的非参数置信区间, 由次序统计量给出, 不需要重采样
+
+    第q分位数落在第l与第u个次序统计量之间的概率由二项分布决定, 此处使用其正态近似;
+    样本过少, l或u超出样本范围时返回(-1, -1), 如P90在95%置信水平下至少需要约60个样本
+    """
+    size = len(values)
+    if size < 2:
+        return -1, -1
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = q / 100
+    spread = z * math.sqrt(size * p * (1 - p))
+    # 次序统计量的秩从1开始
+    lower = math.floor(size * p - spread)
+    upper = math.ceil(size * p + spread) + 1
+    if lower < 1 or upper > size:
+        return -1, -1
+    ordered = sorted(values)
+    return ordered[lower - 1], ordered[upper - 1]
+
+
+def pearson(xs, ys):
+    """皮尔逊相关系数, 样本少于2个或任一序列方差为0时返回None"""
+    if len(xs) != len(ys) or len(xs) < 2:
+        return None
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def gpu_window(samples, start, end):
+    """[start, end]内的GPU采样, 多张GPU(如张量并行)的显存相加
+
+    Returns:
+        dict: 采样数, 峰值与平均显存占用(MiB), 显存总量(MiB)以及平均GPU利用率, 没有采样时为-1
+    """
+    in_window = [gpus for timestamp, gpus in samples if start <= timestamp <= end]
+    if len(in_window) == 0:
+        return {"samples": 0, "peak_memory": -1, "mean_memory": -1, "memory_total": -1, "gpu_utilization": -1}
+    used = [sum(gpu['memory_used'] for gpu in gpus) for gpus in in_window]
+    return {
+        "samples": len(in_window),
+        "peak_memory": max(used),
+        "mean_memory": mean(used),
+        "memory_total": sum(gpu['memory_total'] for gpu in in_window[-1]),
+        "gpu_utilization": mean([gpu['gpu_utilization'] for gpus in in_window for gpu in gpus])
+    }
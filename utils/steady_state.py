@@ -0,0 +1,157 @@
+import logging
+import os
+
+from utils.file_helper import ConfigError
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+DEFAULT_WARMUP_CONFIG = {
+    "requests": 0,      # 每个模型在正式测试前发送的预热请求数
+    "duration": 0       # 预热阶段的最短持续时间, 单位为秒; replay场景按这两项标记开头的请求
+}
+
+DEFAULT_STEADY_STATE_CONFIG = {
+    "enabled": True,
+    "ratio": 0.8,           # 在途请求数不低于参考并发数的ratio倍的区间视为稳态
+    "reference": 90         # 参考并发数为按时间加权的在途请求数的该分位数
+}
+
+
+def warmup_config_from(config):
+    """config中的warmup字段与默认值合并, 未配置时返回None"""
+    if config.get("warmup", None) is None:
+        return None
+    warmup_config = dict(DEFAULT_WARMUP_CONFIG)
+    warmup_config.update(config["warmup"])
+    if warmup_config["requests"] < 0 or warmup_config["duration"] < 0:
+        logger.error(f"warmup.requests and warmup.duration must be non-negative, got {config['warmup']}")
+        raise ConfigError
+    return warmup_config
+
+
+def steady_state_config_from(config):
+    """config中的steady_state字段与默认值合并, 未配置或enabled为false时返回None"""
+    if config.get("steady_state", None) is None:
+        return None
+    steady_config = dict(DEFAULT_STEADY_STATE_CONFIG)
+    steady_config.update(config["steady_state"])
+    if steady_config["enabled"] is False:
+        return None
+    if not 0 < steady_config["ratio"] <= 1:
+        logger.error(f"steady_state.ratio must be in (0, 1], got {steady_config['ratio']}")
+        raise ConfigError
+    return steady_config
+
+
+def mark_warmup(results, warmup_config):
+    """按模型将最先开始的requests个请求以及前duration秒内开始的请求标记为预热请求
+
+    default场景在正式测试前单独发送预热请求, 不需要事后标记; 回放等需要保持请求时间线的场景
+    无法插入单独的预热阶段, 由此函数裁剪开头的请求. 预热请求的结果照常保存, 但不计入summary和运行记录中的指标
+
+    Args:
+        results (list): 每个请求的RequestResult
+        warmup_config (dict): 预热配置, 格式见DEFAULT_WARMUP_CONFIG
+
+    Returns:
+        int: 标记的预热请求数
+    """
+    model_records = {}
+    for record in results:
+        model_records.setdefault(record.model, []).append(record)
+    marked = 0
+    for model_name, records in model_records.items():
+        records = sorted(records, key=lambda record: record.start_time)
+        first_start = records[0].start_time
+        model_marked = 0
+        for idx, record in enumerate(records):
+            if idx < warmup_config["requests"] or record.start_time - first_start < warmup_config["duration"]:
+                record.warmup = True
+                model_marked += 1
+        if model_marked == len(records):
+            logger.warning(f"All {len(records)} requests of model {model_name} are warm-up requests, no metrics will be reported")
+        logger.info(f"Model {model_name}: {model_marked} warm-up requests excluded from metrics")
+        marked += model_marked
+    return marked
+
+
+def metric_results(results):
+    """去除预热请求后参与统计的结果"""
+    return [record for record in results if not record.warmup]
+
+
+def concurrency_timeline(records):
+    """在途请求数随时间的阶梯函数
+
+    Returns:
+        list: [(时间, 该时间之后的在途请求数)], 按时间排序
+    """
+    events = []
+    for record in records:
+        if record.end_time < 0:
+            continue
+        events.append((record.start_time, 1))
+        events.append((record.end_time, -1))
+    # 同一时刻先结束后开始, 避免在途请求数出现虚高
+    events.sort(key=lambda event: (event[0], event[1]))
+    timeline = []
+    in_flight = 0
+    for time_point, delta in events:
+        in_flight += delta
+        if timeline and timeline[-1][0] == time_point:
+            timeline[-1] = (time_point, in_flight)
+        else:
+            timeline.append((time_point, in_flight))
+    return timeline
+
+
+def weighted_percentile(timeline, q):
+    """按持续时间加权的在途请求数分位数"""
+    durations = {}
+    for (time_point, in_flight), (next_time, _) in zip(timeline, timeline[1:]):
+        durations[in_flight] = durations.get(in_flight, 0) + next_time - time_point
+    total = sum(durations.values())
+    if total <= 0:
+        return 0
+    accumulated = 0
+    for in_flight in sorted(durations):
+        accumulated += durations[in_flight]
+        if accumulated >= total * q / 100:
+            return in_flight
+    return max(durations)
+
+
+def steady_state_window(records, ratio=0.8, reference=90):
+    """检测稳态区间: 在途请求数首次达到参考并发数的ratio倍到最后一次低于该值之间的时间段,
+    以去除开始时的爬坡和结束时的排空
+
+    Args:
+        records (list): 单个模型的RequestResult
+        ratio (float): 稳态阈值相对参考并发数的比例
+        reference (float): 参考并发数取按时间加权的在途请求数的该分位数
+
+    Returns:
+        tuple: (稳态开始时间, 稳态结束时间, 参考并发数, 稳态内按时间加权的平均在途请求数), 无法检测时返回None
+    """
+    timeline = concurrency_timeline(records)
+    if len(timeline) < 2:
+        return None
+    threshold = ratio * weighted_percentile(timeline, reference)
+    start = end = None
+    for (time_point, in_flight), (next_time, _) in zip(timeline, timeline[1:]):
+        if in_flight >= threshold and in_flight > 0:
+            if start is None:
+                start = time_point
+            end = next_time
+    if start is None or end <= start:
+        return None
+    area = 0.0
+    for (time_point, in_flight), (next_time, _) in zip(timeline, timeline[1:]):
+        overlap = min(next_time, end) - max(time_point, start)
+        if overlap > 0:
+            area += in_flight * overlap
+    return start, end, threshold / ratio, area / (end - start)
@@ -1,121 +1,807 @@
-from datetime import datetime
+import json
 import pandas as pd
 import os
 
+from utils.report import write_table
+from utils.stats import percentile
 
-def model_summary_table(
-    eval_dict, save_path
+
+def results_frame(results):
+    """将RequestResult列表转换为一个DataFrame, 作为model/error/file/response summary共享的数据
+
+    Args:
+        results (list): 每个请求的RequestResult
+
+    Returns:
+        DataFrame: 每行为一个请求
+    """
+    return pd.DataFrame(
+        {
+            "prompt": [record.prompt for record in results],
+            "model": [record.model for record in results],
+            "start_time": [record.start_time for record in results],
+            "end_time": [record.end_time for record in results],
+            "elapsed_time": [record.elapsed_time for record in results],
+            "prompt_tokens": [record.prompt_tokens for record in results],
+            "decode_tokens": [record.decode_tokens for record in results],
+            "decode_speed": [record.decode_speed for record in results],
+            "ok": pd.Series([record.ok for record in results], dtype=bool),
+            "error": [record.error for record in results],
+            "error_type": [record.error_type for record in results],
+            "status_code": [record.status_code for record in results],
+            "attempts": [record.attempts for record in results],
+            "response": [record.response for record in results],
+            "response_ref": [record.response_ref for record in results],
+            "variant": [record.variant for record in results],
+            "warmup": pd.Series([record.warmup for record in results], dtype=bool)
+        }
+    )
+
+
+def model_summary_frame(
+    base
 ):  # get the ealiest start time, the latest end time, total_prompt_num, total_decode_num, total_decode_speed for every model
-    model_summary = {}
+    if len(base) == 0:
+        return pd.DataFrame()
+    ok_base = base[base["ok"]]
+    failed_base = base[~base["ok"]]
+    grouped = base.groupby("model", sort=False)
+    summary = pd.DataFrame(
+        {
+            "earliest_start": grouped["start_time"].min(),
+            "latest_end": grouped["end_time"].max(),
+            "request_num": grouped.size(),
+            "retried_num": grouped["attempts"].apply(lambda x: int((x > 1).sum()))
+        }
+    )
+    summary["failed_num"] = failed_base.groupby("model").size().reindex(summary.index, fill_value=0)
+    summary["failed_latency"] = failed_base.groupby("model")["elapsed_time"].sum().reindex(summary.index, fill_value=0)
+    summary["total_prompt_num"] = ok_base.groupby("model")["prompt_tokens"].sum().reindex(summary.index, fill_value=0)
+    summary["total_decode_num"] = ok_base.groupby("model")["decode_tokens"].sum().reindex(summary.index, fill_value=0)
+
+    data = []
+    for model_name, summary_item in summary.iterrows():
+        total_runtime = summary_item["latest_end"] - summary_item["earliest_start"]
+        decode_speed = summary_item["total_decode_num"] / total_runtime if total_runtime > 0 and summary_item[
+            "failed_num"] < summary_item["request_num"] else -1
+        goodput = (summary_item["request_num"] - summary_item["failed_num"]) / total_runtime if total_runtime > 0 else -1
+        data.append(
+            {
+                "Model": model_name,
+                "Requests": int(summary_item["request_num"]),
+                "Failed Requests": int(summary_item["failed_num"]),
+                "Total Prompt Tokens": int(summary_item["total_prompt_num"]),
+                "Total Decode Tokens": int(summary_item["total_decode_num"]),
+                "Total Runtime (s)": round(total_runtime, 2),
+                "Decode Speed (Tokens / s)": round(decode_speed, 2) if decode_speed != -1 else -1,
+                "Goodput (Requests / s)": round(goodput, 3) if goodput != -1 else -1,
+                "Error Rate": round(summary_item["failed_num"] / summary_item["request_num"], 4),
+                "Retried Requests": int(summary_item["retried_num"]),
+                "Mean Failed Latency (s)": round(summary_item["failed_latency"] / summary_item["failed_num"], 3)
+                if summary_item["failed_num"] > 0 else -1
+            }
+        )
+    return pd.DataFrame(data)
 
-    for file, model_list in eval_dict.items():
-        for record in model_list:
-            model_name = record["model"]
-            if record["start_time"] == -1:
-                continue
-            start_time = datetime.fromisoformat(record["start_time"])
-            end_time = datetime.fromisoformat(record["end_time"])
-
-            if model_name not in model_summary:
-                model_summary[model_name] = {
-                    "earliest_start": start_time,
-                    "latest_end": end_time,
-                    "total_prompt_num": record['prompt_token_len'],
-                    "total_decode_num": record['decode_token_len'],
-                    'latest_start': start_time,
-                    'earliest_end': end_time
+
+def error_summary_frame(base):
+    """按模型和错误类型统计失败请求的数量, 错误率以及失败前经过的时间"""
+    if len(base) == 0:
+        return pd.DataFrame()
+    request_num = base.groupby("model", sort=False).size()
+    failed_base = base[~base["ok"]]
+
+    data = []
+    for model_name, total in request_num.items():
+        model_errors = failed_base[failed_base["model"] == model_name]
+        if len(model_errors) == 0:
+            data.append(
+                {
+                    "Model": model_name,
+                    "Error Type": "none",
+                    "Count": 0,
+                    "Error Rate": 0,
+                    "Mean Failed Latency (s)": -1,
+                    "Max Failed Latency (s)": -1,
+                    "Status Codes": ""
                 }
-            else:
-                model_summary[model_name]["earliest_start"] = min(
-                    model_summary[model_name]["earliest_start"], start_time
-                )
-                model_summary[model_name]["latest_end"] = max(model_summary[model_name]["latest_end"], end_time)
-                # model_summary[model_name]["earliest_end"] = min(model_summary[model_name]["earliest_end"], end_time)
-                # model_summary[model_name]["latest_start"] = max(model_summary[model_name]["latest_start"], start_time)
-                model_summary[model_name]['total_prompt_num'] += record['prompt_token_len']
-                model_summary[model_name]['total_decode_num'] += record['decode_token_len']
+            )
+            continue
+        error_groups = model_errors.groupby("error_type", sort=False, dropna=False)
+        for error_type in error_groups.size().sort_values(ascending=False, kind='stable').index:
+            item = error_groups.get_group(error_type)
+            status_codes = sorted(set(code for code in item["status_code"] if code != -1))
+            data.append(
+                {
+                    "Model": model_name,
+                    "Error Type": error_type,
+                    "Count": len(item),
+                    "Error Rate": round(len(item) / total, 4),
+                    "Mean Failed Latency (s)": round(item["elapsed_time"].mean(), 3),
+                    "Max Failed Latency (s)": round(item["elapsed_time"].max(), 3),
+                    "Status Codes": ",".join(str(code) for code in status_codes)
+                }
+            )
 
-    for model_name, summary_item in model_summary.items():
-        summary_item['total_runtime'] = (summary_item['latest_end'] - summary_item['earliest_start']).total_seconds()
-        summary_item['decode_speed'] = summary_item['total_decode_num'] / summary_item['total_runtime'] if summary_item[
-            "total_runtime"] > 0 else -1
-        # print(model_name, summary_item['earliest_start'], summary_item['latest_start'], summary_item['earliest_end'], summary_item['latest_end'])
+    df_display = pd.DataFrame(data)
+    df_display.loc[df_display.duplicated(subset=['Model']), 'Model'] = ''
+    return df_display
+
+
+def file_summary_frame(base):
+    if len(base) == 0:
+        return pd.DataFrame()
+    df = pd.DataFrame(
+        {
+            'Prompt': base["prompt"],
+            'Model': base["model"],
+            'Prompt Token Length': base["prompt_tokens"],
+            'Decode Token Length': base["decode_tokens"],
+            'Elapsed Time(s)': base["elapsed_time"].apply(lambda x: round(x, 3) if x >= 0 else x),
+            'Decode Speed(Token / s)': base["decode_speed"].apply(lambda x: round(x, 2) if x != -1 else -1),
+            'Error Type': base["error_type"].fillna(''),
+            'Attempts': base["attempts"],
+            'Error': base["error"].fillna('')
+        }
+    )
+    if base["variant"].notna().any():
+        df.insert(2, 'Variant', base["variant"].fillna(''))
+    if base["warmup"].any():
+        df['Warmup'] = base["warmup"]
+    df = df.sort_values(by=['Prompt'], kind='stable').reset_index(drop=True)
+
+    df_display = df.copy()
+    df_display.loc[df_display.duplicated(subset=['Prompt']), 'Prompt'] = ''
+    return df_display
+
+
+def response_summary_frame(base, response_limit=None, externalized_path=None):
+    """回答表格, response_limit不为None时截断超长的回答
+
+    Args:
+        base (DataFrame): results_frame的结果
+        response_limit (int): 回答的最大字符数, 为None时不截断
+        externalized_path (str): 完整回答另外保存的jsonl文件路径, 为None时直接截断, 否则在截断处注明完整回答的位置
+    """
+    responses = [
+        response if ok else f"ERROR: {error}" for response, ok, error in zip(base["response"], base["ok"], base["error"])
+    ]
+    df = pd.DataFrame({'Prompt': base["prompt"], 'Model': base["model"], 'Response': responses})
+    if base["variant"].notna().any():
+        df.insert(2, 'Variant', base["variant"].fillna(''))
+    df = df.sort_values(by=['Prompt'], kind='stable').reset_index(drop=True)
+
+    if response_limit is not None:
+        long_rows = [idx for idx, response in enumerate(df['Response']) if response is not None and len(response) > response_limit]
+        if externalized_path is not None and long_rows:
+            with open(externalized_path, 'w', encoding='utf-8') as file:
+                for line_idx, idx in enumerate(long_rows):
+                    row = df.iloc[idx]
+                    file.write(json.dumps({"prompt": row['Prompt'], "model": row['Model'], "response": row['Response']}, ensure_ascii=False) + "\n")
+                    df.at[idx, 'Response'] = (
+                        f"{row['Response'][:response_limit]} ...[truncated, full response in {os.path.basename(externalized_path)} line {line_idx + 1}]"
+                    )
+        else:
+            for idx in long_rows:
+                response = df.at[idx, 'Response']
+                df.at[idx, 'Response'] = f"{response[:response_limit]} ...[truncated {len(response) - response_limit} chars]"
+
+    df_display = df.copy()
+    df_display.loc[df_display.duplicated(subset=['Prompt']), 'Prompt'] = ''
+    return df_display
 
+
+def model_summary_table(results, save_path, report_config=None):
+    write_table(model_summary_frame(results_frame(results)), "model_summary_table", save_path, report_config)
+
+
+def error_summary_table(results, save_path, report_config=None):
+    """按模型和错误类型统计失败请求的数量, 错误率以及失败前经过的时间"""
+    write_table(error_summary_frame(results_frame(results)), "error_summary_table", save_path, report_config)
+
+
+def file_summary_table(results, save_path, report_config=None):
+    write_table(file_summary_frame(results_frame(results)), "file_summary_table", save_path, report_config)
+
+
+def response_summary_table(results, save_path, report_config=None):
+    write_table(response_summary_frame(results_frame(results)), "response_summary_table", save_path, report_config)
+
+
+def vlm_sweep_summary_table(results, sweep_info, save_path, report_config=None):
+    """VLM sweep的汇总表格, 展示prefill时间, prompt token数以及时延随图片数量和像素数的变化
+
+    Args:
+        results (list): 每个请求的RequestResult, prompt为sweep变体名
+        sweep_info (dict): 每个sweep变体的图片数量与分辨率信息
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
     data = []
-    for model_name, summary_item in model_summary.items():
+    for record in results:
+        info = sweep_info[record.prompt]
         data.append(
             {
-                "Model": model_name,
-                "Total Prompt Tokens": summary_item["total_prompt_num"],
-                "Total Decode Tokens": summary_item["total_decode_num"],
-                "Total Runtime (s)": round(summary_item["total_runtime"], 2),
-                "Decode Speed (Tokens / s)": round(summary_item["decode_speed"], 2)
-                if summary_item["decode_speed"] != -1 else -1
+                'Model': record.model,
+                'Image Count': info['image_count'],
+                'Resolution': f"{info['width']}x{info['height']}",
+                'Total Pixels': info['pixels'],
+                'Prompt Token Length': record.prompt_tokens,
+                'Decode Token Length': record.decode_tokens,
+                'Prefill Time(s)': round(record.ttft, 3) if record.ok and record.ttft >= 0 else -1,
+                'Latency(s)': round(record.elapsed_time, 3) if record.ok else -1,
+                'Error': record.error if record.error is not None else ''
             }
         )
+    if len(data) == 0:
+        return
 
     df = pd.DataFrame(data)
+    df = df.sort_values(by=['Model', 'Total Pixels', 'Image Count']).reset_index(drop=True)
+
+    df['Prefill Time per 1K Pixels(ms)'] = df.apply(
+        lambda row: round(row['Prefill Time(s)'] * 1e6 / row['Total Pixels'], 4)
+        if row['Prefill Time(s)'] != -1 and row['Total Pixels'] > 0 else -1,
+        axis=1
+    )
+
+    df_display = df.copy()
+    df_display.loc[df_display.duplicated(subset=['Model']), 'Model'] = ''
+
+    write_table(df_display, "vlm_sweep_summary_table", save_path, report_config)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_name = f"model_summary_table_{timestamp}.xlsx"
-    output_file_path = os.path.join(save_path, file_name)
 
-    df.to_excel(output_file_path, index=False)
+def slo_search_summary_table(search_results, slo_config, save_path, report_config=None):
+    """SLO搜索的汇总表格, summary页为每个模型满足SLO的最大负载, steps页为搜索过程中每一步的测试结果
 
+    Args:
+        search_results (dict): {model_name: (最大可持续负载下的评估结果, 每一步的评估结果列表)}
+        slo_config (dict): SLO配置
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    q = slo_config["percentile"]
+    load_name = "Request Rate (Requests / s)" if slo_config["search"] == "rate" else "Concurrency"
+
+    def format_ci(ci):
+        return f"[{ci[0]:.4f}, {ci[1]:.4f}]"
+
+    summary_data = []
+    steps_data = []
+    for model_name, (best, steps) in search_results.items():
+        if best is None:
+            summary_data.append({"Model": model_name, f"Max {load_name}": -1, "Note": "SLO not met at min_load"})
+        else:
+            summary_data.append(
+                {
+                    "Model": model_name,
+                    f"Max {load_name}": round(best["load"], 3),
+                    "Goodput (Requests / s)": round(best["goodput"], 3),
+                    "Throughput (Requests / s)": round(best["throughput"], 3),
+                    f"P{q} TTFT (s)": round(best["p_ttft"], 4),
+                    f"P{q} TTFT CI (s)": format_ci(best["p_ttft_ci"]),
+                    f"P{q} TPOT (s)": round(best["p_tpot"], 4),
+                    f"P{q} TPOT CI (s)": format_ci(best["p_tpot_ci"]),
+                    "Pass Confidence": round(best["confidence"], 3),
+                    "Requests": best["requests"],
+                    "Failed Requests": best["failed"],
+                    "Probes": len(steps),
+                    "Note": "limited by max_load" if best["load"] == slo_config["max_load"] else ""
+                }
+            )
+        for step in steps:
+            steps_data.append(
+                {
+                    "Model": model_name,
+                    load_name: round(step["load"], 3),
+                    "Passed": step["passed"],
+                    f"P{q} TTFT (s)": round(step["p_ttft"], 4),
+                    f"P{q} TPOT (s)": round(step["p_tpot"], 4),
+                    "Pass Confidence": round(step["confidence"], 3),
+                    "Goodput (Requests / s)": round(step["goodput"], 3),
+                    "Requests": step["requests"],
+                    "Failed Requests": step["failed"]
+                }
+            )
+
+    write_table(
+        {"summary": pd.DataFrame(summary_data), "steps": pd.DataFrame(steps_data)}, "slo_search_summary_table", save_path,
+        report_config
+    )
+
+
+def interference_summary_table(interference_results, interference_config, save_path, report_config=None):
+    """干扰测试的汇总表格, 每行为一个模型在某一背景并发数下探测请求的时延及其相对基线(背景并发数为0)的膨胀倍数
+
+    Args:
+        interference_results (dict): {model_name: 每个阶段的评估结果列表, 第一个为基线}
+        interference_config (dict): interference配置
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    q = interference_config["percentile"]
+
+    def rounded(value, digits):
+        return round(value, digits) if value >= 0 else -1
 
-def file_summary_table(eval_dict, save_path):
     data = []
-    for prompt, entries in eval_dict.items():
-        for entry in entries:
-            data.append(
+    for model_name, phases in interference_results.items():
+        for phase in phases:
+            ratios = phase.get("inflation", None)
+            row = {
+                "Model": model_name,
+                "Background Concurrency": phase["level"],
+                "Probes": phase["probes"],
+                "Failed Probes": phase["failed"]
+            }
+            for metric, label in [("ttft", "TTFT"), ("e2e", "E2E Latency"), ("tpot", "TPOT")]:
+                for prefix in ["p50", f"p{q}"]:
+                    key = f"{prefix}_{metric}"
+                    row[f"{prefix.upper()} {label} (s)"] = rounded(phase[key], 4)
+                    row[f"{prefix.upper()} {label} Inflation"] = 1 if ratios is None else rounded(ratios[key], 3)
+                    if key == "p50_ttft":
+                        ci = (1, 1) if ratios is None else ratios["p50_ttft_ci"]
+                        row["P50 TTFT Inflation CI"] = f"[{ci[0]:.3f}, {ci[1]:.3f}]"
+            row.update(
                 {
-                    'Prompt': prompt,
-                    'Model': entry['model'],
-                    'Prompt Token Length': entry['prompt_token_len'],
-                    'Decode Token Length': entry['decode_token_len'],
-                    'Elapsed Time(s)': entry['elapsed_time']
+                    "Background Requests": phase["background_requests"],
+                    "Failed Background Requests": phase["background_failed"],
+                    "Background Decode Throughput (Tokens / s)": rounded(phase["background_throughput"], 2)
                 }
             )
+            data.append(row)
 
-    df = pd.DataFrame(data)
+    write_table(pd.DataFrame(data), "interference_summary_table", save_path, report_config)
 
-    df['Decode Speed(Token / s)'] = df.apply(
-        lambda row: round(row['Decode Token Length'] / row['Elapsed Time(s)'], 2)
-        if row['Decode Token Length'] != -1 and row['Elapsed Time(s)'] > 0 else -1,
-        axis=1
+
+def cancellation_summary_table(cancellation_results, cancellation_config, save_path, report_config=None):
+    """取消测试的汇总表格, 每行为一个模型在某一并发数下的基线或取消阶段, 取消阶段给出相对基线的倍数
+
+    Args:
+        cancellation_results (dict): {model_name: 每个并发数的(基线评估结果, 取消阶段评估结果)}
+        cancellation_config (dict): cancellation配置
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    q = cancellation_config["percentile"]
+
+    def rounded(value, digits):
+        return round(value, digits) if value >= 0 else -1
+
+    data = []
+    for model_name, evaluations in cancellation_results.items():
+        for phases in evaluations:
+            for phase in phases:
+                ratios = phase.get("recovery", None)
+                row = {
+                    "Model": model_name,
+                    "Concurrency": phase["concurrency"],
+                    "Cancel Fraction": phase["fraction"],
+                    "Requests": phase["requests"],
+                    "Cancelled Requests": phase["cancelled"],
+                    "Finished Before Cancel": phase["cancel_missed"],
+                    "Remaining Requests": phase["remaining"],
+                    "Failed Requests": phase["failed"]
+                }
+                for key, label in [("p50_ttft", "P50 TTFT"), (f"p{q}_ttft", f"P{q} TTFT"), ("p50_tpot", "P50 TPOT"), (f"p{q}_tpot", f"P{q} TPOT")]:
+                    row[f"{label} (s)"] = rounded(phase[key], 4)
+                    row[f"{label} vs Baseline"] = 1 if ratios is None else rounded(ratios[key], 3)
+                row.update(
+                    {
+                        "P50 E2E Latency (s)": rounded(phase["p50_e2e"], 4),
+                        "Decode Speed (Tokens / s)": rounded(phase["decode_speed"], 2),
+                        "Decode Speed vs Baseline": 1 if ratios is None else rounded(ratios["decode_speed"], 3),
+                        "Goodput (Tokens / s)": rounded(phase["goodput"], 2),
+                        "Requests After Cancel": phase["after_cancel_requests"],
+                        "P50 TTFT After Cancel (s)": rounded(phase["p50_after_cancel_ttft"], 4),
+                        "P50 TTFT After Cancel vs Baseline": "" if ratios is None else rounded(ratios["p50_after_cancel_ttft"], 3),
+                        "Idle GPU Memory (MiB)": rounded(phase["release"]["idle_memory"], 1),
+                        "Peak GPU Memory (MiB)": phase["gpu"]["peak_memory"],
+                        "GPU Memory At End (MiB)": phase["release"]["end_memory"],
+                        "GPU Memory Release Time (s)": rounded(phase["release"]["release_time"], 2)
+                    }
+                )
+                data.append(row)
+
+    write_table(pd.DataFrame(data), "cancellation_summary_table", save_path, report_config)
+
+
+def context_scaling_summary_table(scaling_results, save_path, report_config=None):
+    """上下文长度扩展测试的汇总表格, summary页为每个模型在每个并发数下的最大可用上下文, steps页为每一步的测试结果(扩展曲线)
+
+    Args:
+        scaling_results (dict): {model_name: [(每个并发数的汇总结果, 每一步的评估结果列表)]}
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+
+    def rounded(value, digits):
+        if value is None:
+            return ""
+        return round(value, digits) if value >= 0 else -1
+
+    summary_data = []
+    steps_data = []
+    for model_name, sweeps in scaling_results.items():
+        for summary, steps in sweeps:
+            summary_data.append(
+                {
+                    "Model": model_name,
+                    "Concurrency": summary["concurrency"],
+                    "Max Usable Context (Tokens)": summary["max_usable_length"],
+                    "First Failed Context (Tokens)": summary["first_failed_length"],
+                    "Failure": summary["failure"],
+                    "Peak GPU Memory (MiB)": summary["peak_memory"],
+                    "GPU Memory Total (MiB)": summary["memory_total"],
+                    "Context / Peak Memory Correlation": rounded(summary["memory_correlation"], 3),
+                    "Context / P50 TTFT Correlation": rounded(summary["ttft_correlation"], 3),
+                    "Steps": summary["steps"]
+                }
+            )
+            for step in sorted(steps, key=lambda step: step["length"]):
+                steps_data.append(
+                    {
+                        "Model": model_name,
+                        "Concurrency": step["concurrency"],
+                        "Context (Tokens)": step["length"],
+                        "Mean Prompt Tokens": rounded(step["prompt_tokens"], 1),
+                        "Passed": step["passed"],
+                        "Requests": step["requests"],
+                        "Failed Requests": step["failed"],
+                        "Error Types": step["error_types"],
+                        "P50 TTFT (s)": rounded(step["p50_ttft"], 4),
+                        "P99 TTFT (s)": rounded(step["p99_ttft"], 4),
+                        "Prefill Speed (Tokens / s)": rounded(step["prefill_speed"], 2),
+                        "Decode Speed (Tokens / s)": rounded(step["decode_speed"], 2),
+                        "Decode Throughput (Tokens / s)": rounded(step["throughput"], 2),
+                        "GPU Samples": step["gpu"]["samples"],
+                        "Peak GPU Memory (MiB)": step["gpu"]["peak_memory"],
+                        "Mean GPU Memory (MiB)": rounded(step["gpu"]["mean_memory"], 1),
+                        "Mean GPU Utilization (%)": rounded(step["gpu"]["gpu_utilization"], 1)
+                    }
+                )
+
+    write_table(
+        {"summary": pd.DataFrame(summary_data), "steps": pd.DataFrame(steps_data)}, "context_scaling_summary_table", save_path,
+        report_config
     )
 
-    df['Elapsed Time(s)'] = df['Elapsed Time(s)'].apply(lambda x: round(x, 3) if x >= 0 else x)
+
+def synthetic_summary_table(results, prompt_info, save_path, report_config=None):
+    """合成负载的汇总表格, 对比目标token长度与服务端返回的实际长度, 并给出时延随输入输出长度的变化
+
+    Args:
+        results (list): 每个请求的RequestResult
+        prompt_info (dict): {prompt名称: {"input_len", "output_len"}}
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    data = []
+    for record in results:
+        info = prompt_info[record.prompt]
+        data.append(
+            {
+                'Model': record.model,
+                'Prompt': record.prompt,
+                'Target Input Tokens': info['input_len'],
+                'Prompt Token Length': record.prompt_tokens,
+                'Target Output Tokens': info['output_len'],
+                'Decode Token Length': record.decode_tokens,
+                'TTFT(s)': round(record.ttft, 3) if record.ok and record.ttft >= 0 else -1,
+                'Elapsed Time(s)': round(record.elapsed_time, 3) if record.ok else -1,
+                'Decode Speed(Token / s)': round(record.decode_speed, 2) if record.decode_speed != -1 else -1,
+                'Error': record.error if record.error is not None else ''
+            }
+        )
+    if len(data) == 0:
+        return
+
+    df = pd.DataFrame(data)
+    df = df.sort_values(by=['Model', 'Target Input Tokens', 'Target Output Tokens'], kind='stable').reset_index(drop=True)
 
     df_display = df.copy()
-    df_display.loc[df_display.duplicated(subset=['Prompt']), 'Prompt'] = ''
+    df_display.loc[df_display.duplicated(subset=['Model']), 'Model'] = ''
+
+    write_table(df_display, "synthetic_summary_table", save_path, report_config)
+
+
+def token_check_summary_table(results, tolerance, save_path, report_config=None):
+    """按模型对比服务端返回的usage与本地token计数
+
+    相对差为|服务端 - 本地| / 服务端, 超过tolerance的请求计为不一致; 服务端未返回usage的请求单独计数
+
+    Args:
+        results (list): 每个请求的RequestResult
+        tolerance (float): 判定不一致的相对差阈值
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    model_summary = {}
+    for record in results:
+        if record.model not in model_summary:
+            model_summary[record.model] = {
+                "request_num": 0,
+                "local_num": 0,
+                "prompt_diffs": [],
+                "decode_diffs": []
+            }
+        summary_item = model_summary[record.model]
+        if not record.ok:
+            continue
+        summary_item["request_num"] += 1
+        if record.usage_source == "local":
+            summary_item["local_num"] += 1
+            continue
+        if record.local_prompt_tokens >= 0 and record.prompt_tokens > 0:
+            summary_item["prompt_diffs"].append(abs(record.prompt_tokens - record.local_prompt_tokens) / record.prompt_tokens)
+        if record.local_decode_tokens >= 0 and record.decode_tokens > 0:
+            summary_item["decode_diffs"].append(abs(record.decode_tokens - record.local_decode_tokens) / record.decode_tokens)
+
+    data = []
+    for model_name, summary_item in model_summary.items():
+        prompt_diffs = summary_item["prompt_diffs"]
+        decode_diffs = summary_item["decode_diffs"]
+        data.append(
+            {
+                "Model": model_name,
+                "Requests": summary_item["request_num"],
+                "Usage Missing (Local Count Used)": summary_item["local_num"],
+                "Mean Prompt Token Diff": round(sum(prompt_diffs) / len(prompt_diffs), 4) if prompt_diffs else -1,
+                "Max Prompt Token Diff": round(max(prompt_diffs), 4) if prompt_diffs else -1,
+                "Prompt Disagreements": sum(1 for diff in prompt_diffs if diff > tolerance),
+                "Mean Decode Token Diff": round(sum(decode_diffs) / len(decode_diffs), 4) if decode_diffs else -1,
+                "Max Decode Token Diff": round(max(decode_diffs), 4) if decode_diffs else -1,
+                "Decode Disagreements": sum(1 for diff in decode_diffs if diff > tolerance)
+            }
+        )
+
+    write_table(pd.DataFrame(data), "token_check_summary_table", save_path, report_config)
+
+
+def replay_summary_table(results, schedule, speed, save_path, report_config=None):
+    """trace回放的汇总表格, 给出每个模型的发送时间偏差, 实际到达速率以及时延分位数
+
+    Args:
+        results (list): 每个请求的RequestResult
+        schedule (dict): {模型名称或"all": ScheduleStats}, 并行回放时所有模型共享"all"
+        speed (float): 回放倍速
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    model_records = {}
+    for record in results:
+        model_records.setdefault(record.model, []).append(record)
+
+    data = []
+    for model_name, records in model_records.items():
+        stats = schedule.get(model_name, None) or schedule.get("all")
+        ok_records = [record for record in records if record.ok]
+        latencies = [record.elapsed_time for record in ok_records]
+        ttfts = [record.ttft for record in ok_records if record.ttft >= 0]
+        data.append(
+            {
+                "Model": model_name,
+                "Speed": speed,
+                "Requests": len(records),
+                "Failed Requests": len(records) - len(ok_records),
+                "Planned Span (s)": round(stats.planned_span, 2),
+                "Actual Send Span (s)": round(stats.actual_span, 2),
+                "Offered Rate (Requests / s)": round(stats.count / stats.actual_span, 3) if stats.actual_span > 0 else -1,
+                "Mean Send Lag (s)": round(stats.mean_lag, 4) if stats.count > 0 else -1,
+                "Max Send Lag (s)": round(stats.max_lag, 4),
+                "Late Requests": stats.late_count,
+                "P50 Latency (s)": round(percentile(latencies, 50), 3) if latencies else -1,
+                "P99 Latency (s)": round(percentile(latencies, 99), 3) if latencies else -1,
+                "P50 TTFT (s)": round(percentile(ttfts, 50), 3) if ttfts else -1,
+                "P99 TTFT (s)": round(percentile(ttfts, 99), 3) if ttfts else -1
+            }
+        )
+
+    write_table(pd.DataFrame(data), "replay_summary_table", save_path, report_config)
+
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_name = f"file_summary_table_{timestamp}.xlsx"
+def replica_summary_table(results, slow_threshold, save_path, report_config=None):
+    """配置了多个副本的模型, 按副本给出请求分布, 时延和吞吐, 并在最后给出该模型的汇总行
 
-    output_file_path = os.path.join(save_path, file_name)
-    df_display.to_excel(output_file_path, index=False)
+    副本的P50时延超过其他副本P50时延中位数的slow_threshold倍时标记为慢副本
 
+    Args:
+        results (list): 每个请求的RequestResult
+        slow_threshold (float): 判定慢副本的倍数
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    model_records = {}
+    for record in results:
+        if record.endpoint is None:
+            continue
+        model_records.setdefault(record.model, {}).setdefault(record.endpoint, []).append(record)
+
+    def replica_row(model_name, endpoint, records, total):
+        ok_records = [record for record in records if record.ok]
+        latencies = [record.elapsed_time for record in ok_records]
+        ttfts = [record.ttft for record in ok_records if record.ttft >= 0]
+        decode_tokens = sum(max(record.decode_tokens, 0) for record in ok_records)
+        span = max(record.end_time for record in records) - min(record.start_time for record in records)
+        return {
+            "Model": model_name,
+            "Endpoint": endpoint,
+            "Requests": len(records),
+            "Share": round(len(records) / total, 4),
+            "Failed Requests": len(records) - len(ok_records),
+            "Error Rate": round((len(records) - len(ok_records)) / len(records), 4),
+            "Mean Latency (s)": round(sum(latencies) / len(latencies), 3) if latencies else -1,
+            "P50 Latency (s)": round(percentile(latencies, 50), 3) if latencies else -1,
+            "P99 Latency (s)": round(percentile(latencies, 99), 3) if latencies else -1,
+            "Mean TTFT (s)": round(sum(ttfts) / len(ttfts), 3) if ttfts else -1,
+            "Decode Throughput (Tokens / s)": round(decode_tokens / span, 2) if span > 0 else -1
+        }
 
-def response_summary_table(eval_dict, save_path):
     data = []
-    for prompt, entries in eval_dict.items():
-        for entry in entries:
+    for model_name, endpoints in model_records.items():
+        if len(endpoints) <= 1:
+            continue
+        total = sum(len(records) for records in endpoints.values())
+        rows = [replica_row(model_name, endpoint, records, total) for endpoint, records in endpoints.items()]
+        for row in rows:
+            others = [other["P50 Latency (s)"] for other in rows if other is not row and other["P50 Latency (s)"] >= 0]
+            row["Slow"] = bool(others) and row["P50 Latency (s)"] > slow_threshold * percentile(others, 50)
+        all_row = replica_row(model_name, "all", [record for records in endpoints.values() for record in records], total)
+        all_row["Slow"] = any(row["Slow"] for row in rows)
+        data.extend(rows)
+        data.append(all_row)
+    if len(data) == 0:
+        return
+
+    write_table(pd.DataFrame(data), "replica_summary_table", save_path, report_config)
+
+
+def variant_summary_table(results, variants, save_path, report_config=None):
+    """workload_matrix的汇总表格, 按模型和变体给出请求数, 输出长度, 吞吐和时延, 用于比较n, max_tokens等参数在共享负载下的影响
+
+    Args:
+        results (list): 每个请求的RequestResult
+        variants (list): WorkloadVariant列表
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    variant_params = {variant.name: variant.model_config for variant in variants}
+    model_records = {}
+    for record in results:
+        model_records.setdefault(record.model, {}).setdefault(record.variant, []).append(record)
+
+    data = []
+    for model_name, variant_records in model_records.items():
+        model_total = sum(len(records) for records in variant_records.values())
+        for variant_name, records in variant_records.items():
+            ok_records = [record for record in records if record.ok]
+            latencies = [record.elapsed_time for record in ok_records]
+            ttfts = [record.ttft for record in ok_records if record.ttft >= 0]
+            tpots = [record.tpot for record in ok_records if record.tpot >= 0]
+            decode_tokens = sum(max(record.decode_tokens, 0) for record in ok_records)
+            span = max(record.end_time for record in records) - min(record.start_time for record in records)
             data.append(
                 {
-                    'Prompt': prompt,
-                    'Model': entry['model'],
-                    'Response': entry['response']['content']
+                    "Model": model_name,
+                    "Variant": variant_name if variant_name is not None else "",
+                    "Params": json.dumps(variant_params.get(variant_name, {}), ensure_ascii=False),
+                    "Requests": len(records),
+                    "Share": round(len(records) / model_total, 4),
+                    "Failed Requests": len(records) - len(ok_records),
+                    "Error Rate": round((len(records) - len(ok_records)) / len(records), 4),
+                    "Total Decode Tokens": decode_tokens,
+                    "Mean Decode Tokens": round(decode_tokens / len(ok_records), 1) if ok_records else -1,
+                    "Runtime (s)": round(span, 2),
+                    "Decode Throughput (Tokens / s)": round(decode_tokens / span, 2) if span > 0 else -1,
+                    "Goodput (Requests / s)": round(len(ok_records) / span, 3) if span > 0 else -1,
+                    "P50 Latency (s)": round(percentile(latencies, 50), 3) if latencies else -1,
+                    "P99 Latency (s)": round(percentile(latencies, 99), 3) if latencies else -1,
+                    "P50 TTFT (s)": round(percentile(ttfts, 50), 3) if ttfts else -1,
+                    "Mean TPOT (s)": round(sum(tpots) / len(tpots), 4) if tpots else -1
                 }
             )
 
-    df = pd.DataFrame(data)
+    write_table(pd.DataFrame(data), "variant_summary_table", save_path, report_config)
 
-    df_display = df.copy()
-    df_display.loc[df_display.duplicated(subset=['Prompt']), 'Prompt'] = ''
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_name = f"response_summary_table_{timestamp}.xlsx"
+def steady_state_summary_table(results, steady_config, save_path, report_config=None):
+    """按模型检测稳态区间, 给出去除爬坡和排空阶段后的吞吐和时延, 并附上全程的对应指标作为对照
+
+    稳态吞吐将每个请求的decode token按时间均匀分摊后, 只计入落在稳态区间内的部分; 稳态时延只统计完全位于稳态区间内的请求
+
+    Args:
+        results (list): 每个请求的RequestResult, 不含预热请求
+        steady_config (dict): 稳态检测配置, 格式见utils.steady_state.DEFAULT_STEADY_STATE_CONFIG
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    from utils.steady_state import steady_state_window
+
+    model_records = {}
+    for record in results:
+        model_records.setdefault(record.model, []).append(record)
+
+    data = []
+    for model_name, records in model_records.items():
+        ok_records = [record for record in records if record.ok]
+        run_start = min(record.start_time for record in records)
+        run_span = max(record.end_time for record in records) - run_start
+        total_tokens = sum(max(record.decode_tokens, 0) for record in ok_records)
+        all_latencies = [record.elapsed_time for record in ok_records]
+        row = {
+            "Model": model_name,
+            "Requests": len(records),
+            "Runtime (s)": round(run_span, 2),
+            "Decode Throughput (Tokens / s)": round(total_tokens / run_span, 2) if run_span > 0 else -1,
+            "P50 Latency (s)": round(percentile(all_latencies, 50), 3) if all_latencies else -1
+        }
+        window = steady_state_window(records, steady_config["ratio"], steady_config["reference"])
+        if window is None:
+            # 请求过少或没有并发时无法检测稳态, 稳态相关的列留空
+            data.append(row)
+            continue
+        start, end, reference_concurrency, mean_concurrency = window
+        duration = end - start
+        steady_tokens = 0.0
+        for record in ok_records:
+            elapsed_time = record.elapsed_time
+            overlap = min(record.end_time, end) - max(record.start_time, start)
+            if elapsed_time > 0 and overlap > 0:
+                steady_tokens += max(record.decode_tokens, 0) * overlap / elapsed_time
+        inside = [record for record in records if record.start_time >= start and record.end_time <= end]
+        inside_ok = [record for record in inside if record.ok]
+        latencies = [record.elapsed_time for record in inside_ok]
+        ttfts = [record.ttft for record in inside_ok if record.ttft >= 0]
+        completed = sum(1 for record in ok_records if start <= record.end_time <= end)
+        row.update(
+            {
+                "Steady Start (s)": round(start - run_start, 2),
+                "Steady End (s)": round(end - run_start, 2),
+                "Steady Duration (s)": round(duration, 2),
+                "Reference Concurrency": reference_concurrency,
+                "Mean Steady Concurrency": round(mean_concurrency, 2),
+                "Trimmed Requests": len(records) - len(inside),
+                "Steady Decode Throughput (Tokens / s)": round(steady_tokens / duration, 2),
+                "Steady Goodput (Requests / s)": round(completed / duration, 3),
+                "Steady Error Rate": round((len(inside) - len(inside_ok)) / len(inside), 4) if inside else -1,
+                "Steady P50 Latency (s)": round(percentile(latencies, 50), 3) if latencies else -1,
+                "Steady P99 Latency (s)": round(percentile(latencies, 99), 3) if latencies else -1,
+                "Steady P50 TTFT (s)": round(percentile(ttfts, 50), 3) if ttfts else -1,
+                "Steady P99 TTFT (s)": round(percentile(ttfts, 99), 3) if ttfts else -1
+            }
+        )
+        data.append(row)
+
+    write_table(pd.DataFrame(data), "steady_state_summary_table", save_path, report_config)
+
+
+def adaptive_sampling_summary_table(cell_reports, sampler, save_path, report_config=None):
+    """自适应采样的汇总表格, 每行为一个单元(模型与变体的组合), 给出停止原因以及每个目标指标最终达到的精度
+
+    Args:
+        cell_reports (list): 每个单元的adaptive_cell结果
+        sampler (AdaptiveSampler): 自适应采样配置
+        save_path (str): 保存路径
+        report_config (dict): config中的report字段, 决定输出格式, 见utils.report.DEFAULT_REPORT_CONFIG
+    """
+    data = []
+    for report in cell_reports:
+        row = {
+            "Model": report["model"],
+            "Variant": report["variant"] if report["variant"] is not None else "",
+            "Requests": report["requests"],
+            "Failed Requests": report["failed"],
+            "Rounds": report["rounds"],
+            "Stop Reason": report["stop_reason"],
+            "Converged": report["stop_reason"] == "converged"
+        }
+        for metric, item in report["precision"].items():
+            row[metric] = round(item["estimate"], 4) if item["estimate"] >= 0 else -1
+            row[f"{metric} CI ({sampler.confidence:.0%})"] = (
+                f"[{item['ci'][0]:.4f}, {item['ci'][1]:.4f}]" if item["relative"] >= 0 else ""
+            )
+            row[f"{metric} Precision (±%)"] = round(item["relative"] * 100, 2) if item["relative"] >= 0 else -1
+            row[f"{metric} Target (±%)"] = round(sampler.tolerance * 100, 2)
+        data.append(row)
 
-    output_file_path = os.path.join(save_path, file_name)
-    df_display.to_excel(output_file_path, index=False)
\ No newline at end of file
+    write_table(pd.DataFrame(data), "adaptive_sampling_summary_table", save_path, report_config)
@@ -0,0 +1,181 @@
+import functools
+import json
+import logging
+import os
+import random
+
+from utils.file_helper import ConfigError
+from utils.prompt_source import PromptSource, PromptItem
+from utils.tokenizer import ApproxTokenizer, load_tokenizer
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+
+def get_field(item, field):
+    """按照以.分隔的路径读取嵌套字典中的值, 如usage.prompt_tokens"""
+    for key in field.split("."):
+        item = item[key]
+    return item
+
+
+@functools.lru_cache(maxsize=None)
+def load_trace_lengths(path, field):
+    """从真实trace中读取长度序列
+
+    path为jsonl文件时, 每行为一个字典, 按field读取长度; 否则每行为一个整数
+
+    Returns:
+        tuple: 长度序列
+    """
+    lengths = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if field is None:
+                lengths.append(int(line))
+            else:
+                lengths.append(int(get_field(json.loads(line), field)))
+    assert len(lengths) > 0, f"No length found in trace file: {path}"
+    return tuple(lengths)
+
+
+class LengthDistribution:
+    """token长度的分布
+
+    spec可以是整数(固定长度), 也可以是字典:
+        {"type": "fixed", "value": 512}
+        {"type": "uniform", "min": 128, "max": 1024}
+        {"type": "trace", "path": "lengths.jsonl", "field": "usage.prompt_tokens", "scale": 1.0}
+    """
+
+    def __init__(self, spec):
+        if isinstance(spec, int):
+            spec = {"type": "fixed", "value": spec}
+        self.spec = spec
+        self.type = spec.get("type", "fixed")
+        if self.type == "trace":
+            self.lengths = load_trace_lengths(spec["path"], spec.get("field", None))
+        elif self.type not in ["fixed", "uniform"]:
+            logger.error(f"Invalid length distribution type: {self.type}")
+            raise ConfigError
+
+    @property
+    def trace_key(self):
+        """trace分布的来源文件, 两个分布来源相同时按同一行联合采样以保留输入输出长度的相关性"""
+        if self.type != "trace":
+            return None
+        return self.spec["path"]
+
+    def sample(self, rng, row=None):
+        if self.type == "fixed":
+            return self.spec["value"]
+        if self.type == "uniform":
+            return rng.randint(self.spec["min"], self.spec["max"])
+        if row is None:
+            row = rng.randrange(len(self.lengths))
+        return max(1, int(round(self.lengths[row] * self.spec.get("scale", 1.0))))
+
+    def describe(self):
+        if self.type == "fixed":
+            return f"fixed({self.spec['value']})"
+        if self.type == "uniform":
+            return f"uniform({self.spec['min']}, {self.spec['max']})"
+        return f"trace({self.spec['path']}:{self.spec.get('field', None)}, {len(self.lengths)} rows)"
+
+
+class SyntheticSource(PromptSource):
+    """合成负载, 生成prompt token数受控的messages, 并通过max_tokens和ignore_eos控制输出长度
+
+    prompt在迭代时逐条生成, 不写入文件; 相同seed下生成的负载完全一致
+
+    synthetic配置:
+        num_prompts (int): prompt数量, 默认为100
+        input_len / output_len: 输入/输出token长度分布, 格式见LengthDistribution
+        tokenizer (str): 本地tokenizer的名称或路径(需要transformers), 默认为近似tokenizer
+        calibrate_with (str): 使用近似tokenizer时, 用models中该名称的模型校准每个单词的token数和chat模板开销
+        ignore_eos (bool): 是否在请求中加入ignore_eos, 使模型恰好生成max_tokens个token, 默认为true
+        seed (int): 随机种子, 默认为0
+    """
+
+    def __init__(self, synthetic_config, models=None):
+        self.num_prompts = synthetic_config.get("num_prompts", 100)
+        self.input_len = LengthDistribution(synthetic_config.get("input_len", 512))
+        self.output_len = LengthDistribution(synthetic_config.get("output_len", 128))
+        self.ignore_eos = synthetic_config.get("ignore_eos", True)
+        self.seed = synthetic_config.get("seed", 0)
+        self.prompt_info = {}
+        self.tokenizer_name = synthetic_config.get("tokenizer", None)
+        self._tokenizer = None
+
+        # 校准需要发送请求, 在prepare中进行, 使--dry-run不访问服务端
+        self.calibrate_model = None
+        calibrate_with = synthetic_config.get("calibrate_with", None)
+        if calibrate_with is not None and self.tokenizer_name in [None, "approx"]:
+            matched = [model for model in (models or []) if model['name'] == calibrate_with]
+            if len(matched) != 1:
+                logger.error(f"synthetic.calibrate_with model {calibrate_with} not found in models")
+                raise ConfigError
+            self.calibrate_model = matched[0]
+
+    @property
+    def tokenizer(self):
+        """首次使用时加载tokenizer, 使用近似tokenizer且配置了calibrate_with时同时校准; 校准失败时记录错误并使用未校准的比例"""
+        if self._tokenizer is None:
+            if self.calibrate_model is not None:
+                tokenizer = ApproxTokenizer()
+                try:
+                    tokenizer.calibrate(self.calibrate_model)
+                except Exception as e:
+                    logger.error(
+                        f"Failed to calibrate the approx tokenizer with model {self.calibrate_model['name']}, falling back to "
+                        f"tokens_per_word = {tokenizer.tokens_per_word}, overhead = {tokenizer.overhead}: {type(e).__name__}: {e}"
+                    )
+            else:
+                tokenizer = load_tokenizer(self.tokenizer_name)
+            self._tokenizer = tokenizer
+        return self._tokenizer
+
+    def prepare(self):
+        self.tokenizer
+
+    def make_item(self, idx, rng):
+        row = None
+        if self.input_len.trace_key is not None and self.input_len.trace_key == self.output_len.trace_key:
+            row = rng.randrange(len(self.input_len.lengths))
+        input_len = self.input_len.sample(rng, row)
+        output_len = self.output_len.sample(rng, row)
+        content_len = max(1, input_len - self.tokenizer.chat_overhead())
+        messages = [{"role": "user", "content": self.tokenizer.make_text(content_len, rng)}]
+        params = {"max_tokens": output_len}
+        if self.ignore_eos is True:
+            params["ignore_eos"] = True
+        info = {"input_len": input_len, "output_len": output_len}
+        return PromptItem(f"synthetic_{idx}", messages, info, params)
+
+    def __iter__(self):
+        rng = random.Random(self.seed)
+        for idx in range(self.num_prompts):
+            item = self.make_item(idx, rng)
+            self.prompt_info[item.name] = item.info
+            yield item
+
+    def prompt_names(self):
+        return [f"synthetic_{idx}" for idx in range(self.num_prompts)]
+
+    def describe(self):
+        tokenizer_name = self.tokenizer_name or ApproxTokenizer.name
+        return (
+            f"synthetic {self.num_prompts} prompts, input_len {self.input_len.describe()}, "
+            f"output_len {self.output_len.describe()}, tokenizer {tokenizer_name}"
+        )
+
+    def extra_summary(self, results, save_path, summary_info, report_config=None):
+        if summary_info.get("synthetic_summary", False) is True:
+            from utils.summary import synthetic_summary_table
+            synthetic_summary_table(results, self.prompt_info, save_path, report_config)
@@ -0,0 +1,235 @@
+import functools
+import logging
+import os
+import re
+import threading
+
+from utils.balancer import model_urls
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+# 在常见的BPE词表(GPT, Llama, Qwen等)中, 这些带前导空格的常用词均为单个token
+SINGLE_TOKEN_WORDS = (
+    "the of and to in is you that it he was for on are as with his they at be this have from or one had by "
+    "word but not what all were we when your can said there use an each which she do how their if will up "
+    "other about out many then them these so some her would make like him into time has look two more write "
+    "go see number no way could people my than first water been call who its now find long down day did get "
+    "come made may part over new sound take only little work know place year live me back give most very after "
+    "thing our just name good sentence man think say great where help through much before line right too mean "
+    "old any same tell boy follow came want show also around form three small set put end does another well "
+    "large must big even such because turn here why ask went men read need land home us move try kind "
+    "hand picture again change off play spell air away animal house point page letter mother answer found study"
+).split()
+
+# 近似计数时的基本单元: 单个中日韩字符, 连续的英文字母, 至多3位的数字, 单个标点
+TOKEN_UNIT_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]|[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+# 近似计数时, 每条额外的message引入的token数(角色标记等)
+APPROX_MESSAGE_OVERHEAD = 4
+
+
+class ApproxTokenizer:
+    """近似的tokenizer, 以基本单元数乘以tokens_per_word估计token数
+
+    每个中日韩字符, 数字组和标点记为一个单元, 连续的英文字母每8个字母记为一个单元.
+    生成文本时只使用SINGLE_TOKEN_WORDS中的单词, 因此tokens_per_word在大多数模型上接近1;
+    overhead为chat模板额外引入的token数, 可通过calibrate根据服务端返回的usage校准
+    """
+    name = "approx"
+
+    def __init__(self, tokens_per_word=1.0, overhead=0):
+        self.tokens_per_word = tokens_per_word
+        self.overhead = overhead
+
+    def count(self, text):
+        units = 0
+        for piece in TOKEN_UNIT_PATTERN.findall(text):
+            if piece.isascii() and piece.isalpha():
+                units += (len(piece) + 7) // 8
+            else:
+                units += 1
+        return int(round(units * self.tokens_per_word))
+
+    def count_messages(self, messages):
+        """估计messages经过chat模板后的token数, 包含非文本内容(如图片)时返回-1"""
+        total = 0
+        for message in messages:
+            text = message_text(message)
+            if text is None:
+                return -1
+            total += self.count(text)
+        return total + self.overhead + APPROX_MESSAGE_OVERHEAD * max(0, len(messages) - 1)
+
+    def make_text(self, num_tokens, rng):
+        """生成约num_tokens个token的随机文本"""
+        num_words = max(1, int(round(num_tokens / self.tokens_per_word)))
+        return " ".join(rng.choice(SINGLE_TOKEN_WORDS) for _ in range(num_words))
+
+    def chat_overhead(self):
+        return self.overhead
+
+    def calibrate(self, model, timeout=60):
+        """向模型发送两个不同长度的prompt, 根据返回的prompt_tokens拟合tokens_per_word和overhead
+
+        Args:
+            model (dict): config文件中某个model的config信息
+            timeout (float): 请求超时时间
+        """
+        import random
+        import httpx
+
+        rng = random.Random(0)
+        samples = []
+        for num_words in [64, 512]:
+            text = " ".join(rng.choice(SINGLE_TOKEN_WORDS) for _ in range(num_words))
+            api_key = model['api_key'] if 'api_key' in model else 'token-123'
+            response = httpx.post(
+                f"{model_urls(model)[0]}/v1/chat/completions",
+                json={"model": model['name'], "messages": [{"role": "user", "content": text}], "max_tokens": 1},
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            samples.append((num_words, response.json()['usage']['prompt_tokens']))
+        (x0, y0), (x1, y1) = samples
+        self.tokens_per_word = (y1 - y0) / (x1 - x0)
+        self.overhead = max(0, int(round(y0 - x0 * self.tokens_per_word)))
+        logger.info(
+            f"Calibrated approx tokenizer with model {model['name']}: tokens_per_word = {self.tokens_per_word:.4f}, overhead = {self.overhead}"
+        )
+
+
+class HFTokenizer:
+    """基于transformers的本地tokenizer, 需要安装transformers"""
+
+    def __init__(self, name_or_path):
+        try:
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            logger.error("Local tokenizer requires transformers, please run `pip install transformers`")
+            raise e
+        self.name = name_or_path
+        self.tokenizer = AutoTokenizer.from_pretrained(name_or_path, trust_remote_code=True)
+        self._overhead = None
+
+    def count(self, text):
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def count_messages(self, messages):
+        """messages经过chat模板后的token数, 包含非文本内容(如图片)时返回-1"""
+        texts = [message_text(message) for message in messages]
+        if any(text is None for text in texts):
+            return -1
+        try:
+            return len(self.tokenizer.apply_chat_template(messages, tokenize=True, add_generation_prompt=True))
+        except Exception:
+            return sum(self.count(text) for text in texts) + self.chat_overhead()
+
+    def make_text(self, num_tokens, rng):
+        """随机采样token id并解码, 重新编码后截断, 保证文本恰好为num_tokens个token"""
+        vocab_size = self.tokenizer.vocab_size
+        token_ids = [rng.randrange(vocab_size) for _ in range(num_tokens)]
+        for _ in range(5):
+            text = self.tokenizer.decode(token_ids, skip_special_tokens=True)
+            token_ids = self.tokenizer.encode(text, add_special_tokens=False)
+            if len(token_ids) == num_tokens:
+                return text
+            if len(token_ids) > num_tokens:
+                token_ids = token_ids[:num_tokens]
+            else:
+                token_ids += [rng.randrange(vocab_size) for _ in range(num_tokens - len(token_ids))]
+        return self.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def chat_overhead(self):
+        """chat模板对单条user message额外引入的token数, tokenizer不支持chat模板时为0"""
+        if self._overhead is None:
+            content = "hello"
+            try:
+                templated = self.tokenizer.apply_chat_template(
+                    [{"role": "user", "content": content}], tokenize=True, add_generation_prompt=True
+                )
+                self._overhead = max(0, len(templated) - self.count(content))
+            except Exception:
+                self._overhead = 0
+        return self._overhead
+
+
+def message_text(message):
+    """message中的文本内容, 包含非文本内容时返回None"""
+    content = message.get("content", "")
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    texts = []
+    for part in content:
+        if part.get("type") != "text":
+            return None
+        texts.append(part.get("text", ""))
+    return "".join(texts)
+
+
+@functools.lru_cache(maxsize=None)
+def load_tokenizer(name_or_path=None):
+    """加载并缓存tokenizer, name_or_path为None或"approx"时返回近似tokenizer"""
+    if name_or_path is None or name_or_path == "approx":
+        return ApproxTokenizer()
+    return HFTokenizer(name_or_path)
+
+
+class TokenCounter:
+    """本地token计数, 用于校验服务端返回的usage, 并在服务端未返回usage时代替usage
+
+    tokenizer按照模型系列(family)延迟加载并缓存, 同一系列的模型共享一个tokenizer.
+    模型使用的tokenizer依次由模型config中的tokenizer字段, 模型名称中包含的系列名, default决定
+
+    Attributes:
+        tokenizers (dict): {系列名: tokenizer名称或路径}, 如{"llama": "meta-llama/Llama-3.3-70B-Instruct"}
+        default (str): 未匹配到系列时使用的tokenizer, 默认为近似tokenizer
+        tolerance (float): 本地计数与服务端usage的相对差超过该值时视为不一致
+    """
+
+    def __init__(self, tokenizers=None, default=None, tolerance=0.05):
+        self.tokenizers = tokenizers or {}
+        self.default = default
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """由config中的token_counting字段构造, 未配置或enabled为false时返回None"""
+        token_config = config.get("token_counting", None)
+        if not token_config or token_config.get("enabled", True) is False:
+            return None
+        return cls(
+            tokenizers=token_config.get("tokenizers", None),
+            default=token_config.get("default", None),
+            tolerance=token_config.get("tolerance", 0.05)
+        )
+
+    def resolve(self, model):
+        """模型使用的tokenizer名称"""
+        if 'tokenizer' in model:
+            return model['tokenizer']
+        model_name = model['name'].lower()
+        matched = [family for family in self.tokenizers if family.lower() in model_name]
+        if matched:
+            return self.tokenizers[max(matched, key=len)]
+        return self.default
+
+    def tokenizer_for(self, model):
+        with self._lock:
+            return load_tokenizer(self.resolve(model))
+
+    def count(self, model, messages, completion):
+        """本地计数的prompt和completion token数, prompt无法计数时为-1
+
+        Returns:
+            tuple: (prompt token数, completion token数)
+        """
+        tokenizer = self.tokenizer_for(model)
+        return tokenizer.count_messages(messages), tokenizer.count(completion)
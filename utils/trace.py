@@ -0,0 +1,246 @@
+import argparse
+import functools
+import json
+import logging
+import os
+from datetime import datetime
+
+from utils.file_helper import load_json_txt_prompt, request_body
+from utils.prompt_source import PromptSource, PromptItem
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+# trace中保留的采样参数, 是否流式由本次测试的model_config决定
+TRACE_PARAMS = [key for key in request_body if key != "stream"]
+
+# 导入日志时依次尝试的时间戳字段
+TIMESTAMP_FIELDS = ["timestamp", "created_at", "created", "time", "start_time"]
+
+
+def parse_timestamp(value):
+    """将日志中的时间戳转换为秒
+
+    支持秒或毫秒的数字(大于1e11时视为毫秒), 数字字符串以及ISO 8601格式的时间字符串
+
+    Returns:
+        float: 时间戳, 无法解析时为None
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    return None
+
+
+class TraceWriter:
+    """逐行写入trace文件
+
+    trace为jsonl文件, 每行为一个请求, 按offset升序排列:
+        offset (float): 相对trace开始的发送时间, 单位为秒
+        name (str): 请求名称
+        messages (list) / messages_ref (str): messages本身, 或相对trace文件所在目录的prompt文件路径
+        params (dict): 采样参数, 字段与request_body一致
+        output_len (int): 原始请求的输出token数, 未知时为-1
+        model (str): 原始请求的模型名称, 仅作记录
+    """
+
+    def __init__(self, trace_path):
+        self.trace_path = trace_path
+        self.count = 0
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.trace_path, 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+
+    def write(self, offset, messages=None, messages_ref=None, params=None, output_len=-1, name=None, model=None):
+        assert messages is not None or messages_ref is not None, "messages or messages_ref must be provided"
+        entry = {"offset": round(offset, 6), "name": name if name is not None else f"trace_{self.count}"}
+        if messages_ref is not None:
+            entry["messages_ref"] = messages_ref
+        else:
+            entry["messages"] = messages
+        entry["params"] = params or {}
+        entry["output_len"] = output_len
+        if model is not None:
+            entry["model"] = model
+        self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.count += 1
+
+
+def parse_openai_log_entry(entry):
+    """解析OpenAI风格请求日志中的一行
+
+    支持{"timestamp": ..., "request": {...}, "response": {...}}, 请求位于body字段的batch格式,
+    以及请求字段直接位于顶层的格式; 时间戳缺失时使用response中的created
+
+    Returns:
+        tuple: (时间戳, 请求体, 输出token数), 不是chat请求时返回None
+    """
+    request = entry.get("request", None) or entry.get("body", None) or entry
+    if not isinstance(request, dict) or "messages" not in request:
+        return None
+    response = entry.get("response", None) or {}
+    if isinstance(response.get("body", None), dict):
+        response = response["body"]
+
+    timestamp = None
+    for candidate in [entry, request, response]:
+        for field in TIMESTAMP_FIELDS:
+            if field in candidate:
+                timestamp = parse_timestamp(candidate[field])
+                if timestamp is not None:
+                    break
+        if timestamp is not None:
+            break
+    if timestamp is None:
+        return None
+
+    usage = response.get("usage", None) or entry.get("usage", None) or {}
+    output_len = usage.get("completion_tokens", -1) if isinstance(usage, dict) else -1
+    return timestamp, request, output_len
+
+
+def import_openai_log(log_path, trace_path):
+    """将OpenAI风格的请求日志(jsonl)转换为trace文件
+
+    第一遍只记录每行的时间戳和文件偏移, 排序后第二遍按偏移逐行读取并写入, 因此日志无需按时间排序,
+    内存占用只与请求数有关而与messages大小无关
+
+    Args:
+        log_path (str): 请求日志路径
+        trace_path (str): 输出的trace路径
+
+    Returns:
+        int: 写入的请求数
+    """
+    index = []
+    skipped = 0
+    with open(log_path, 'rb') as file:
+        while True:
+            position = file.tell()
+            line = file.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                parsed = parse_openai_log_entry(json.loads(line))
+            except (json.JSONDecodeError, AttributeError, TypeError):
+                parsed = None
+            if parsed is None:
+                skipped += 1
+                continue
+            index.append((parsed[0], position))
+    if skipped > 0:
+        logger.warning(f"Skipped {skipped} lines without a chat request or timestamp in {log_path}")
+    assert len(index) > 0, f"No request found in log file: {log_path}"
+
+    index.sort(key=lambda x: x[0])
+    base_time = index[0][0]
+    with open(log_path, 'rb') as file, TraceWriter(trace_path) as writer:
+        for timestamp, position in index:
+            file.seek(position)
+            _, request, output_len = parse_openai_log_entry(json.loads(file.readline()))
+            params = {key: request[key] for key in TRACE_PARAMS if key in request}
+            writer.write(
+                timestamp - base_time,
+                messages=request["messages"],
+                params=params,
+                output_len=output_len,
+                model=request.get("model", None)
+            )
+    logger.info(f"Imported {len(index)} requests spanning {index[-1][0] - base_time:.1f}s from {log_path} to {trace_path}")
+    return len(index)
+
+
+@functools.lru_cache(maxsize=1024)
+def load_messages_ref(path):
+    """读取trace中messages_ref指向的prompt文件, 生产日志中重复的prompt只读取一次"""
+    return load_json_txt_prompt(path)
+
+
+class TraceSource(PromptSource):
+    """从trace文件中逐行读取请求, 不会将整个trace载入内存
+
+    PromptItem.info中的offset为相对replay开始的发送时间(秒), output_len为原始输出token数
+
+    Args:
+        trace_path (str): trace文件路径
+        match_output_len (bool): 是否用max_tokens和ignore_eos复现原始输出长度
+        start (float): 只读取offset不小于start的请求, offset从start开始重新计算
+        duration (float): 只读取start之后duration秒内的请求
+        max_requests (int): 最多读取的请求数
+    """
+
+    def __init__(self, trace_path, match_output_len=True, start=0, duration=None, max_requests=None):
+        self.trace_path = trace_path
+        self.match_output_len = match_output_len
+        self.start = start
+        self.duration = duration
+        self.max_requests = max_requests
+
+    def make_item(self, entry):
+        if "messages_ref" in entry:
+            ref_path = os.path.join(os.path.dirname(os.path.abspath(self.trace_path)), entry["messages_ref"])
+            messages = load_messages_ref(ref_path)
+        else:
+            messages = entry["messages"]
+        params = dict(entry.get("params", {}))
+        output_len = entry.get("output_len", -1)
+        if self.match_output_len is True and output_len > 0:
+            params.pop("max_completion_tokens", None)
+            params["max_tokens"] = output_len
+            params["ignore_eos"] = True
+        info = {"offset": entry["offset"] - self.start, "output_len": output_len}
+        return PromptItem(entry["name"], messages, info, params)
+
+    def __iter__(self):
+        count = 0
+        with open(self.trace_path, 'r', encoding='utf-8') as file:
+            for line_idx, line in enumerate(file):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Failed to parse JSON in line {line_idx} of trace: {self.trace_path}")
+                    logger.error(f"Error: {e}")
+                    continue
+                if entry["offset"] < self.start:
+                    continue
+                if self.duration is not None and entry["offset"] >= self.start + self.duration:
+                    break
+                if self.max_requests is not None and count >= self.max_requests:
+                    break
+                entry.setdefault("name", f"trace_{line_idx}")
+                count += 1
+                yield self.make_item(entry)
+
+    def describe(self):
+        window = f", window [{self.start}, {self.start + self.duration})s" if self.duration is not None else ""
+        return f"trace {self.trace_path}{window}, match_output_len {self.match_output_len}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert an OpenAI-style request log (jsonl) into a replay trace")
+    parser.add_argument("--input", required=True, help="request log path")
+    parser.add_argument("--output", required=True, help="output trace path")
+    args = parser.parse_args()
+    import_openai_log(args.input, args.output)
@@ -0,0 +1,76 @@
+import fnmatch
+import logging
+import os
+from dataclasses import dataclass
+
+from utils.file_helper import ConfigError, ModelConfigError, validate_model_config_params
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+)
+current_file = os.path.splitext(os.path.basename(__file__))[0]
+logger = logging.getLogger(current_file)
+
+
+@dataclass
+class WorkloadVariant:
+    """workload_matrix中的一组请求参数
+
+    Attributes:
+        name (str): 变体名称, 用于标记结果
+        model_config (dict): 该变体的请求参数, 在全局model_config和prompt专属参数之后应用
+        models (list): 使用该变体的模型名称, 为None时用于所有模型
+        prompts (list): 使用该变体的prompt名称模式(支持*和?通配符), 为None时用于所有prompt
+    """
+    name: str
+    model_config: dict
+    models: list = None
+    prompts: list = None
+
+    def applies_to(self, model_name, prompt_name):
+        if self.models is not None and model_name not in self.models:
+            return False
+        if self.prompts is not None and not any(fnmatch.fnmatchcase(prompt_name, pattern) for pattern in self.prompts):
+            return False
+        return True
+
+
+def load_workload_matrix(config):
+    """由config中的workload_matrix字段构造变体列表, 未配置时返回None
+
+    每个变体的model_config与全局model_config合并后校验, 名称重复或引用了不存在的模型时抛出ConfigError
+
+    Args:
+        config (dict): config文件内容
+
+    Returns:
+        list: WorkloadVariant列表
+    """
+    matrix = config.get("workload_matrix", None)
+    if matrix is None:
+        return None
+    if not isinstance(matrix, list) or len(matrix) == 0:
+        logger.error("workload_matrix must be a non-empty list of variants")
+        raise ConfigError
+    model_names = [model['name'] for model in config.get("models", [])]
+    variants = []
+    for idx, item in enumerate(matrix):
+        variant = WorkloadVariant(
+            item.get("name", f"variant_{idx}"), item.get("model_config", {}), item.get("models", None), item.get("prompts", None)
+        )
+        if variant.name in [existing.name for existing in variants]:
+            logger.error(f"Duplicate workload_matrix variant name: {variant.name}")
+            raise ConfigError
+        for model_name in variant.models or []:
+            if model_name not in model_names:
+                logger.error(f"workload_matrix variant {variant.name} refers to unknown model: {model_name}")
+                raise ConfigError
+        flag, info = validate_model_config_params({**config.get("model_config", {}), **variant.model_config})
+        if flag is False:
+            logger.error(f"workload_matrix variant {variant.name}: {info}")
+            raise ModelConfigError
+        variants.append(variant)
+    for model_name in model_names:
+        if not any(variant.models is None or model_name in variant.models for variant in variants):
+            logger.warning(f"No workload_matrix variant applies to model {model_name}, it will receive no requests")
+    return variants